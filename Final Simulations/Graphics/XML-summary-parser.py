@@ -1,81 +1,18 @@
-import xml.etree.ElementTree as ET
 import matplotlib.pyplot as plt
 
-# Parse the XML file and get the root element
-tree = ET.parse('BASIC-SI-summary-low.xml')
-root = tree.getroot()
-waiting_times = []
-times = []
-# Get the value of the meanWaitingTime attribute from the step element
+from summary_store import load_summary
 
-for step in root.findall('step'):
-    mean_waiting_time = step.get('meanWaitingTime')
-    time = step.get('time')
-    counter = 0
-    if mean_waiting_time == '0.00':
-        waiting_times.append(float(mean_waiting_time))
-    else:
-        waiting_times.append(float(mean_waiting_time))
-    times.append(time)
-    counter += 1
+# summary output of every controller, streamed once and then read from the columnar cache
+CONTROLLERS = [
+    ('Basic', 'BASIC-SI-summary-low.xml'),
+    ('Adaptive', 'ADAPTIVE-SI-summary-low.xml'),
+    ('Actuated', 'ACTUATED-SI-summary-low.xml'),
+    ('No Rules', 'SI-summary-low.xml'),
+]
+summaries = [(label, load_summary(summary_file)) for label, summary_file in CONTROLLERS]
 
-
-tree2 = ET.parse('ADAPTIVE-SI-summary-low.xml')
-root2 = tree2.getroot()
-waiting_times2 = []
-times2 = []
-# Get the value of the meanWaitingTime attribute from the step element
-
-for step in root2.findall('step'):
-    mean_waiting_time = step.get('meanWaitingTime')
-    time = step.get('time')
-    if mean_waiting_time == '0.00':
-        waiting_times2.append(float(mean_waiting_time))
-    else:
-        waiting_times2.append(float(mean_waiting_time))
-    times2.append(time)
-
-
-
-
-tree3 = ET.parse('ACTUATED-SI-summary-low.xml')
-root3 = tree3.getroot()
-waiting_times3 = []
-times3 = []
-# Get the value of the meanWaitingTime attribute from the step element
-
-for step in root3.findall('step'):
-    mean_waiting_time = step.get('meanWaitingTime')
-    time = step.get('time')
-    if mean_waiting_time == '0.00':
-        waiting_times3.append(float(mean_waiting_time))
-    else:
-        waiting_times3.append(float(mean_waiting_time))
-    times3.append(time)
-
-    
-tree4 = ET.parse('SI-summary-low.xml')
-root4 = tree4.getroot()
-waiting_times4 = []
-times4 = []
-# Get the value of the meanWaitingTime attribute from the step element
-
-for step in root4.findall('step'):
-    mean_waiting_time = step.get('meanWaitingTime')
-    time = step.get('time')
-    if mean_waiting_time == '0.00':
-        waiting_times4.append(float(mean_waiting_time))
-    else:
-        waiting_times4.append(float(mean_waiting_time))
-    times4.append(time)
-
-
-
-
-
-print(waiting_times[1200])
-print(waiting_times2[1200])
-print(waiting_times3[1200])
+for label, summary in summaries[:3]:
+    print(summary['meanWaitingTime'][1200])
 
 
 
@@ -92,10 +29,8 @@ ax.set_xticklabels(['300', '600', '900', '1200', '1500', '1800'])
 
 
 
-ax.plot(times, waiting_times, label='Basic')
-ax.plot(times, waiting_times2, label='Adaptive')
-ax.plot(times, waiting_times3, label='Actuated')
-ax.plot(times, waiting_times4, label='No Rules')
+for label, summary in summaries:
+    ax.plot(summary['time'], summary['meanWaitingTime'], label=label)
 
 ax.set_xlabel('time')
 ax.set_ylabel('average mean waiting time')
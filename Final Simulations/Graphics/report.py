@@ -0,0 +1,155 @@
+"""
+Comparison report of every controller on every network and demand level.
+
+The summary and tripinfo outputs are discovered by filename under the Final Simulations folder, read in parallel
+through the summary_store cache, and reduced to one row of KPIs per (controller, network, demand). The KPI table is
+written to summary.csv, with one figure of the mean waiting time of every controller per network and demand level.
+Only the figures whose inputs changed since they were drawn are drawn again.
+    python report.py [results folder] [report folder]
+"""
+import csv
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # figures are only written to files
+import matplotlib.pyplot as plt
+
+from summary_store import load_summary, load_tripinfo
+
+CONTROLLERS = ['BASIC', 'ACTUATED', 'ADAPTIVE', 'NO-RULES']
+NETWORKS = ['SI', 'ML', 'SR', 'K']
+DEMANDS = ['low', 'medium', 'heavy']
+
+CONTROLLER_LABELS = {'BASIC': 'Basic', 'ACTUATED': 'Actuated', 'ADAPTIVE': 'Adaptive', 'NO-RULES': 'No Rules'}
+
+# controller and network of the files whose name does not say it, from the folders they are in
+CONTROLLER_FOLDERS = {
+    'Practical Basic Lights': 'BASIC',
+    'Practical Actuated Lights': 'ACTUATED',
+    'Adaptive': 'ADAPTIVE',
+    'No Rules': 'NO-RULES',
+    'Graphics': 'NO-RULES',  # the copies without a controller prefix in Graphics are the no rules runs
+}
+NETWORK_FOLDERS = {
+    'simple-intersection': 'SI',
+    'multi-lane': 'ML',
+    'simple-roundabout': 'SR',
+    'kinsale': 'K',
+}
+
+# [CONTROLLER-][NETWORK-]summary|trip_info-demand.xml
+RESULT_FILE = re.compile(r'^(?:(BASIC|ACTUATED|ADAPTIVE)-)?(?:(SI|ML|SR|K)-)?(summary|trip_info)-(low|medium|heavy)\.xml$', re.IGNORECASE)
+
+KPI_FIELDS = ['controller', 'network', 'demand', 'mean_waiting_time', 'mean_halting', 'throughput',
+              'mean_duration', 'p95_duration', 'mean_time_loss', 'p95_time_loss']
+
+
+def discover(results_folder):
+    """
+    Find the summary and tripinfo output of every (controller, network, demand) cell of the results folder
+    """
+    candidates = {}
+    for folder, _, files in os.walk(results_folder):
+        parts = os.path.relpath(folder, results_folder).split(os.sep)
+        for name in files:
+            match = RESULT_FILE.match(name)
+            if match is None:
+                continue
+            controller = match.group(1) or next((CONTROLLER_FOLDERS[part] for part in parts if part in CONTROLLER_FOLDERS), None)
+            network = match.group(2) or next((NETWORK_FOLDERS[part.lower()] for part in parts if part.lower() in NETWORK_FOLDERS), None)
+            if controller is None or network is None:
+                continue
+            key = (controller.upper(), network.upper(), match.group(4).lower())
+            kind = 'summary' if match.group(3).lower() == 'summary' else 'tripinfo'
+            # the same run is sometimes copied around: prefer the folder it was simulated in, then an explicit name
+            priority = (parts[0] == 'Graphics', match.group(1) is None, match.group(2) is None, folder)
+            candidates.setdefault((key, kind), []).append((priority, os.path.join(folder, name)))
+
+    cells = {}
+    for (key, kind), paths in candidates.items():
+        cells.setdefault(key, {'summary': None, 'tripinfo': None})[kind] = min(paths)[1]
+    return cells
+
+
+def cell_kpis(key, paths):
+    """
+    Reduce the outputs of one cell to its KPIs, with the waiting time series to plot
+    """
+    controller, network, demand = key
+    kpis = dict.fromkeys(KPI_FIELDS, '')
+    kpis.update(controller=controller, network=network, demand=demand)
+    series = None
+    summary = load_summary(paths['summary']) if paths['summary'] is not None else None
+    if summary is not None and len(summary['time']) > 0:  # some runs were stopped before their first step
+        kpis['mean_waiting_time'] = np.mean(summary['meanWaitingTime'])
+        kpis['mean_halting'] = np.mean(summary['halting'])
+        series = (summary['time'], summary['meanWaitingTime'])
+    if paths['tripinfo'] is not None:
+        trips = load_tripinfo(paths['tripinfo'])
+        if len(trips['duration']) > 0:
+            kpis['throughput'] = len(trips['duration'])
+            kpis['mean_duration'] = np.mean(trips['duration'])
+            kpis['p95_duration'] = np.percentile(trips['duration'], 95)
+            kpis['mean_time_loss'] = np.mean(trips['timeLoss'])
+            kpis['p95_time_loss'] = np.percentile(trips['timeLoss'], 95)
+    return kpis, series
+
+
+def write_table(rows, table_file):
+    with open(table_file, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=KPI_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({field: '%.3f' % value if isinstance(value, float) else value for field, value in row.items()})
+
+
+def plot_waiting_times(network, demand, series, figure_file):
+    fig, ax = plt.subplots()
+    for controller, (times, waiting_times) in series.items():
+        ax.plot(times, waiting_times, label=CONTROLLER_LABELS[controller])
+    ax.set_xlabel('time')
+    ax.set_ylabel('average mean waiting time')
+    ax.set_title('%s - %s demand' % (network, demand))
+    ax.legend()
+    fig.savefig(figure_file, dpi=96)
+    plt.close(fig)
+
+
+def _is_stale(output_file, input_files):
+    if not os.path.isfile(output_file):
+        return True
+    return os.path.getmtime(output_file) < max(os.path.getmtime(path) for path in input_files)
+
+
+if __name__ == "__main__":
+    graphics_folder = os.path.dirname(os.path.abspath(__file__))
+    results_folder = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(graphics_folder)
+    report_folder = sys.argv[2] if len(sys.argv) > 2 else os.path.join(graphics_folder, 'report')
+    os.makedirs(report_folder, exist_ok=True)
+
+    cells = discover(results_folder)
+    keys = sorted(cells, key=lambda key: (NETWORKS.index(key[1]), DEMANDS.index(key[2]), CONTROLLERS.index(key[0])))
+    print("%i runs found" % len(keys))
+
+    # the XML parsing happens in the workers, and only for the files not cached yet
+    with ProcessPoolExecutor() as executor:
+        results = list(executor.map(cell_kpis, keys, [cells[key] for key in keys]))
+
+    table_file = os.path.join(report_folder, 'summary.csv')
+    write_table([kpis for kpis, _ in results], table_file)
+    print("KPIs written to", table_file)
+
+    for network in NETWORKS:
+        for demand in DEMANDS:
+            series = {key[0]: result[1] for key, result in zip(keys, results)
+                      if key[1] == network and key[2] == demand and result[1] is not None}
+            if not series:
+                continue
+            figure_file = os.path.join(report_folder, '%s-%s.png' % (network, demand.upper()))
+            if _is_stale(figure_file, [cells[(controller, network, demand)]['summary'] for controller in series]):
+                plot_waiting_times(network, demand, series, figure_file)
+                print("drawn", figure_file)
@@ -0,0 +1,86 @@
+"""
+Streaming reader of the SUMO summary and tripinfo outputs, with a columnar cache.
+
+Every XML file is read once with iterparse, clearing each element after it is read, and its columns are stored
+as numpy arrays in an .npz file of a __results_cache__ folder next to it. The cache entry is rebuilt only when the
+modification time or the size of the XML file changes, so re-plotting never parses the XML again.
+    from summary_store import load_summary, load_tripinfo
+    summary = load_summary('ADAPTIVE-SI-summary-low.xml')
+    plt.plot(summary['time'], summary['meanWaitingTime'])
+"""
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+CACHE_FOLDER = '__results_cache__'
+
+# columns kept for every <step> of a summary output and every <tripinfo> of a tripinfo output
+SUMMARY_FIELDS = ('time', 'meanWaitingTime', 'running', 'halting')
+TRIPINFO_FIELDS = ('depart', 'arrival', 'duration', 'routeLength', 'waitingTime', 'timeLoss')
+
+
+def load_summary(path):
+    """
+    Return the columns of a summary output as a dict of float arrays, one value per simulation step
+    """
+    return _load(path, 'step', SUMMARY_FIELDS)
+
+
+def load_tripinfo(path):
+    """
+    Return the columns of a tripinfo output as a dict of float arrays, one value per finished trip
+    """
+    return _load(path, 'tripinfo', TRIPINFO_FIELDS)
+
+
+def parse_records(path, tag, fields):
+    """
+    Read the given attributes of every <tag> element of a SUMO output, without keeping the tree in memory
+    """
+    columns = {field: [] for field in fields}
+    root = None
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        if root is None:
+            root = element
+        elif event == 'end' and element.tag == tag:
+            for field in fields:
+                columns[field].append(element.get(field))
+            root.clear()  # every step or trip is dropped from the tree as soon as it is read
+    return {field: np.array(values, dtype=float) for field, values in columns.items()}
+
+
+def _load(path, tag, fields):
+    stat = os.stat(path)
+    cache_file = _cache_file(path)
+    try:
+        with np.load(cache_file) as cached:
+            if cached['_mtime_ns'] == stat.st_mtime_ns and cached['_size'] == stat.st_size and all(field in cached for field in fields):
+                return {field: cached[field] for field in fields}
+    except (OSError, KeyError, ValueError):  # no cache entry yet, or an unreadable one
+        pass
+
+    columns = parse_records(path, tag, fields)
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = '%s.%i.tmp.npz' % (cache_file[:-len('.npz')], os.getpid())  # np.savez adds .npz to other names
+    np.savez(temp_file, _mtime_ns=stat.st_mtime_ns, _size=stat.st_size, **columns)
+    os.replace(temp_file, cache_file)
+    return columns
+
+
+def _cache_file(path):
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, CACHE_FOLDER, name + '.npz')
+
+
+if __name__ == "__main__":
+    # fill the cache of every summary and tripinfo output found under the given folders
+    #    python summary_store.py "../Adaptive" "../Practical Basic Lights"
+    for root_folder in sys.argv[1:] or ['.']:
+        for folder, _, files in os.walk(root_folder):
+            for name in sorted(files):
+                if name.endswith('.xml') and '-summary-' in name:
+                    print(name, len(load_summary(os.path.join(folder, name))['time']), 'steps')
+                elif name.endswith('.xml') and 'trip_info' in name:
+                    print(name, len(load_tripinfo(os.path.join(folder, name))['duration']), 'trips')
@@ -0,0 +1,61 @@
+import collections
+
+import numpy as np
+
+
+def state_key(state):
+    """
+    Pack the 0/1 cells of a state into an int, 40 or 80 bits for the bundled networks
+    """
+    return int.from_bytes(np.packbits(state > 0).tobytes(), 'big')
+
+
+class ActionCache:
+    """
+    Bounded LRU map from the packed state to the action the model chose for it, so that a state seen before
+    costs a dict lookup instead of a forward pass. Only valid for one version of the weights of the model
+    """
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self._actions = collections.OrderedDict()  # packed state -> action, least recently used first
+        self._model_version = None
+        self.hits = 0
+        self.misses = 0
+
+
+    def validate(self, model_version):
+        """
+        Drop every action when the model was reloaded since they were cached
+        """
+        if model_version != self._model_version:
+            self._actions.clear()
+            self._model_version = model_version
+
+
+    def get(self, key):
+        """
+        Return the cached action of a packed state, or None
+        """
+        action = self._actions.get(key)
+        if action is None:
+            self.misses += 1
+            return None
+        self._actions.move_to_end(key)
+        self.hits += 1
+        return action
+
+
+    def put(self, key, action):
+        self._actions[key] = action
+        if len(self._actions) > self._capacity:
+            self._actions.popitem(last=False)
+
+
+    def __len__(self):
+        return len(self._actions)
+
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,104 @@
+"""
+Forward passes and inference time of a testing episode with and without the LRU action cache of the controller,
+on simple-intersection and kinsale at three demand levels, with a check that the cache changes no action and
+that reloading the model empties it. Uses a fresh network built from config.ini, saved to a temporary model folder.
+
+Runs a real headless sumo, so it needs SUMO_HOME:
+    python benchmarks/bench_action_cache.py
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+NETWORKS = [1, 3]  # simple-intersection and kinsale
+DEMAND_LEVELS = {'sparse': 50, 'low': 200, 'medium': 400}
+CACHE_SIZES = [0, 256, 4096]
+MAX_STEPS = 1800
+SEED = 2
+
+
+class TimedModel:
+    """
+    Count the forward passes of a model and the time spent in them
+    """
+    def __init__(self, model):
+        self._model = model
+        self.calls = 0
+        self.seconds = 0.0
+
+
+    def _timed(self, predict, states):
+        start_time = timeit.default_timer()
+        q_values = predict(states)
+        self.seconds += timeit.default_timer() - start_time
+        self.calls += 1
+        return q_values
+
+
+    def predict_one(self, state):
+        return self._timed(self._model.predict_one, state)
+
+
+    def predict_batch(self, states):
+        return self._timed(self._model.predict_batch, states)
+
+
+    @property
+    def version(self):
+        return self._model.version
+
+
+def run_episode(model, network, n_cars, cache_size):
+    simulation = Simulation(model, TrafficGenerator(network, MAX_STEPS, n_cars, route_dir), network, sumo_cmd, MAX_STEPS, 10, 4,
+                            config['num_states'], network.num_actions, True, True, action_cache_size=cache_size)
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run(SEED)
+    return simulation
+
+
+if __name__ == "__main__":
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_dir)
+    os.chdir(repo_dir)
+
+    from generator import TrafficGenerator
+    from network import Network
+    from neural_net import TrainNeuralNet, TestModel
+    from testing_simulation import Simulation
+    from utils import import_train_configuration, set_sumo
+
+    config = import_train_configuration(config_file='config.ini')
+    sumo_cmd = set_sumo(False, 'sumo_config.sumocfg', MAX_STEPS) + ["--no-warnings", "true", "--tripinfo-output", os.devnull, "--summary-output", os.devnull]
+    route_dir = os.path.join('intersection', 'route_cache')
+    model_path = tempfile.mkdtemp()
+    try:
+        neural_net = TrainNeuralNet(config['num_layers'], config['width_layers'], config['batch_size'], config['learning_rate'], config['num_states'], config['num_actions'])
+        neural_net._neural_net.save(os.path.join(model_path, 'trained_model.h5'))
+        model = TestModel(config['num_states'], model_path)
+
+        print(MAX_STEPS, "steps, untrained %ix%i network" % (config['num_layers'] + 1, config['width_layers']))
+        print("%20s | %6s | %6s | %8s | %8s | %8s | %12s" % ("network", "demand", "cache", "passes", "hit rate", "entries", "inference ms"))
+        for network_id in NETWORKS:
+            network = Network.load(network_id)
+            for level, n_cars in DEMAND_LEVELS.items():
+                uncached_rewards = None
+                for cache_size in CACHE_SIZES:
+                    timed_model = TimedModel(model)
+                    simulation = run_episode(timed_model, network, n_cars, cache_size)
+                    uncached_rewards = uncached_rewards or simulation.reward_episode
+                    assert simulation.reward_episode == uncached_rewards, "the cached actions differ from the model"
+                    cache = simulation.action_cache
+                    print("%20s | %6s | %6i | %8i | %7.1f%% | %8i | %12.1f" % (network.name, level, cache_size, timed_model.calls,
+                          100 * cache.hit_rate if cache else 0, len(cache) if cache else 0, timed_model.seconds * 1000))
+
+        # a reload drops the actions cached for the former weights
+        cache = simulation.action_cache
+        model.reload()
+        cache.validate(model.version)
+        assert len(cache) == 0, "the cache survived the reload of the model"
+    finally:
+        shutil.rmtree(model_path)
@@ -0,0 +1,63 @@
+"""
+Control cost of one multi-agent decision as the number of junctions grows: one predict_one per junction (before)
+against a single predict_batch of the stacked observations, with the shared network of a TestModel and of its
+numpy export, and a check that both pick the same actions.
+Uses a fresh network built from config.ini, saved to a temporary model folder:
+    python benchmarks/bench_agents.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+from neural_net import TrainNeuralNet, TestModel
+from numpy_model import NumpyTestModel, export_model
+from utils import import_train_configuration
+
+JUNCTION_COUNTS = [1, 4, 16, 64, 256]
+N_DECISIONS = 50
+
+
+def per_junction(model, states):
+    return np.array([np.argmax(model.predict_one(state)) for state in states])
+
+
+def batched(model, states):
+    return np.argmax(model.predict_batch(states), axis=1)
+
+
+def decision_ms(choose, model, decisions):
+    start_time = timeit.default_timer()
+    for states in decisions:
+        choose(model, states)
+    return (timeit.default_timer() - start_time) / len(decisions) * 1000
+
+
+if __name__ == "__main__":
+    config = import_train_configuration(config_file='config.ini')
+    model_path = tempfile.mkdtemp()
+    try:
+        neural_net = TrainNeuralNet(config['num_layers'], config['width_layers'], config['batch_size'], config['learning_rate'], config['num_states'], config['num_actions'])
+        neural_net._neural_net.save(os.path.join(model_path, 'trained_model.h5'))
+        export_model(model_path)
+        models = [("keras", TestModel(config['num_states'], model_path)), ("numpy", NumpyTestModel(config['num_states'], model_path))]
+    finally:
+        shutil.rmtree(model_path)
+
+    rng = np.random.default_rng(0)
+    print("untrained %ix%i network, %i inputs per junction" % (config['num_layers'] + 1, config['width_layers'], config['num_states']))
+    print("%10s | %6s | %18s | %18s | %8s" % ("junctions", "model", "per junction ms", "batched ms", "speedup"))
+    for num_junctions in JUNCTION_COUNTS:
+        decisions = rng.integers(0, 2, (N_DECISIONS, num_junctions, config['num_states'])).astype(np.float32)
+        for name, model in models:
+            assert np.array_equal(per_junction(model, decisions[0]), batched(model, decisions[0])), "the batch picks different actions"
+            before = decision_ms(per_junction, model, decisions)
+            after = decision_ms(batched, model, decisions)
+            print("%10i | %6s | %18.3f | %18.3f | %7.1fx" % (num_junctions, name, before, after, before / after))
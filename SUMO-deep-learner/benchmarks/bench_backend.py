@@ -0,0 +1,59 @@
+"""
+Compare the simulated steps per second of a testing episode driven through the TraCI socket and through libsumo,
+on simple-intersection and kinsale, with a random controller.
+
+Runs a real headless sumo, so it needs SUMO_HOME and the libsumo package:
+    python benchmarks/bench_backend.py
+"""
+import contextlib
+import io
+import os
+import sys
+import timeit
+import types
+
+import numpy as np
+
+NETWORKS = [1, 3]  # simple-intersection and kinsale
+MAX_STEPS = 1800
+N_CARS = 400
+SEED = 2
+REPEATS = 3
+
+
+def run_episode(Simulation, network, backend, sumo_cmd, route_dir):
+    rng = np.random.default_rng(0)  # the same decisions with both backends
+    model = types.SimpleNamespace(version=0, predict_one=lambda state: rng.random(network.num_actions))
+    simulation = Simulation(model, TrafficGenerator(network, MAX_STEPS, N_CARS, route_dir), network, sumo_cmd, MAX_STEPS, 10, 4,
+                            network.num_lane_groups * 10, network.num_actions, True, True, backend=backend)
+    start_time = timeit.default_timer()  # run() rounds its own time to 0.1s
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run(SEED)
+    return timeit.default_timer() - start_time, simulation.reward_episode
+
+
+if __name__ == "__main__":
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_dir)
+    os.chdir(repo_dir)
+
+    import traci
+    import libsumo
+    from generator import TrafficGenerator
+    from network import Network
+    from testing_simulation import Simulation
+    from utils import set_sumo
+
+    sumo_cmd = set_sumo(False, 'sumo_config.sumocfg', MAX_STEPS) + ["--no-warnings", "true", "--tripinfo-output", os.devnull, "--summary-output", os.devnull]
+    route_dir = os.path.join('intersection', 'route_cache')
+    print(MAX_STEPS, "steps,", N_CARS, "vehicles, best of", REPEATS)
+    print("%20s | %16s | %16s | %8s" % ("network", "traci steps / s", "libsumo steps / s", "speedup"))
+    for network_id in NETWORKS:
+        network = Network.load(network_id)
+        times = {}
+        for name, backend in [('traci', traci), ('libsumo', libsumo)]:
+            runs = [run_episode(Simulation, network, backend, sumo_cmd, route_dir) for _ in range(REPEATS)]
+            times[name] = min(simulation_time for simulation_time, _ in runs)
+            times[name + ' rewards'] = runs[0][1]
+        assert times['traci rewards'] == times['libsumo rewards'], "the backends simulated different episodes"
+        print("%20s | %16.0f | %16.0f | %7.1fx" % (network.name, MAX_STEPS / times['traci'], MAX_STEPS / times['libsumo'], times['traci'] / times['libsumo']))
@@ -0,0 +1,63 @@
+"""
+Time the generation of a stress test route file on the kinsale network: the table driven vectorized generator
+against the per car loop it replaced (one uniform and one randint draw and an if/elif chain per car).
+    python benchmarks/bench_generator.py [n_cars]
+"""
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)  # network files are relative to the repository
+from generator import TrafficGenerator
+from network import Network
+
+KINSALE = 3
+MAX_STEPS = 5400
+SEED = 0
+
+
+def loop_routefile(generator, seed, route_file):
+    # the generation of the route of every car as done before the route table, one car at a time
+    rng = np.random.RandomState(seed)
+    network = generator._network
+    timings = np.delete(np.sort(rng.normal(0.0, 2.0, generator._n_cars_generated)), 0)
+    min_old = math.floor(timings[1])
+    max_old = math.ceil(timings[-1])
+    car_gen_steps = np.rint((MAX_STEPS / (max_old - min_old)) * (timings - max_old) + MAX_STEPS)
+    with open(route_file, "w") as routes:
+        routes.write(generator._header)
+        for car_counter, step in enumerate(car_gen_steps):
+            if rng.uniform() < network.straight_probability:
+                route = network.straight_routes[rng.randint(1, 5) - 1]
+            else:
+                route = network.turn_routes[rng.randint(1, 9) - 1]
+            print('    <vehicle id="%s_%i" type="standard_car" route="%s" depart="%s" departLane="random" departSpeed="10" />' % (route, car_counter, route, step), file=routes)
+        print("</routes>", file=routes)
+
+
+if __name__ == "__main__":
+    n_cars = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    generator = TrafficGenerator(Network.load(KINSALE), MAX_STEPS, n_cars)
+
+    with tempfile.TemporaryDirectory() as folder:
+        route_file = os.path.join(folder, 'routes.rou.xml')
+        print("kinsale network, %i cars" % n_cars)
+        print("%14s | %10s" % ("", "ms"))
+        for name, write in [("per car loop", lambda: loop_routefile(generator, SEED, route_file)),
+                            ("vectorized", lambda: generator._write_routefile(SEED, route_file))]:
+            start = time.perf_counter()
+            write()
+            print("%14s | %10.1f" % (name, (time.perf_counter() - start) * 1000))
+
+        # the same seed always gives the same file
+        with open(route_file, 'rb') as f:
+            first = f.read()
+        generator._write_routefile(SEED, route_file)
+        with open(route_file, 'rb') as f:
+            assert f.read() == first, "route file is not reproducible"
@@ -0,0 +1,60 @@
+"""
+Per-decision latency (p50/p99) of a single state inference with keras predict and with the compiled
+tf.function path, and a check that both give the same Q-values.
+Uses a fresh network built from config.ini, or a trained model folder if one is given:
+    python benchmarks/bench_inference.py [final-models/model_2]
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+from neural_net import TrainNeuralNet, TestModel
+from utils import import_train_configuration
+
+N_DECISIONS = 300
+
+
+def latencies(predict, states):
+    seconds = []
+    for state in states:
+        start = timeit.default_timer()
+        predict(state)
+        seconds.append(timeit.default_timer() - start)
+    return np.array(seconds) * 1000
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        config = import_train_configuration(config_file=os.path.join(sys.argv[1], 'config.ini'))  # the dimensions the model was trained with
+        model = TestModel(config['num_states'], sys.argv[1])
+        fast_predict = model.predict_one
+        predict = lambda state: model._model.predict(np.reshape(state, [1, config['num_states']]), verbose=0)
+        model_name = sys.argv[1]
+    else:
+        config = import_train_configuration(config_file='config.ini')
+        model = TrainNeuralNet(config['num_layers'], config['width_layers'], config['batch_size'], config['learning_rate'], config['num_states'], config['num_actions'])
+        fast_predict = model.predict_single
+        predict = lambda state: model._neural_net.predict(np.reshape(state, [1, config['num_states']]), verbose=0)
+        model_name = "untrained %ix%i network" % (config['num_layers'] + 1, config['width_layers'])
+
+    rng = np.random.default_rng(0)
+    states = rng.integers(0, 2, (N_DECISIONS, config['num_states'])).astype(float)
+
+    # numerical parity of the two paths
+    expected = np.concatenate([predict(state) for state in states[:50]])
+    fast_predict(states[0])  # trace the graph once
+    actual = np.concatenate([fast_predict(state) for state in states[:50]])
+    assert np.allclose(expected, actual, rtol=1e-5, atol=1e-5), "compiled inference differs from predict"
+    assert np.array_equal(np.argmax(expected, axis=1), np.argmax(actual, axis=1)), "compiled inference picks different actions"
+
+    print(model_name)
+    print("%16s | %9s | %9s" % ("", "p50 ms", "p99 ms"))
+    for name, function in [("keras predict", predict), ("tf.function", fast_predict)]:
+        ms = latencies(function, states)
+        print("%16s | %9.3f | %9.3f" % (name, np.percentile(ms, 50), np.percentile(ms, 99)))
@@ -0,0 +1,92 @@
+"""
+Simulated steps per second of ParallelTrainer with 1, 2 and 4 actors on simple-intersection, each actor process running
+its own sumo instance and acting net while the learner trains the learner net, for the same episodes and training epochs.
+The actors scale with the cores left over by the learner, so the machine's core count is printed with the results.
+
+Runs a real headless sumo, so it needs SUMO_HOME:
+    python benchmarks/bench_parallel.py
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from generator import TrafficGenerator
+from network import Network
+from neural_net import TrainNeuralNet
+from parallel import Episode_buffer, ParallelTrainer
+from replay_memory import Array_replay_memory
+from training import Simulation
+from utils import import_train_configuration, set_sumo
+
+NETWORK = 1  # simple-intersection
+ACTOR_COUNTS = [1, 2, 4]
+EPISODES = 4
+TRAINING_EPOCHS = 50
+MAX_STEPS = 1800
+N_CARS = 200
+SEEDS = [0, 2, 4, 5]  # the route generator gives the other seeds of 200 cars negative departure times
+
+
+class SeededRoutes:
+    """
+    Route files of the episodes drawn from SEEDS instead of the episode number
+    """
+    def __init__(self, traffic_gen):
+        self._traffic_gen = traffic_gen
+
+
+    def generate_routefile(self, seed, route_file=None):
+        return self._traffic_gen.generate_routefile(seed=SEEDS[seed % len(SEEDS)], route_file=route_file)
+
+
+def build_net(config):
+    return TrainNeuralNet(config['num_layers'], config['width_layers'], config['batch_size'], config['learning_rate'],
+                          input_dimensions=config['num_states'], output_dimensions=config['num_actions'])
+
+
+def build_simulation(config, network, neural_net, replay_memory, sumo_cmd, **options):
+    routes = SeededRoutes(TrafficGenerator(network, MAX_STEPS, N_CARS, None))
+    return Simulation(neural_net, replay_memory, routes, network, sumo_cmd, config['gamma'], MAX_STEPS, config['green_duration'], config['yellow_duration'],
+                      config['num_states'], config['num_actions'], TRAINING_EPOCHS, **options)
+
+
+def build_actor(config, sumo_cmd, output_dir, actor):
+    # runs in the process of the actor, which prints nothing
+    sys.stdout = io.StringIO()
+    label = 'bench_actor_%i' % actor
+    actor_cmd = sumo_cmd + ["--tripinfo-output", os.path.join(output_dir, label + '_trip_info.xml'), "--summary-output", os.path.join(output_dir, label + '_summary.xml')]
+    acting_net = build_net(config)
+    episode_buffer = Episode_buffer()
+    simulation = build_simulation(config, Network.load(NETWORK), acting_net, episode_buffer, actor_cmd, route_file=os.path.join(output_dir, label + '_routes.rou.xml'))
+    return simulation, acting_net, episode_buffer
+
+
+def run(config, network, sumo_cmd, output_dir, num_actors):
+    learner_net = build_net(config)
+    replay_memory = Array_replay_memory(config['memory_size_max'], 100, config['num_states'])
+    trainer = ParallelTrainer(partial(build_actor, config, sumo_cmd, output_dir), num_actors, build_simulation(config, network, learner_net, replay_memory, sumo_cmd),
+                              learner_net, replay_memory, EPISODES, TRAINING_EPOCHS, MAX_STEPS)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return trainer.run()
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    config = import_train_configuration(config_file='config.ini')
+    sumo_cmd = set_sumo(False, 'sumo_config.sumocfg', MAX_STEPS) + ["--no-warnings", "true"]
+    network = Network.load(NETWORK)
+    output_dir = tempfile.mkdtemp()
+    try:
+        print("%s, %i episodes of %i steps with %i vehicles, %i training epochs per episode, %i cores" % (network.name, EPISODES, MAX_STEPS, N_CARS, TRAINING_EPOCHS, os.cpu_count()))
+        print("%8s | %10s | %8s" % ("actors", "wall s", "steps/s"))
+        for num_actors in ACTOR_COUNTS:
+            wall_time, steps_per_second = run(config, network, sumo_cmd, output_dir, num_actors)
+            print("%8i | %10.1f | %8.1f" % (num_actors, wall_time, steps_per_second))
+    finally:
+        shutil.rmtree(output_dir)
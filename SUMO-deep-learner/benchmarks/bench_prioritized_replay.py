@@ -0,0 +1,93 @@
+"""
+Sample throughput of the sum-tree Prioritized_replay_memory against the uniform Array_replay_memory, on full memories
+of 50k, 500k and 5M samples: a batch sampled with its importance-sampling weights and the priority update of that
+batch, and the cost of adding a sample. Checks that the samples are drawn in proportion to their priority.
+The 5M memory takes about 1.6GB of states.
+    python benchmarks/bench_prioritized_replay.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from replay_memory import Array_replay_memory, Prioritized_replay_memory
+
+CAPACITIES = [50000, 500000, 5000000]
+SIZE_MIN = 600
+NUM_STATES = 40
+BATCH_SIZE = 100
+REPEATS = 2000
+CHECK_SLOTS = 8
+CHECK_BATCHES = 5000
+
+
+def fill(memory, rng):
+    # every slot holds a sample, with a random priority: writing the arrays directly spares millions of add_sample calls
+    capacity = len(memory._actions)
+    memory._size = capacity
+    if memory.prioritized:
+        memory._tree.update(np.arange(capacity), rng.exponential(size=capacity))
+
+
+def random_sample(rng):
+    return (rng.integers(0, 2, NUM_STATES).astype(float), int(rng.integers(0, 2)), float(rng.normal()), rng.integers(0, 2, NUM_STATES).astype(float))
+
+
+def prioritized_step(memory, rng):
+    # what Simulation._replay does with a prioritized memory, without the net
+    _, _, _, _, indices, weights, writes = memory.get_samples(BATCH_SIZE)
+    memory.update_priorities(indices, rng.normal(0, 50, len(indices)), writes)
+
+
+def check_proportions(rng):
+    """
+    Sample a small memory many times and compare how often each slot comes out with its share of the priorities
+    """
+    memory = Prioritized_replay_memory(CHECK_SLOTS, 1, NUM_STATES, alpha=1.0, epsilon=0.0)
+    for _ in range(CHECK_SLOTS):
+        memory.add_sample(random_sample(rng))
+    td_errors = np.arange(1, CHECK_SLOTS + 1, dtype=float)
+    memory.update_priorities(np.arange(CHECK_SLOTS), td_errors, np.ones(CHECK_SLOTS, dtype=np.int64))
+    counts = np.zeros(CHECK_SLOTS)
+    for _ in range(CHECK_BATCHES):
+        _, _, _, _, indices, weights, _ = memory.get_samples(1)
+        counts[indices] += 1
+    expected = td_errors / td_errors.sum()
+    assert np.allclose(counts / CHECK_BATCHES, expected, atol=0.02), "the sampling does not follow the priorities"
+    assert weights.max() == 1.0, "the importance-sampling weights are not normalized"
+
+
+def check_overwrites(rng):
+    """
+    A slot that a new sample took between the sampling of a batch and its priority update keeps the priority of the new sample
+    """
+    memory = Prioritized_replay_memory(CHECK_SLOTS, 1, NUM_STATES)
+    for _ in range(CHECK_SLOTS):
+        memory.add_sample(random_sample(rng))
+    _, _, _, _, indices, _, writes = memory.get_samples(CHECK_SLOTS)
+    memory.add_sample(random_sample(rng))  # takes the oldest slot, 0
+    memory.update_priorities(indices, np.zeros(len(indices)), writes)
+    priorities = memory._tree.get(np.arange(CHECK_SLOTS))
+    assert priorities[0] == memory._max_priority and np.all(priorities[1:] < memory._max_priority), "the new sample got the priority of the replayed one"
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    check_proportions(rng)
+    check_overwrites(rng)
+    sample = random_sample(rng)
+
+    print("full memories, batches of %i, %i repeats" % (BATCH_SIZE, REPEATS))
+    print("%10s | %26s | %14s | %14s | %16s" % ("capacity", "", "add_sample us", "batch us", "batches/s"))
+    for capacity in CAPACITIES:
+        for name, memory, step in [
+            ("Array_replay_memory", Array_replay_memory(capacity, SIZE_MIN, NUM_STATES), lambda memory: memory.get_samples(BATCH_SIZE)),
+            ("Prioritized_replay_memory", Prioritized_replay_memory(capacity, SIZE_MIN, NUM_STATES), lambda memory: prioritized_step(memory, rng)),
+        ]:
+            fill(memory, rng)
+            add_seconds = timeit.timeit(lambda: memory.add_sample(sample), number=REPEATS) / REPEATS
+            batch_seconds = timeit.timeit(lambda: step(memory), number=REPEATS) / REPEATS
+            print("%10i | %26s | %14.2f | %14.2f | %16.0f" % (capacity, name, add_seconds * 1e6, batch_seconds * 1e6, 1 / batch_seconds))
+            del memory
@@ -0,0 +1,80 @@
+"""
+Replay steps per second of Simulation._replay against the previous per-sample Bellman loop,
+with the network and batch size of config.ini and a replay memory filled with random samples.
+    python benchmarks/bench_replay.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)  # config.ini is read from the working directory
+
+from network import Network
+from neural_net import TrainNeuralNet
+from replay_memory import Array_replay_memory
+from training import Simulation
+from utils import import_train_configuration
+from bench_replay_memory import Replay_memory
+
+N_SAMPLES = 5000
+REPLAY_STEPS = 100
+
+
+def legacy_replay(neural_net, memory, gamma, num_states, num_actions):
+    # Simulation._replay before it was vectorized, with the list based memory it used
+    batch = memory.get_samples(neural_net.batch_size)
+    if len(batch) > 0:
+        states = np.array([val[0] for val in batch])
+        next_states = np.array([val[3] for val in batch])
+
+        qsa = neural_net._neural_net.predict(states, verbose=0)
+        qsa_next = neural_net._neural_net.predict(next_states, verbose=0)
+
+        x = np.zeros((len(batch), num_states))
+        y = np.zeros((len(batch), num_actions))
+
+        for i, b in enumerate(batch):
+            state, action, reward, _ = b[0], b[1], b[2], b[3]
+            current_q = qsa[i]
+            current_q[action] = reward + gamma * np.amax(qsa_next[i])
+            x[i] = state
+            y[i] = current_q
+
+        neural_net._neural_net.fit(x, y, epochs=1, verbose=0)
+
+
+if __name__ == "__main__":
+    config = import_train_configuration(config_file='config.ini')
+    neural_net = TrainNeuralNet(
+        config['num_layers'],
+        config['width_layers'],
+        config['batch_size'],
+        config['learning_rate'],
+        input_dimensions=config['num_states'],
+        output_dimensions=config['num_actions']
+    )
+
+    rng = np.random.default_rng(0)
+    list_memory = Replay_memory(config['memory_size_max'], config['memory_size_min'])
+    array_memory = Array_replay_memory(config['memory_size_max'], config['memory_size_min'], config['num_states'])
+    for _ in range(N_SAMPLES):
+        sample = (rng.integers(0, 2, config['num_states']).astype(float), int(rng.integers(0, config['num_actions'])), float(rng.normal(0, 50)), rng.integers(0, 2, config['num_states']).astype(float))
+        list_memory.add_sample(sample)
+        array_memory.add_sample(sample)
+
+    simulation = Simulation(neural_net, array_memory, None, Network.load(config['networkID']), [], config['gamma'], config['max_steps'], config['green_duration'], config['yellow_duration'], config['num_states'], config['num_actions'], config['training_epochs'])
+
+    legacy = lambda: legacy_replay(neural_net, list_memory, config['gamma'], config['num_states'], config['num_actions'])
+    legacy()  # warm up the predict and train functions
+    simulation._replay()
+
+    legacy_seconds = timeit.timeit(legacy, number=REPLAY_STEPS)
+    vectorized_seconds = timeit.timeit(simulation._replay, number=REPLAY_STEPS)
+    print("batch size %i, %i replay steps" % (config['batch_size'], REPLAY_STEPS))
+    print("per-sample loop: %8.1f replay steps/s" % (REPLAY_STEPS / legacy_seconds))
+    print("vectorized:      %8.1f replay steps/s" % (REPLAY_STEPS / vectorized_seconds))
+    print("one episode of %i epochs: %.1f s -> %.1f s" % (config['training_epochs'], config['training_epochs'] * legacy_seconds / REPLAY_STEPS, config['training_epochs'] * vectorized_seconds / REPLAY_STEPS))
@@ -0,0 +1,90 @@
+"""
+Compare the list based Replay_memory, the memory of the training loop before Array_replay_memory and kept here as the
+reference, with the ring buffer Array_replay_memory, on a full memory: the cost of adding a sample (with eviction)
+and of getting a batch ready to train.
+    python benchmarks/bench_replay_memory.py
+"""
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from replay_memory import Array_replay_memory
+
+SIZE_MAX = 50000
+SIZE_MIN = 600
+NUM_STATES = 40
+BATCH_SIZE = 100
+REPEATS = 2000
+
+
+class Replay_memory:
+    def __init__(self, size_max, size_min):
+        self._samples = []
+        self._size_max = size_max
+        self._size_min = size_min
+
+
+    def add_sample(self, sample):
+        # adds state/action/reward sample into memory
+        self._samples.append(sample)
+        # if memory is full, remove oldest element
+        if self._size_now() > self._size_max:
+            self._samples.pop(0)
+
+
+    def get_samples(self, n):
+        # get samples from memory
+        if self._size_now() < self._size_min:
+            return []
+
+        if n > self._size_now():
+            return random.sample(self._samples, self._size_now())  # get all the samples
+        else:
+            return random.sample(self._samples, n)  # get "batch size" number of samples
+
+
+    def _size_now(self):
+        return len(self._samples)
+
+
+def fill(memory, rng):
+    for _ in range(SIZE_MAX):
+        memory.add_sample(random_sample(rng))
+
+
+def random_sample(rng):
+    return (rng.integers(0, 2, NUM_STATES).astype(float), int(rng.integers(0, 2)), float(rng.normal()), rng.integers(0, 2, NUM_STATES).astype(float))
+
+
+def list_batch(memory):
+    # what Simulation._replay had to do with the samples of Replay_memory
+    batch = memory.get_samples(BATCH_SIZE)
+    states = np.array([val[0] for val in batch])
+    actions = np.array([val[1] for val in batch])
+    rewards = np.array([val[2] for val in batch])
+    next_states = np.array([val[3] for val in batch])
+    return states, actions, rewards, next_states
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    sample = random_sample(rng)
+
+    list_memory = Replay_memory(SIZE_MAX, SIZE_MIN)
+    array_memory = Array_replay_memory(SIZE_MAX, SIZE_MIN, NUM_STATES)
+    fill(list_memory, rng)
+    fill(array_memory, rng)
+
+    print("full memory of %i samples, batches of %i" % (SIZE_MAX, BATCH_SIZE))
+    print("%22s | %14s | %14s" % ("", "add_sample us", "batch us"))
+    for name, memory, get_batch in [
+        ("Replay_memory", list_memory, list_batch),
+        ("Array_replay_memory", array_memory, lambda memory: memory.get_samples(BATCH_SIZE)),
+    ]:
+        add_seconds = timeit.timeit(lambda: memory.add_sample(sample), number=REPEATS) / REPEATS
+        batch_seconds = timeit.timeit(lambda: get_batch(memory), number=REPEATS) / REPEATS
+        print("%22s | %14.2f | %14.2f" % (name, add_seconds * 1e6, batch_seconds * 1e6))
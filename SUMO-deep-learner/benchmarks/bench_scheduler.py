@@ -0,0 +1,98 @@
+"""
+Compare the decision scheduler of a testing episode on the fixed grid of green_duration with the event driven one,
+on simple-intersection and kinsale: inferences (and those spared by an unchanged observation), TraCI round-trips,
+average queue length and reward. The controller is a longest-queue rule written as a linear model of the
+state, so that both schedulers are judged by the same sensible policy.
+
+Runs a real headless sumo, so it needs SUMO_HOME:
+    python benchmarks/bench_scheduler.py
+"""
+import contextlib
+import io
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+NETWORKS = [1, 3]  # simple-intersection and kinsale
+MAX_STEPS = 1800
+N_CARS = 400
+SEED = 2
+NEAR_CELLS = 5  # the cells within 40m of the stop line count as the queue of a lane group
+SCHEDULERS = [("fixed grid", None), ("event driven", {'event_driven': True, 'min_green': 10, 'max_green': 40, 'check_interval': 1})]
+
+
+class LongestQueueModel:
+    """
+    Q-value of every action = occupied cells near the stop line of the lane groups it turns green
+    """
+    def __init__(self, network, num_states):
+        self.version = 0  # the weights never change
+        self._weights = np.zeros((num_states, network.num_actions), dtype=np.float32)
+        agent, = network.agents()
+        for action, phase in enumerate(network.green_phases):
+            green_lanes = read_green_lanes(network.net_file, network.tl_ids, phase)
+            for group, lanes in enumerate(agent.lane_groups):
+                if any(lane_id in green_lanes for lane_id in lanes):
+                    self._weights[group * 10:group * 10 + NEAR_CELLS, action] = 1
+
+
+    def predict_one(self, state):
+        return self.predict_batch(np.reshape(state, [1, -1]))
+
+
+    def predict_batch(self, states):
+        return np.asarray(states, dtype=np.float32) @ self._weights
+
+
+def read_green_lanes(net_file, tl_ids, phase):
+    """
+    Lanes with a green link in the given phase of their traffic light
+    """
+    phase_states = {}
+    links = []
+    for _, element in ET.iterparse(net_file):
+        if element.tag == 'tlLogic' and element.get('id') in tl_ids:
+            phase_states[element.get('id')] = [tl_phase.get('state') for tl_phase in element.findall('phase')]
+        elif element.tag == 'connection' and element.get('tl') in tl_ids:
+            links.append((element.get('tl'), int(element.get('linkIndex')), '%s_%s' % (element.get('from'), element.get('fromLane'))))
+    return {lane_id for tl_id, link, lane_id in links if phase_states[tl_id][phase][link] in 'Gg'}
+
+
+def run_episode(Simulation, network, sumo_cmd, route_dir, scheduler):
+    num_states = network.num_lane_groups * 10
+    simulation = Simulation(LongestQueueModel(network, num_states), TrafficGenerator(network, MAX_STEPS, N_CARS, route_dir), network, sumo_cmd,
+                            MAX_STEPS, 10, 4, num_states, network.num_actions, True, True, scheduler=scheduler)
+    round_trips = []
+    send_exact = traci.connection.Connection._sendExact
+    traci.connection.Connection._sendExact = lambda connection: (round_trips.append(1), send_exact(connection))[1]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation.run(SEED)
+    finally:
+        traci.connection.Connection._sendExact = send_exact
+    return simulation, len(round_trips)
+
+
+if __name__ == "__main__":
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_dir)
+    os.chdir(repo_dir)
+
+    import traci
+    from generator import TrafficGenerator
+    from network import Network
+    from testing_simulation import Simulation
+    from utils import set_sumo
+
+    sumo_cmd = set_sumo(False, 'sumo_config.sumocfg', MAX_STEPS) + ["--no-warnings", "true", "--tripinfo-output", os.devnull, "--summary-output", os.devnull]
+    route_dir = os.path.join('intersection', 'route_cache')
+    print(MAX_STEPS, "steps,", N_CARS, "vehicles, longest-queue controller")
+    print("%20s | %12s | %10s | %8s | %8s | %10s | %12s" % ("network", "scheduler", "inferences", "reused", "trips", "avg queue", "reward"))
+    for network_id in NETWORKS:
+        network = Network.load(network_id)
+        for name, scheduler in SCHEDULERS:
+            simulation, round_trips = run_episode(Simulation, network, sumo_cmd, route_dir, scheduler)
+            print("%20s | %12s | %10i | %8i | %8i | %10.2f | %12.0f" % (network.name, name, simulation.scheduler.inferences, simulation.scheduler.reused_inferences,
+                  round_trips, np.mean(simulation.queue_length_episode), np.sum(simulation.reward_episode)))
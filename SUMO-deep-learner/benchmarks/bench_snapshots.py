@@ -0,0 +1,63 @@
+"""
+Compare the wall time of a testing episode that simulates its warm-up steps with one restored from their snapshot,
+on simple-intersection and kinsale, and check that the episode saving the snapshot and a later one restoring it
+go on with the same rewards and queue lengths.
+
+Runs a real headless sumo, so it needs SUMO_HOME:
+    python benchmarks/bench_snapshots.py
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import types
+
+import numpy as np
+
+NETWORKS = [1, 3]  # simple-intersection and kinsale
+WARMUP_STEPS = [300, 900]
+MAX_STEPS = 1800
+N_CARS = 400
+SEED = 2
+
+
+def run_episode(Simulation, network, sumo_cmd, route_dir, warmup_steps, snapshot_dir):
+    rng = np.random.default_rng(0)  # the same decisions in both episodes
+    model = types.SimpleNamespace(version=0, predict_one=lambda state: rng.random(network.num_actions))
+    simulation = Simulation(model, TrafficGenerator(network, MAX_STEPS, N_CARS, route_dir), network, sumo_cmd, MAX_STEPS, 10, 4,
+                            network.num_lane_groups * 10, network.num_actions, True, True, warmup_steps=warmup_steps, snapshot_dir=snapshot_dir)
+    start_time = timeit.default_timer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run(SEED)
+    return timeit.default_timer() - start_time, simulation.reward_episode, simulation.queue_length_episode
+
+
+if __name__ == "__main__":
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_dir)
+    os.chdir(repo_dir)
+
+    from generator import TrafficGenerator
+    from network import Network
+    from testing_simulation import Simulation
+    from utils import set_sumo
+
+    sumo_cmd = set_sumo(False, 'sumo_config.sumocfg', MAX_STEPS) + ["--no-warnings", "true", "--tripinfo-output", os.devnull, "--summary-output", os.devnull]
+    route_dir = os.path.join('intersection', 'route_cache')
+    print(MAX_STEPS, "steps,", N_CARS, "vehicles")
+    print("%20s | %8s | %12s | %12s" % ("network", "warm-up", "simulated s", "restored s"))
+    for network_id in NETWORKS:
+        network = Network.load(network_id)
+        for warmup_steps in WARMUP_STEPS:
+            simulated_time, _, _ = run_episode(Simulation, network, sumo_cmd, route_dir, warmup_steps, None)
+            snapshot_dir = tempfile.mkdtemp()
+            try:
+                _, saved_rewards, saved_queues = run_episode(Simulation, network, sumo_cmd, route_dir, warmup_steps, snapshot_dir)
+                restored_time, restored_rewards, restored_queues = run_episode(Simulation, network, sumo_cmd, route_dir, warmup_steps, snapshot_dir)
+            finally:
+                shutil.rmtree(snapshot_dir)
+            assert saved_rewards == restored_rewards and np.array_equal(saved_queues, restored_queues), "the restored episode went differently"
+            print("%20s | %8i | %12.2f | %12.2f" % (network.name, warmup_steps, simulated_time, restored_time))
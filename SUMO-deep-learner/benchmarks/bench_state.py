@@ -0,0 +1,62 @@
+"""
+Count the TraCI round-trips made by Simulation._get_state for a single decision, with the
+per-vehicle getters (before) and with the road and vehicle subscriptions (after), once the vehicles are subscribed.
+
+Runs against an in-memory mock of traci, on the network selected by networkID in config.ini:
+    python benchmarks/bench_state.py
+"""
+import timeit
+import types
+
+import numpy as np
+
+from mock_traci import MockTraCI
+
+# lanes where vehicles are spawned, for every networkID: the incoming lanes plus one outgoing lane
+NETWORK_LANES = {
+    0: ["W2TL_0", "W2TL_1", "W2TL_2", "W2TL_3", "N2TL_0", "N2TL_1", "N2TL_2", "N2TL_3",
+        "E2TL_0", "E2TL_1", "E2TL_2", "E2TL_3", "S2TL_0", "S2TL_1", "S2TL_2", "S2TL_3", "TL2N_0"],
+    1: ["E3_0", "E5_0", "E4_0", "E6_0", "-E3_0"],
+    2: ["-E0_0", "-E1_0", "-E2_0", "-E3_0", "E10_0"],
+    3: ["E9_0", "E9_1", "E9_2", "E10_0", "E10_1", "E11_0", "E11_1", "E11_2", "E8_0", "E8_1", "E8_2", "E21_0"],
+}
+VEHICLE_COUNTS = [50, 200, 1000]
+REPEATS = 20
+
+
+def measure(simulation, traci_mock):
+    traci_mock.round_trips = 0
+    state = simulation._get_state()
+    round_trips = traci_mock.round_trips
+    seconds = timeit.timeit(simulation._get_state, number=REPEATS) / REPEATS
+    return state, round_trips, seconds
+
+
+if __name__ == "__main__":
+    traci_mock = MockTraCI()
+    traci_mock.install()
+
+    from training import Simulation
+    from network import Network
+    from utils import import_train_configuration
+
+    networkID = import_train_configuration(config_file='config.ini')['networkID']
+    network = Network.load(networkID)
+    num_states = 80 if networkID == 0 else 40
+    neural_net = types.SimpleNamespace(batch_size=1)  # the state extraction never queries the net
+    print("networkID", networkID)
+    print("%10s | %24s | %24s" % ("vehicles", "getters: trips / ms", "subscriptions: trips / ms"))
+    for n_vehicles in VEHICLE_COUNTS:
+        traci_mock.reset(NETWORK_LANES[networkID], n_vehicles)
+
+        before = Simulation(neural_net, None, None, network, [], 0.75, 1800, 10, 4, num_states, 2, 0, use_subscriptions=False)
+        before._traffic.start(traci_mock)  # once per episode
+        state_before, trips_before, seconds_before = measure(before, traci_mock)
+
+        after = Simulation(neural_net, None, None, network, [], 0.75, 1800, 10, 4, num_states, 2, 0, use_subscriptions=True)
+        after._traffic.start(traci_mock)  # once per episode
+        after._get_state()  # subscribes to the vehicles, once each
+        state_after, trips_after, seconds_after = measure(after, traci_mock)
+
+        assert np.array_equal(state_before, state_after), "subscription state differs from the getter state"
+        print("%10i | %14i / %7.3f | %14i / %7.3f" % (n_vehicles, trips_before, seconds_before * 1000, trips_after, seconds_after * 1000))
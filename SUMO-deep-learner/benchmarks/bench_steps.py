@@ -0,0 +1,68 @@
+"""
+Count the TraCI round-trips of a whole training episode on every bundled network: with a halting number getter per
+incoming road after every step (before), with the halting numbers sent along by the edge subscriptions, and in fast mode
+(step_metrics = False), where every green or yellow phase is simulated by a single simulationStep(time).
+Checks that the queue lengths of the fast mode, read back from the queue output, match those of every step.
+
+Runs against an in-memory mock of traci, so the times only show the work done in python:
+    python benchmarks/bench_steps.py
+"""
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import timeit
+import types
+
+import numpy as np
+
+from mock_traci import MockTraCI
+from bench_state import NETWORK_LANES
+
+N_VEHICLES = 200
+MAX_STEPS = 1800
+EPSILON = 0.5  # half of the decisions change the phase, with a yellow phase in between
+MODES = [("getters, every step", False, True), ("subscriptions, every step", True, True), ("subscriptions, fast mode", True, False)]
+
+
+def run_episode(simulation, traci_mock, lanes):
+    traci_mock.reset(lanes, N_VEHICLES)
+    random.seed(0)
+    start_time = timeit.default_timer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run_episode(0, EPSILON)
+    return traci_mock.round_trips, timeit.default_timer() - start_time
+
+
+if __name__ == "__main__":
+    traci_mock = MockTraCI()
+    traci_mock.install()
+
+    from training import Simulation
+    from network import Network
+
+    output_dir = tempfile.mkdtemp()  # the fast mode writes its queue output next to the summary output
+    sumo_cmd = ["--summary-output", os.path.join(output_dir, 'summary.xml')]
+    try:
+        print(MAX_STEPS, "steps,", N_VEHICLES, "vehicles")
+        print("%8s | %26s | %8s | %8s | %8s" % ("network", "", "trips", "ms", "fewer"))
+        for networkID in sorted(NETWORK_LANES):
+            network = Network.load(networkID)
+            num_states = network.num_lane_groups * 10
+            neural_net = types.SimpleNamespace(batch_size=1, version=0, predict_single=lambda state: np.zeros(network.num_actions))
+            replay_memory = types.SimpleNamespace(add_sample=lambda sample: None)
+            traffic_gen = types.SimpleNamespace(generate_routefile=lambda seed, route_file=None: 'routes.rou.xml')
+            trips_before = None
+            queue_lengths = set()
+            for name, use_subscriptions, step_metrics in MODES:
+                simulation = Simulation(neural_net, replay_memory, traffic_gen, network, sumo_cmd, 0.75, MAX_STEPS, 10, 4, num_states,
+                                        network.num_actions, 0, use_subscriptions=use_subscriptions, step_metrics=step_metrics)
+                round_trips, seconds = run_episode(simulation, traci_mock, NETWORK_LANES[networkID])
+                trips_before = trips_before or round_trips
+                queue_lengths.add(simulation.cumulative_wait_store[-1])
+                print("%8i | %26s | %8i | %8.1f | %7.1fx" % (networkID, name, round_trips, seconds * 1000, trips_before / round_trips))
+            assert len(queue_lengths) == 1, "the queue lengths differ between the modes"
+    finally:
+        shutil.rmtree(output_dir)
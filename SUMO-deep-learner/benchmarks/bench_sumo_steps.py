@@ -0,0 +1,66 @@
+"""
+Wall time of a testing episode on every bundled network, driven through TraCI with the per-vehicle getters after every
+step, with the subscriptions after every step, and with the subscriptions in fast mode (step_metrics = False),
+with a random controller. The real-sumo counterpart of the round-trip counts of bench_steps.py.
+The queue column sums the queue lengths of the episode, which the fast mode reads back from its queue output.
+
+Runs a real headless sumo, so it needs SUMO_HOME:
+    python benchmarks/bench_sumo_steps.py
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import types
+
+import numpy as np
+
+NETWORKS = [0, 1, 2, 3]
+MAX_STEPS = 1800
+N_CARS = 200
+SEED = 0
+REPEATS = 3
+MODES = [("getters, every step", False, True), ("subscriptions, every step", True, True), ("subscriptions, fast mode", True, False)]
+
+
+def run_episode(Simulation, network, sumo_cmd, route_dir, use_subscriptions, step_metrics):
+    rng = np.random.default_rng(0)  # the same decisions in every mode
+    model = types.SimpleNamespace(version=0, predict_one=lambda state: rng.random(network.num_actions))
+    simulation = Simulation(model, TrafficGenerator(network, MAX_STEPS, N_CARS, route_dir), network, sumo_cmd, MAX_STEPS, 10, 4,
+                            network.num_lane_groups * 10, network.num_actions, use_subscriptions, step_metrics)
+    start_time = timeit.default_timer()  # run() rounds its own time to 0.1s
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run(SEED)
+    return timeit.default_timer() - start_time, int(np.sum(simulation.queue_length_episode))
+
+
+if __name__ == "__main__":
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_dir)
+    os.chdir(repo_dir)
+
+    from generator import TrafficGenerator
+    from network import Network
+    from testing_simulation import Simulation
+    from utils import set_sumo
+
+    output_dir = tempfile.mkdtemp()  # the fast mode writes its queue output next to the summary output
+    sumo_cmd = set_sumo(False, 'sumo_config.sumocfg', MAX_STEPS) + ["--no-warnings", "true", "--tripinfo-output", os.devnull,
+                                                                     "--summary-output", os.path.join(output_dir, 'summary.xml')]
+    route_dir = os.path.join('intersection', 'route_cache')
+    try:
+        print(MAX_STEPS, "steps,", N_CARS, "vehicles, best of", REPEATS)
+        print("%20s | %26s | %8s | %8s | %8s | %8s" % ("network", "", "s", "steps/s", "speedup", "queue"))
+        for network_id in NETWORKS:
+            network = Network.load(network_id)
+            getters_seconds = None
+            for name, use_subscriptions, step_metrics in MODES:
+                runs = [run_episode(Simulation, network, sumo_cmd, route_dir, use_subscriptions, step_metrics) for _ in range(REPEATS)]
+                seconds = min(simulation_time for simulation_time, _ in runs)
+                getters_seconds = getters_seconds or seconds
+                print("%20s | %26s | %8.2f | %8.0f | %7.1fx | %8i" % (network.name, name, seconds, MAX_STEPS / seconds, getters_seconds / seconds, runs[0][1]))
+    finally:
+        shutil.rmtree(output_dir)
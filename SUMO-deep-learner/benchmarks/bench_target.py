@@ -0,0 +1,92 @@
+"""
+Time of the Q-values of a replay batch and replay steps per second of Simulation._replay without a target network,
+with a target network queried by separate predict calls (online Q(state), online Q(next state) and target Q(next state)),
+and with the single fused call of TrainNeuralNet.predict_targets.
+Checks the fused Double DQN values against the separate calls, and that the target follows the net every
+target_sync_steps training steps or by Polyak averaging.
+    python benchmarks/bench_target.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)  # config.ini is read from the working directory
+
+from network import Network
+from neural_net import TrainNeuralNet
+from replay_memory import Array_replay_memory
+from training import Simulation
+from utils import import_train_configuration
+
+N_SAMPLES = 5000
+REPLAY_STEPS = 100
+SYNC_STEPS = 10
+TAU = 0.01
+
+
+def separate_targets(neural_net, states, next_states):
+    # Double DQN with one predict per net and batch
+    qsa = np.asarray(neural_net._neural_net.predict_on_batch(states))
+    next_actions = np.argmax(np.asarray(neural_net._neural_net.predict_on_batch(next_states)), axis=1)
+    next_q_target = np.asarray(neural_net._target_net.predict_on_batch(next_states))
+    return qsa, next_q_target[np.arange(len(next_states)), next_actions]
+
+
+def build_net(config, **target_options):
+    return TrainNeuralNet(config['num_layers'], config['width_layers'], config['batch_size'], config['learning_rate'],
+                          input_dimensions=config['num_states'], output_dimensions=config['num_actions'], **target_options)
+
+
+def max_weight_difference(neural_net):
+    return max(np.max(np.abs(weight - target_weight)) for weight, target_weight in zip(neural_net._neural_net.get_weights(), neural_net._target_net.get_weights()))
+
+
+if __name__ == "__main__":
+    config = import_train_configuration(config_file='config.ini')
+    rng = np.random.default_rng(0)
+    memory = Array_replay_memory(config['memory_size_max'], config['memory_size_min'], config['num_states'])
+    for _ in range(N_SAMPLES):
+        memory.add_sample((rng.integers(0, 2, config['num_states']).astype(float), int(rng.integers(0, config['num_actions'])), float(rng.normal(0, 50)), rng.integers(0, 2, config['num_states']).astype(float)))
+    network = Network.load(config['networkID'])
+
+    def measure(neural_net, q_values):
+        simulation = Simulation(neural_net, memory, None, network, [], config['gamma'], config['max_steps'], config['green_duration'], config['yellow_duration'], config['num_states'], config['num_actions'], config['training_epochs'])
+        simulation._replay()  # trace the graphs once
+        q_values()
+        return timeit.timeit(q_values, number=REPLAY_STEPS) / REPLAY_STEPS * 1000, REPLAY_STEPS / timeit.timeit(simulation._replay, number=REPLAY_STEPS)
+
+    # the fused call gives the values of the separate ones, once the net and its target differ
+    neural_net = build_net(config, target_sync_steps=SYNC_STEPS)
+    states, _, _, next_states = memory.get_samples(config['batch_size'])
+    neural_net.train_batch(states, rng.normal(0, 50, (len(states), config['num_actions'])))
+    qsa, next_values = neural_net.predict_targets(states, next_states)
+    expected_qsa, expected_next_values = separate_targets(neural_net, states.astype(np.float32), next_states.astype(np.float32))
+    assert np.allclose(qsa, expected_qsa, atol=1e-4) and np.allclose(next_values, expected_next_values, atol=1e-4), "the fused call differs from the separate predicts"
+
+    # hard syncs every SYNC_STEPS training steps, and Polyak averaging after each one
+    assert max_weight_difference(neural_net) > 0, "the target moved before its sync"
+    for _ in range(SYNC_STEPS - 1):
+        neural_net.train_batch(states, qsa)
+    assert max_weight_difference(neural_net) == 0, "the target was not synced"
+    soft_net = build_net(config, target_tau=TAU)
+    target_before = soft_net._target_net.get_weights()
+    soft_net.train_batch(states, qsa)
+    expected = [TAU * weight + (1 - TAU) * target_weight for weight, target_weight in zip(soft_net._neural_net.get_weights(), target_before)]
+    assert all(np.allclose(weight, expected_weight, atol=1e-6) for weight, expected_weight in zip(soft_net._target_net.get_weights(), expected)), "the target was not averaged"
+
+    states, next_states = states.astype(np.float32), next_states.astype(np.float32)
+    online_net = build_net(config)
+    separate_net = build_net(config, target_sync_steps=SYNC_STEPS)
+    separate_net.predict_targets = lambda states, next_states: separate_targets(separate_net, states, next_states)
+    fused_net = build_net(config, target_sync_steps=SYNC_STEPS)
+
+    print("batch size %i, %i replay steps" % (config['batch_size'], REPLAY_STEPS))
+    print("%28s | %10s | %14s" % ("", "Q-values ms", "replay steps/s"))
+    for name, neural_net, q_values in [("no target network", online_net, lambda: online_net.predict_batch(np.concatenate([states, next_states]))),
+                                       ("target net, separate calls", separate_net, lambda: separate_net.predict_targets(states, next_states)),
+                                       ("target net, fused call", fused_net, lambda: fused_net.predict_targets(states, next_states))]:
+        print("%28s | %10.2f | %14.1f" % ((name,) + measure(neural_net, q_values)))
@@ -0,0 +1,83 @@
+"""
+Count the TraCI round-trips made to collect the waiting times for a single decision: with the former loop over every car
+of the network (before), with the getters of the cars in the incoming roads only, and with the subscriptions. The two last
+read the waiting times along with the lanes and positions of the state, so their counts cover the vehicles read for the state too.
+Most of the fleet is spawned away from the traffic lights, on an outgoing lane.
+
+Runs against an in-memory mock of traci, on the network selected by networkID in config.ini:
+    python benchmarks/bench_waiting.py
+"""
+import timeit
+import types
+
+from mock_traci import MockTraCI
+from bench_state import NETWORK_LANES
+
+VEHICLE_COUNTS = [200, 1000, 5000]
+DECISIONS = 10
+REPEATS = 20
+
+
+def collect_every_car(traci_mock, incoming_roads, waiting_times):
+    """
+    The former _collect_waiting_times: two getters for every car of the network and a full sum
+    """
+    for car_id in traci_mock.vehicle.getIDList():
+        wait_time = traci_mock.vehicle.getAccumulatedWaitingTime(car_id)
+        road_id = traci_mock.vehicle.getRoadID(car_id)
+        if road_id in incoming_roads:
+            waiting_times[car_id] = wait_time
+        elif car_id in waiting_times:
+            del waiting_times[car_id]
+    return sum(waiting_times.values())
+
+
+def read_and_collect(simulation):
+    simulation._traffic.read_vehicles()
+    return simulation._collect_waiting_times()[0]  # a single agent
+
+
+def measure(collect, traci_mock):
+    traci_mock.round_trips = 0
+    total = collect()
+    round_trips = traci_mock.round_trips
+    seconds = timeit.timeit(collect, number=REPEATS) / REPEATS
+    return total, round_trips, seconds
+
+
+if __name__ == "__main__":
+    traci_mock = MockTraCI()
+    traci_mock.install()
+
+    from training import Simulation
+    from network import Network
+    from utils import import_train_configuration
+
+    networkID = import_train_configuration(config_file='config.ini')['networkID']
+    network = Network.load(networkID)
+    incoming_roads = set(network.incoming_edges)
+    lanes = NETWORK_LANES[networkID]
+    lanes = lanes + [lanes[-1]] * (3 * len(lanes))  # three cars out of four away from the traffic lights
+    neural_net = types.SimpleNamespace(batch_size=1)  # the waiting times never query the net
+    print("networkID", networkID)
+    print("%10s | %24s | %24s | %24s" % ("vehicles", "every car: trips / ms", "incoming: trips / ms", "subscriptions: trips / ms"))
+    for n_vehicles in VEHICLE_COUNTS:
+        traci_mock.reset(lanes, n_vehicles)
+
+        getters = Simulation(neural_net, None, None, network, [], 0.75, 1800, 10, 4, 80, 2, 0, use_subscriptions=False)
+        subscriptions = Simulation(neural_net, None, None, network, [], 0.75, 1800, 10, 4, 80, 2, 0, use_subscriptions=True)
+        getters._traffic.start(traci_mock)  # once per episode
+        subscriptions._traffic.start(traci_mock)
+        before_times = {}
+
+        for _ in range(DECISIONS):  # the running totals must follow the full sums from one decision to the next
+            for _ in range(10):
+                traci_mock.simulationStep()
+            total_before = collect_every_car(traci_mock, incoming_roads, before_times)
+            assert total_before == read_and_collect(getters) == read_and_collect(subscriptions), "running total differs from the full sum"
+
+        total_before, trips_before, seconds_before = measure(lambda: collect_every_car(traci_mock, incoming_roads, before_times), traci_mock)
+        _, trips_getters, seconds_getters = measure(lambda: read_and_collect(getters), traci_mock)
+        _, trips_subscriptions, seconds_subscriptions = measure(lambda: read_and_collect(subscriptions), traci_mock)
+        print("%10i | %14i / %7.3f | %14i / %7.3f | %14i / %7.3f" % (n_vehicles, trips_before, seconds_before * 1000,
+              trips_getters, seconds_getters * 1000, trips_subscriptions, seconds_subscriptions * 1000))
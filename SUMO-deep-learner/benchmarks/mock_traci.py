@@ -0,0 +1,167 @@
+"""
+In-memory stand-in for the traci package, used by the benchmarks to count the round-trips
+that the simulation classes would make against a real sumo server.
+
+Every getter/setter that would go over the TraCI socket increments `round_trips`, while
+reading subscription results (which sumo sends along with each simulation step) is free.
+The edgeData of the queue output of the fast mode is written on close, as sumo does.
+"""
+import os
+import random
+import sys
+import types
+import xml.etree.ElementTree as ET
+
+import traci.constants as tc
+
+
+class MockTraCI:
+    def __init__(self, lanes=(), n_vehicles=0, road_length=750, seed=0):
+        self.reset(lanes, n_vehicles, road_length, seed)
+
+        self.vehicle = _Domain(self, {
+            'getIDList': lambda: list(self._vehicles),
+            'getLaneID': lambda veh_id: self._vehicles[veh_id][tc.VAR_LANE_ID],
+            'getLanePosition': lambda veh_id: self._vehicles[veh_id][tc.VAR_LANEPOSITION],
+            'getRoadID': lambda veh_id: self._vehicles[veh_id][tc.VAR_ROAD_ID],
+            'getAccumulatedWaitingTime': lambda veh_id: self._vehicles[veh_id][tc.VAR_ACCUMULATED_WAITING_TIME],
+            'subscribe': lambda veh_id, var_ids: self._subscriptions.setdefault('vehicle', {}).__setitem__(veh_id, var_ids),
+            'unsubscribe': lambda veh_id: self._subscriptions['vehicle'].pop(veh_id),
+        }, local={
+            'getAllSubscriptionResults': self._vehicle_results,
+        })
+        self.edge = _Domain(self, {
+            'getLastStepHaltingNumber': lambda edge_id: self._halting(edge_id),
+            'getLastStepVehicleIDs': lambda edge_id: self._edge_vehicles(edge_id),
+            'subscribe': lambda edge_id, var_ids: self._subscriptions.setdefault('edge', {}).__setitem__(edge_id, var_ids),
+        }, local={
+            'getSubscriptionResults': self._edge_results,
+            'getAllSubscriptionResults': lambda: {edge_id: self._edge_results(edge_id) for edge_id in self._subscriptions.get('edge', {})},
+        })
+        self.trafficlight = _Domain(self, {
+            'setPhase': lambda tl_id, phase: None,
+        })
+        self.simulation = _Domain(self, {
+            'getTime': lambda: float(self._time),
+        })
+        self.constants = tc
+
+
+    def reset(self, lanes, n_vehicles, road_length=750, seed=0):
+        """
+        Drop every vehicle and subscription, then spawn n_vehicles at random on the given lanes
+        """
+        self.round_trips = 0
+        self._time = 0
+        self._lanes = list(lanes)
+        self._road_length = road_length
+        self._random = random.Random(seed)
+        self._vehicles = {}
+        self._subscriptions = {}
+        self._edge_data = None
+        for i in range(n_vehicles):
+            self._spawn("veh_%i" % i)
+
+
+    def install(self):
+        """
+        Make `import traci` resolve to this mock, and the repo modules importable from the benchmarks
+        """
+        module = types.ModuleType('traci')
+        for name in ('vehicle', 'edge', 'trafficlight', 'simulation', 'constants'):
+            setattr(module, name, getattr(self, name))
+        module.start = self.start
+        module.close = self.close
+        module.simulationStep = self.simulationStep
+        sys.modules['traci'] = module
+
+        repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        sys.path.insert(0, repo_dir)
+        os.chdir(repo_dir)  # the simulation modules read config.ini from the working directory
+        return module
+
+
+    def start(self, cmd, *args, **kwargs):
+        self.round_trips += 1
+        self._edge_data = None
+        if "--additional-files" in cmd:
+            additional_file = cmd[cmd.index("--additional-files") + 1]
+            edge_data = ET.parse(additional_file).find('edgeData')
+            self._edge_data = (os.path.join(os.path.dirname(additional_file), edge_data.get('file')), edge_data.get('edges').split(), [])
+
+
+    def close(self):
+        self.round_trips += 1
+        if self._edge_data is not None:
+            output_file, edge_ids, intervals = self._edge_data
+            meandata = ET.Element('meandata')
+            for time, halting in intervals:
+                interval = ET.SubElement(meandata, 'interval', begin='%.2f' % time)
+                ET.SubElement(interval, 'edge', id=edge_ids[0], waitingTime='%.2f' % halting)
+            ET.ElementTree(meandata).write(output_file)
+
+
+    def simulationStep(self, step=0):
+        """
+        One step, or every step until the given time as sumo does, in a single round-trip
+        """
+        self.round_trips += 1
+        target_time = step if step > self._time else self._time + 1
+        while self._time < target_time:
+            self._time += 1
+            for values in self._vehicles.values():
+                values[tc.VAR_LANEPOSITION] = min(values[tc.VAR_LANEPOSITION] + self._random.uniform(0, 14), self._road_length)
+                values[tc.VAR_ACCUMULATED_WAITING_TIME] += self._random.choice((0, 1))
+            if self._edge_data is not None:
+                self._edge_data[2].append((self._time - 1, sum(self._halting(edge_id) for edge_id in self._edge_data[1])))
+
+
+    def _spawn(self, veh_id):
+        lane_id = self._random.choice(self._lanes)
+        self._vehicles[veh_id] = {
+            tc.VAR_LANE_ID: lane_id,
+            tc.VAR_ROAD_ID: lane_id.rsplit('_', 1)[0],
+            tc.VAR_LANEPOSITION: self._random.uniform(0, self._road_length),
+            tc.VAR_ACCUMULATED_WAITING_TIME: 0.0,
+        }
+
+
+    def _vehicle_results(self):
+        return {veh_id: {var_id: self._vehicles[veh_id][var_id] for var_id in var_ids}
+                for veh_id, var_ids in self._subscriptions.get('vehicle', {}).items() if veh_id in self._vehicles}
+
+
+    def _edge_results(self, edge_id):
+        values = {tc.LAST_STEP_VEHICLE_HALTING_NUMBER: self._halting, tc.LAST_STEP_VEHICLE_ID_LIST: self._edge_vehicles}
+        return {var_id: values[var_id](edge_id) for var_id in self._subscriptions.get('edge', {}).get(edge_id, [])}
+
+
+    def _edge_vehicles(self, edge_id):
+        return tuple(veh_id for veh_id, values in self._vehicles.items() if values[tc.VAR_ROAD_ID] == edge_id)
+
+
+    def _halting(self, edge_id):
+        return sum(1 for values in self._vehicles.values() if values[tc.VAR_ROAD_ID] == edge_id and values[tc.VAR_LANEPOSITION] > self._road_length - 50)
+
+
+class _Domain:
+    """
+    Exposes TraCI commands as attributes, counting a round-trip for each remote call
+    """
+    def __init__(self, mock, remote, local=None):
+        self._mock = mock
+        self._remote = remote
+        self._local = local or {}
+
+
+    def __getattr__(self, name):
+        if name in self._local:
+            return self._local[name]
+        if name not in self._remote:
+            raise AttributeError(name)
+        command = self._remote[name]
+
+        def call(*args, **kwargs):
+            self._mock.round_trips += 1
+            return command(*args, **kwargs)
+        return call
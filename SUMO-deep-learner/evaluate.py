@@ -0,0 +1,157 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import csv
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from generator import TrafficGenerator
+from network import Network
+from state_encoder import CELL_EDGES
+from testing_simulation import Simulation
+from utils import import_test_configuration, import_train_configuration, set_backend, set_sumo
+
+# two-sided 95% critical values of the student t distribution, by degrees of freedom
+T_CRITICAL_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+                 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+
+
+def build_grid(config):
+    """
+    List the (model, network, demand level, seed) runs of the evaluation, each model on the network it was trained on
+    unless networks are given
+    """
+    cells = []
+    for model_n in config['eval_models']:
+        model_path = os.path.join(os.getcwd(), config['models_path_name'], 'model_' + str(model_n), '')
+        model_config = import_train_configuration(config_file=os.path.join(model_path, 'config.ini'))
+        for network_id in config['eval_networks'] or [model_config['networkID']]:
+            agents = Network.load(network_id).agents(model_config['multi_agent'])
+            if max(len(agent.lane_groups) for agent in agents) * len(CELL_EDGES) > model_config['num_states']:
+                print("skipping model %i on network %i: its state does not fit the %i inputs of the model" % (model_n, network_id, model_config['num_states']))
+                continue
+            for level, n_cars in config['eval_demand_levels'].items():
+                for seed in config['eval_seeds']:
+                    run_path = os.path.join(config['eval_path_name'], 'model_%i' % model_n, 'network_%i-%s' % (network_id, level), 'seed_%i' % seed, '')
+                    cells.append({
+                        'model': model_n, 'network': network_id, 'demand': level, 'n_cars': n_cars, 'seed': seed,
+                        'model_path': model_path, 'num_states': model_config['num_states'], 'num_actions': model_config['num_actions'],
+                        'multi_agent': model_config['multi_agent'],
+                        'run_path': run_path,
+                    })
+    return cells
+
+
+def run_cell(cell, config, sumo_cmd):
+    """
+    Evaluate one model on one network, demand level and seed, in a headless sumo with its own output files
+    """
+    network = Network.load(cell['network'])
+
+    if config['model_backend'] == 'numpy':
+        from numpy_model import NumpyTestModel
+        Model = NumpyTestModel(input_dimensions=cell['num_states'], model_path=cell['model_path'])
+    else:
+        from neural_net import TestModel
+        Model = TestModel(input_dimensions=cell['num_states'], model_path=cell['model_path'], fast_inference=config['fast_inference'])
+
+    os.makedirs(cell['run_path'], exist_ok=True)
+    sumo_cmd = sumo_cmd + [
+        "--tripinfo-output", os.path.join(cell['run_path'], 'trip_info.xml'),
+        "--summary-output", os.path.join(cell['run_path'], 'summary.xml'),
+    ]
+    # every run gets its own cached route file, named after the network, seed and number of cars
+    TrafficGen = TrafficGenerator(network, config['max_steps'], cell['n_cars'], config['route_cache_dir'] or os.path.join(config['eval_path_name'], 'routes'))
+
+    simulation = Simulation(
+        Model,
+        TrafficGen,
+        network,
+        sumo_cmd,
+        config['max_steps'],
+        config['green_duration'],
+        config['yellow_duration'],
+        cell['num_states'],
+        cell['num_actions'],
+        config['subscriptions'],
+        config['step_metrics'],
+        backend=set_backend(config['backend'], False),  # every worker is a process of its own, so each can run libsumo
+        warmup_steps=config['eval_fork_step'],
+        snapshot_dir=os.path.join(config['eval_path_name'], 'snapshots'),  # the runs of every model fork from the same state
+        multi_agent=cell['multi_agent'],  # the agents the model was trained with
+        scheduler=config['scheduler'],
+        action_cache_size=config['action_cache_size']
+    )
+    simulation_time = simulation.run(cell['seed'])
+    np.savez(os.path.join(cell['run_path'], 'episode.npz'), reward=np.array(simulation.reward_episode, dtype=float), queue_length=np.array(simulation.queue_length_episode, dtype=float))
+    return simulation_time
+
+
+def confidence_interval(samples, axis=0):
+    """
+    Mean and half width of the 95% confidence interval of the mean
+    """
+    samples = np.asarray(samples, dtype=float)
+    n = samples.shape[axis]
+    mean = np.mean(samples, axis=axis)
+    if n < 2:
+        return mean, np.zeros_like(mean)
+    t = T_CRITICAL_95[max(df for df in T_CRITICAL_95 if df <= n - 1)] if n - 1 <= 30 else 1.96
+    return mean, t * np.std(samples, axis=axis, ddof=1) / np.sqrt(n)
+
+
+def aggregate(cells, eval_path):
+    """
+    Reduce the runs of every (model, network, demand level) over their seeds, with 95% confidence intervals
+    """
+    groups = {}
+    for cell in cells:
+        episode_file = os.path.join(cell['run_path'], 'episode.npz')
+        if os.path.isfile(episode_file):
+            groups.setdefault((cell['model'], cell['network'], cell['demand']), []).append(episode_file)
+
+    rows = []
+    for (model_n, network_id, level), episode_files in sorted(groups.items()):
+        episodes = [np.load(episode_file) for episode_file in episode_files]
+        total_rewards = [np.sum(episode['reward']) for episode in episodes]
+        mean_queues = [np.mean(episode['queue_length']) for episode in episodes]
+        reward_mean, reward_ci = confidence_interval(total_rewards)
+        queue_mean, queue_ci = confidence_interval(mean_queues)
+        rows.append([model_n, network_id, level, len(episodes), reward_mean, reward_ci, queue_mean, queue_ci])
+
+        # queue length of every step, over the seeds
+        steps = min(len(episode['queue_length']) for episode in episodes)
+        queue_series_mean, queue_series_ci = confidence_interval([episode['queue_length'][:steps] for episode in episodes])
+        np.savez(os.path.join(eval_path, 'model_%i' % model_n, 'network_%i-%s.npz' % (network_id, level)), queue_length_mean=queue_series_mean, queue_length_ci=queue_series_ci)
+
+    with open(os.path.join(eval_path, 'results.csv'), 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['model', 'network', 'demand', 'seeds', 'total_reward', 'total_reward_ci95', 'queue_length', 'queue_length_ci95'])
+        for row in rows:
+            writer.writerow(row[:4] + ['%.3f' % value for value in row[4:]])
+    return rows
+
+
+if __name__ == "__main__":
+
+    config = import_test_configuration(config_file='testing_config.ini')
+    sumo_cmd = set_sumo(False, config['sumocfg_file_name'], config['max_steps'])  # always headless
+    cells = build_grid(config)
+    todo = [cell for cell in cells if not os.path.isfile(os.path.join(cell['run_path'], 'episode.npz'))]  # an interrupted evaluation resumes where it stopped
+    print('----- Evaluation: %i runs, %i left, %i workers' % (len(cells), len(todo), config['eval_workers']))
+
+    # every worker drives its own sumo through the default TraCI connection of its process
+    with ProcessPoolExecutor(config['eval_workers'], mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [(cell, executor.submit(run_cell, cell, config, sumo_cmd)) for cell in todo]
+        for cell, future in futures:
+            try:
+                print('model %(model)i network %(network)i %(demand)s seed %(seed)i:' % cell, future.result(), 's')
+            except (Exception, SystemExit) as error:  # one failed run, or a model that is missing, must not stop the rest of the evaluation
+                print('model %(model)i network %(network)i %(demand)s seed %(seed)i failed:' % cell, error)
+
+    for row in aggregate(cells, config['eval_path_name']):
+        print('model %i network %i %s (%i seeds): total reward %.1f +- %.1f, queue length %.2f +- %.2f' % tuple(row))
+    print("----- Evaluation results saved at:", os.path.join(config['eval_path_name'], 'results.csv'))
@@ -1,247 +1,120 @@
 import numpy as np
 import math
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from utils import set_phaseID
-
-config = set_phaseID(config_file='config.ini')
-
-networkID = config['networkID']
+# distribution of the departure times and version of the route drawing, part of the route cache key
+DEMAND_DISTRIBUTION = "normal(0.0, 2.0)"
+GENERATOR_VERSION = 2
 
 class TrafficGenerator:
-    def __init__(self, max_steps, n_cars_generated):
+    def __init__(self, network, max_steps, n_cars_generated, cache_dir=None):
+        self._network = network  # routes of the generated cars
         self._n_cars_generated = n_cars_generated  # how many cars per episode
         self._max_steps = max_steps
+        self._header = self._route_header(network)
+        self._cache_dir = cache_dir  # None to generate every episode into a single route file
+        self._pending = {}  # seed -> future of the route file being generated in the background
+        self._lock = threading.Lock()
+        self._executor = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+
+    def generate_routefile(self, seed, route_file=None):
+        """
+        Return the route file of one episode: from the cache when it is enabled (waiting for the background worker
+        if it is generating it), otherwise generated into route_file or into the default route file of the network
+        """
+        if self._cache_dir is None:
+            if route_file is None:
+                route_file = self._network.route_file
+            self._write_routefile(seed, route_file)
+            return route_file
+
+        with self._lock:
+            pending = self._pending.pop(seed, None)
+        if pending is not None:
+            return pending.result()
+        return self._cached_routefile(seed)
 
-        
 
-    def generate_routefile(self, seed):
+    def prefetch(self, seeds):
         """
-        Generation of the route of every car for one episode
+        Pre-generate the cached route files of the upcoming episodes in a background worker
         """
-        np.random.seed(seed)  # make tests reproducible
+        if self._cache_dir is None:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='route_generator')
+            for seed in seeds:
+                if seed not in self._pending:
+                    self._pending[seed] = self._executor.submit(self._cached_routefile, seed)
+
+
+    def _cached_routefile(self, seed):
+        route_file = os.path.join(self._cache_dir, self._cache_key(seed) + '.rou.xml')
+        if not os.path.isfile(route_file):  # repeated seeds are free
+            # write to a unique temporary file first, so that runs sharing the cache never read a half written file
+            temp_file = '%s.%i-%i.tmp' % (route_file, os.getpid(), threading.get_ident())
+            self._write_routefile(seed, temp_file)
+            os.replace(temp_file, route_file)
+        return route_file
+
+
+    def _cache_key(self, seed):
+        network = self._network
+        key = repr((network.network_id, seed, self._n_cars_generated, self._max_steps, DEMAND_DISTRIBUTION, GENERATOR_VERSION,
+                    network.routes, network.straight_routes, network.turn_routes, network.straight_probability))
+        return 'network%i-seed%i-%s' % (network.network_id, seed, hashlib.sha1(key.encode()).hexdigest()[:16])
+
+
+    @staticmethod
+    def _route_header(network):
+        """
+        Vehicle type and route definitions written at the top of every route file
+        """
+        lines = ['<routes>', '                <vType accel="1.0" decel="4.5" id="standard_car" length="5.0" minGap="2.5" maxSpeed="25" sigma="0.5" />', '']
+        lines += ['                <route id="%s" edges="%s"/>' % route for route in network.routes]
+        return '\n'.join(lines) + '\n'
+
+
+    def _write_routefile(self, seed, route_file):
+        """
+        Generation of the route of every car for one episode, drawn in a few vectorized calls from the route table
+        """
+        rng = np.random.default_rng(seed)  # make tests reproducible, without sharing the global random state between parallel simulations
 
         # the generation of cars is distributed according to a weibull distribution
         #timings = np.random.normal(0, self._n_cars_generated)
-        timings = np.random.normal(0.0, 2.0, self._n_cars_generated)
+        timings = rng.normal(0.0, 2.0, self._n_cars_generated)
         timings = np.sort(timings)
         timings = np.delete(timings, 0)
 
         # reshape the distribution to fit the interval 0:max_steps
-        car_gen_steps = []
         min_old = math.floor(timings[1])
         max_old = math.ceil(timings[-1])
         min_new = 0
         max_new = self._max_steps
-        for value in timings:
-            car_gen_steps = np.append(car_gen_steps, ((max_new - min_new) / (max_old - min_old)) * (value - max_old) + max_new)
+        car_gen_steps = ((max_new - min_new) / (max_old - min_old)) * (timings - max_old) + max_new
 
         car_gen_steps = np.rint(car_gen_steps)  # round every value to int -> effective steps when a car will be generated
 
+        # choose direction and then a random source & destination for every car at once
+        n_cars = len(car_gen_steps)
+        network = self._network
+        straight = rng.random(n_cars) < network.straight_probability
+        route_straight = rng.integers(0, len(network.straight_routes), n_cars)
+        route_turn = rng.integers(0, len(network.turn_routes), n_cars)
+        car_routes = np.where(straight, np.array(network.straight_routes)[route_straight], np.array(network.turn_routes)[route_turn])
+
         # produce the file for cars generation, one car per line
-        if networkID == 0:
-            with open("intersection/episode_routes.rou.xml", "w") as routes:
-                print("""<routes>
-                <vType accel="1.0" decel="4.5" id="standard_car" length="5.0" minGap="2.5" maxSpeed="25" sigma="0.5" />
-
-                <route id="W_N" edges="W2TL TL2N"/>
-                <route id="W_E" edges="W2TL TL2E"/>
-                <route id="W_S" edges="W2TL TL2S"/>
-                <route id="N_W" edges="N2TL TL2W"/>
-                <route id="N_E" edges="N2TL TL2E"/>
-                <route id="N_S" edges="N2TL TL2S"/>
-                <route id="E_W" edges="E2TL TL2W"/>
-                <route id="E_N" edges="E2TL TL2N"/>
-                <route id="E_S" edges="E2TL TL2S"/>
-                <route id="S_W" edges="S2TL TL2W"/>
-                <route id="S_N" edges="S2TL TL2N"/>
-                <route id="S_E" edges="S2TL TL2E"/>""", file=routes)
-
-                for car_counter, step in enumerate(car_gen_steps):
-                    straight_or_turn = np.random.uniform()
-                    if straight_or_turn < 0.75:  # choose direction: straight or turn - 75% of times the car goes straight
-                        route_straight = np.random.randint(1, 5)  # choose a random source & destination
-                        if route_straight == 1:
-                            print('    <vehicle id="W_E_%i" type="standard_car" route="W_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_straight == 2:
-                            print('    <vehicle id="E_W_%i" type="standard_car" route="E_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_straight == 3:
-                            print('    <vehicle id="N_S_%i" type="standard_car" route="N_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        else:
-                            print('    <vehicle id="S_N_%i" type="standard_car" route="S_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                    else:  # car that turn -25% of the time the car turns
-                        route_turn = np.random.randint(1, 9)  # choose random source source & destination
-                        if route_turn == 1:
-                            print('    <vehicle id="W_N_%i" type="standard_car" route="W_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 2:
-                            print('    <vehicle id="W_S_%i" type="standard_car" route="W_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 3:
-                            print('    <vehicle id="N_W_%i" type="standard_car" route="N_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 4:
-                            print('    <vehicle id="N_E_%i" type="standard_car" route="N_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 5:
-                            print('    <vehicle id="E_N_%i" type="standard_car" route="E_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 6:
-                            print('    <vehicle id="E_S_%i" type="standard_car" route="E_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 7:
-                            print('    <vehicle id="S_W_%i" type="standard_car" route="S_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 8:
-                            print('    <vehicle id="S_E_%i" type="standard_car" route="S_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                print("</routes>", file=routes)
-
-        if networkID == 1:
-            with open("intersection/episode_routes_simple-intersection.rou.xml", "w") as routes:
-                print("""<routes>
-                <vType accel="1.0" decel="4.5" id="standard_car" length="5.0" minGap="2.5" maxSpeed="25" sigma="0.5" />
-
-                <route id="W_N" edges="E3 -E5"/>
-                <route id="W_E" edges="E3 -E4"/>
-                <route id="W_S" edges="E3 -E6"/>
-                <route id="N_W" edges="E5 -E3"/>
-                <route id="N_E" edges="E5 -E4"/>
-                <route id="N_S" edges="E5 -E6"/>
-                <route id="E_W" edges="E4 -E3"/>
-                <route id="E_N" edges="E4 -E5"/>
-                <route id="E_S" edges="E4 -E6"/>
-                <route id="S_W" edges="E6 -E3"/>
-                <route id="S_N" edges="E6 -E5"/>
-                <route id="S_E" edges="E6 -E4"/>""", file=routes)
-
-                for car_counter, step in enumerate(car_gen_steps):
-                    straight_or_turn = np.random.uniform()
-                    if straight_or_turn < 0.75:  # choose direction: straight or turn - 75% of times the car goes straight
-                        route_straight = np.random.randint(1, 5)  # choose a random source & destination
-                        if route_straight == 1:
-                            print('    <vehicle id="W_E_%i" type="standard_car" route="W_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_straight == 2:
-                            print('    <vehicle id="E_W_%i" type="standard_car" route="E_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_straight == 3:
-                            print('    <vehicle id="N_S_%i" type="standard_car" route="N_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        else:
-                            print('    <vehicle id="S_N_%i" type="standard_car" route="S_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                    else:  # car that turn -25% of the time the car turns
-                        route_turn = np.random.randint(1, 9)  # choose random source source & destination
-                        if route_turn == 1:
-                            print('    <vehicle id="W_N_%i" type="standard_car" route="W_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 2:
-                            print('    <vehicle id="W_S_%i" type="standard_car" route="W_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 3:
-                            print('    <vehicle id="N_W_%i" type="standard_car" route="N_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 4:
-                            print('    <vehicle id="N_E_%i" type="standard_car" route="N_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 5:
-                            print('    <vehicle id="E_N_%i" type="standard_car" route="E_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 6:
-                            print('    <vehicle id="E_S_%i" type="standard_car" route="E_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 7:
-                            print('    <vehicle id="S_W_%i" type="standard_car" route="S_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 8:
-                            print('    <vehicle id="S_E_%i" type="standard_car" route="S_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-
-                print("</routes>", file=routes)
-
-        if networkID == 2:
-            with open("intersection/episode_routes_simple-roundabout.rou.xml", "w") as routes:
-                print("""<routes>
-                <vType accel="1.0" decel="4.5" id="standard_car" length="5.0" minGap="2.5" maxSpeed="25" sigma="0.5" />
-
-                <route id="W_N" edges="-E0 E5 E4 E3 E10"/>
-                <route id="W_E" edges="-E0 E5 E4 E20"/>
-                <route id="W_S" edges="-E0 E5 E30"/>
-                <route id="N_W" edges="-E1 E6 E00"/>
-                <route id="N_E" edges="-E1 E6 E5 E4 E20"/>
-                <route id="N_S" edges="-E1 E6 E5 E30"/>
-                <route id="E_W" edges="-E2 E3 E6 E00"/>
-                <route id="E_N" edges="-E2 E3 E10"/>
-                <route id="E_S" edges="-E2 E3 E6 E5 E30"/>
-                <route id="S_W" edges="-E3 E4 E3 E6 E00"/>
-                <route id="S_N" edges="-E3 E4 E3 E10"/>
-                <route id="S_E" edges="-E3 E4 E20"/>""", file=routes)
-                ''' add extra edges!'''
-
-                for car_counter, step in enumerate(car_gen_steps):
-                    straight_or_turn = np.random.uniform()
-                    if straight_or_turn < 0.75:  # choose direction: straight or turn - 75% of times the car goes straight
-                        route_straight = np.random.randint(1, 5)  # choose a random source & destination
-                        if route_straight == 1:
-                            print('    <vehicle id="W_E_%i" type="standard_car" route="W_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_straight == 2:
-                            print('    <vehicle id="E_W_%i" type="standard_car" route="E_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_straight == 3:
-                            print('    <vehicle id="N_S_%i" type="standard_car" route="N_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        else:
-                            print('    <vehicle id="S_N_%i" type="standard_car" route="S_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                    else:  # car that turn -25% of the time the car turns
-                        route_turn = np.random.randint(1, 9)  # choose random source source & destination
-                        if route_turn == 1:
-                            print('    <vehicle id="W_N_%i" type="standard_car" route="W_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 2:
-                            print('    <vehicle id="W_S_%i" type="standard_car" route="W_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 3:
-                            print('    <vehicle id="N_W_%i" type="standard_car" route="N_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 4:
-                            print('    <vehicle id="N_E_%i" type="standard_car" route="N_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 5:
-                            print('    <vehicle id="E_N_%i" type="standard_car" route="E_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 6:
-                            print('    <vehicle id="E_S_%i" type="standard_car" route="E_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 7:
-                            print('    <vehicle id="S_W_%i" type="standard_car" route="S_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 8:
-                            print('    <vehicle id="S_E_%i" type="standard_car" route="S_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-
-                print("</routes>", file=routes)
-
-        if networkID == 3:
-            with open("intersection/episode_routes_kinsale.rou.xml", "w") as routes:
-                print("""<routes>
-                <vType accel="1.0" decel="4.5" id="standard_car" length="5.0" minGap="2.5" maxSpeed="25" sigma="0.5" />
-
-                <route id="W_N" edges="E9 E25 E26 E21"/>
-                <route id="W_E" edges="E9 E25 E26 E27 E28 E22"/>
-                <route id="W_S" edges="E9 E25 E26 E27 E28 E29 E23"/>
-                <route id="W_3" edges="E9 E25 E26 E27 E28 E29 E30 E31 E24"/>
-                <route id="N_W" edges="E10 E26 E27 E28 E22"/>
-                <route id="N_E" edges="E10 E26 E27 E28 E29 E23"/>
-                <route id="N_S" edges="E10 E26 E27 E28 E29 E30 E31 E24"/>
-                <route id="E_W" edges="E11 E28 E29 E30 E31 E32 E25 E26 E21"/>
-                <route id="E_N" edges="E11 E28 E22"/>
-                <route id="E_3" edges="E11 E28 E29 E23"/>
-                <route id="E_S" edges="E11 E28 E29 E30 E31 E24"/>
-                <route id="S_W" edges="E8 E31 E32 E25 E26 E21"/>
-                <route id="S_3" edges="E8 E31 E32 E25 E26 E27 E28 E22"/>
-                <route id="S_N" edges="E8 E31 E32 E25 E26 E27 E28 E29 E23"/>
-                <route id="S_E" edges="E8 E31 E24"/>""", file=routes)
-
-
-                for car_counter, step in enumerate(car_gen_steps):
-                    straight_or_turn = np.random.uniform()
-                    if straight_or_turn < 0.5:  # choose direction: straight or turn - 75% of times the car goes straight
-                        route_straight = np.random.randint(1, 5)  # choose a random source & destination
-                        if route_straight == 1:
-                            print('    <vehicle id="W_E_%i" type="standard_car" route="W_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_straight == 2:
-                            print('    <vehicle id="E_W_%i" type="standard_car" route="E_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_straight == 3:
-                            print('    <vehicle id="N_S_%i" type="standard_car" route="N_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        else:
-                            print('    <vehicle id="S_N_%i" type="standard_car" route="S_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                    else:  # car that turn -25% of the time the car turns
-                        route_turn = np.random.randint(1, 9)  # choose random source source & destination
-                        if route_turn == 1:
-                            print('    <vehicle id="W_N_%i" type="standard_car" route="W_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 2:
-                            print('    <vehicle id="W_S_%i" type="standard_car" route="W_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 3:
-                            print('    <vehicle id="N_W_%i" type="standard_car" route="N_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 4:
-                            print('    <vehicle id="N_E_%i" type="standard_car" route="N_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 5:
-                            print('    <vehicle id="E_N_%i" type="standard_car" route="E_N" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 6:
-                            print('    <vehicle id="E_S_%i" type="standard_car" route="E_S" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 7:
-                            print('    <vehicle id="S_W_%i" type="standard_car" route="S_W" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-                        elif route_turn == 8:
-                            print('    <vehicle id="S_E_%i" type="standard_car" route="S_E" depart="%s" departLane="random" departSpeed="10" />' % (car_counter, step), file=routes)
-
-                print("</routes>", file=routes)
+        vehicles = ['    <vehicle id="%s_%i" type="standard_car" route="%s" depart="%s" departLane="random" departSpeed="10" />\n' % (route, car_counter, route, step)
+                    for car_counter, (route, step) in enumerate(zip(car_routes.tolist(), car_gen_steps.tolist()))]
+        with open(route_file, "w") as routes:
+            routes.write(self._header)
+            routes.write(''.join(vehicles))  # one buffered write instead of a print per car
+            routes.write("</routes>\n")
@@ -3,18 +3,63 @@ from __future__ import print_function
 
 import os
 import datetime
+from functools import partial
 from shutil import copyfile
 
 from training import Simulation
 from generator import TrafficGenerator
-from replay_memory import Replay_memory
+from network import Network
+from replay_memory import Array_replay_memory, Prioritized_replay_memory
 from neural_net import TrainNeuralNet
-from utils import import_train_configuration, set_sumo, set_train_path
+from parallel import Episode_buffer, ParallelTrainer, PipelinedTrainer
+from utils import import_train_configuration, set_backend, set_sumo, set_sumo_instance, set_train_path
 #from visualization import Visualization
 
+
+def build_actor(config, sumo_cmd, actor):
+    """
+    Simulation, acting net and episode buffer of one parallel actor, built in the process of the actor
+    """
+    network = Network.load(config['networkID'])
+    actor_cmd, route_file = set_sumo_instance(sumo_cmd, 'actor_' + str(actor))
+    Acting_model = TrainNeuralNet(
+        config['num_layers'],
+        config['width_layers'],
+        config['batch_size'],
+        config['learning_rate'],
+        input_dimensions=config['num_states'],
+        output_dimensions=config['num_actions'],
+        fast_inference=config['fast_inference']
+    )
+    Buffer = Episode_buffer()
+    simulation = Simulation(
+        Acting_model,
+        Buffer,
+        TrafficGenerator(network, config['max_steps'], config['n_cars_generated'], config['route_cache_dir']),
+        network,
+        actor_cmd,
+        config['gamma'],
+        config['max_steps'],
+        config['green_duration'],
+        config['yellow_duration'],
+        config['num_states'],
+        config['num_actions'],
+        config['training_epochs'],
+        config['subscriptions'],
+        config['step_metrics'],
+        route_file=route_file,
+        backend=set_backend(config['backend'], config['gui']),  # every actor is a process of its own, so each can run libsumo
+        warmup_steps=config['warmup_steps'],
+        multi_agent=config['multi_agent'],
+        scheduler=config['scheduler']
+    )
+    return simulation, Acting_model, Buffer
+
+
 if __name__ == "__main__":
     config = import_train_configuration(config_file='config.ini')
     sumo_cmd = set_sumo(config['gui'], config['sumocfg_file_name'], config['max_steps'])
+    Backend = set_backend(config['backend'], config['gui'])
     path = set_train_path(config['models_path_name'])
 
     Model = TrainNeuralNet(
@@ -23,47 +68,155 @@ if __name__ == "__main__":
         config['batch_size'],
         config['learning_rate'],
         input_dimensions=config['num_states'],
-        output_dimensions=config['num_actions']
+        output_dimensions=config['num_actions'],
+        fast_inference=config['fast_inference'],
+        target_sync_steps=config['target_sync_steps'],
+        target_tau=config['target_tau'],
+        double_dqn=config['double_dqn']
     )
 
-    Replay_memory = Replay_memory(
-        config['memory_size_max'],
-        config['memory_size_min']
-    )
+    if config['prioritized']:
+        Replay_memory = Prioritized_replay_memory(
+            config['memory_size_max'],
+            config['memory_size_min'],
+            config['num_states'],
+            alpha=config['priority_alpha'],
+            beta=config['priority_beta'],
+            beta_steps=config['priority_beta_steps'],
+            epsilon=config['priority_epsilon']
+        )
+    else:
+        Replay_memory = Array_replay_memory(
+            config['memory_size_max'],
+            config['memory_size_min'],
+            config['num_states']
+        )
     
+    Network = Network.load(config['networkID'])
+
     TrafficGen = TrafficGenerator(
+        Network,
         config['max_steps'], 
-        config['n_cars_generated']
+        config['n_cars_generated'],
+        config['route_cache_dir']
     )
+    TrafficGen.prefetch(range(config['total_episodes']))  # the routes of the upcoming episodes are generated in the background
 
-    Simulation = Simulation(
-        Model,
-        Replay_memory,
-        TrafficGen,
-        sumo_cmd,
-        config['gamma'],
-        config['max_steps'],
-        config['green_duration'],
-        config['yellow_duration'],
-        config['num_states'],
-        config['num_actions'],
-        config['training_epochs'],
-    )
-
-    episode = 0
     timestamp_start = datetime.datetime.now()
 
-    while episode < config['total_episodes']:
-        print('\n----- Episode', str(episode+1), 'of', str(config['total_episodes']))
-        epsilon = 1.0 - (episode / config['total_episodes'])  # set the epsilon for this episode according to epsilon-greedy policy
-        simulation_time, training_time = Simulation.run_simulation(episode, epsilon)  # run the simulation
-        print('Simulation time:', simulation_time, 's - Training time:', training_time, 's - Total:', round(simulation_time+training_time, 1), 's')
-        episode += 1
+    if config['num_actors'] > 1:
+        # parallel actors: one process per actor with its own sumo instance, sending its samples back to the learner,
+        # which only replays in this process and never starts sumo
+        Learner_simulation = Simulation(
+            Model,
+            Replay_memory,
+            TrafficGen,
+            Network,
+            sumo_cmd,
+            config['gamma'],
+            config['max_steps'],
+            config['green_duration'],
+            config['yellow_duration'],
+            config['num_states'],
+            config['num_actions'],
+            config['training_epochs'],
+            multi_agent=config['multi_agent']
+        )
+
+        Trainer = ParallelTrainer(partial(build_actor, config, sumo_cmd), config['num_actors'], Learner_simulation, Model, Replay_memory, config['total_episodes'], config['training_epochs'], config['max_steps'])
+        wall_time, throughput = Trainer.run()
+        print('\n----- Actors:', config['num_actors'], '- Wall time:', wall_time, 's - Simulated seconds per second:', round(throughput, 1))
 
         print("\n----- Start time:", timestamp_start)
         print("----- End time:", datetime.datetime.now())
         print("----- Session info saved at:", path)
-    
+
+        Model.save_neural_net(path)
+
+        copyfile(src='config.ini', dst=os.path.join(path, 'config.ini'))
+
+    elif config['pipelined']:
+        # overlap simulation and training: the actor simulates with a snapshot of the weights held by a second net
+        Acting_model = TrainNeuralNet(
+            config['num_layers'],
+            config['width_layers'],
+            config['batch_size'],
+            config['learning_rate'],
+            input_dimensions=config['num_states'],
+            output_dimensions=config['num_actions'],
+            fast_inference=config['fast_inference']
+        )
+        Buffer = Episode_buffer()
+        Simulations = [Simulation(
+            Net,
+            Memory,
+            TrafficGen,
+            Network,
+            sumo_cmd,
+            config['gamma'],
+            config['max_steps'],
+            config['green_duration'],
+            config['yellow_duration'],
+            config['num_states'],
+            config['num_actions'],
+            config['training_epochs'],
+            config['subscriptions'],
+            config['step_metrics'],
+            backend=Backend,
+            warmup_steps=config['warmup_steps'],
+            multi_agent=config['multi_agent'],
+            scheduler=config['scheduler']
+        ) for Net, Memory in [(Acting_model, Buffer), (Model, Replay_memory)]]
+
+        Trainer = PipelinedTrainer(Simulations[0], Acting_model, Simulations[1], Model, Replay_memory, Buffer, config['total_episodes'], config['training_epochs'])
+        episode_times = Trainer.run()
+        serial_time = sum(simulation_time + training_time for simulation_time, training_time, _ in episode_times)
+        wall_time = sum(wall_time for _, _, wall_time in episode_times)
+        print('\n----- Serial time:', round(serial_time, 1), 's - Pipelined wall time:', round(wall_time, 1), 's - Saved:', round(serial_time - wall_time, 1), 's')
+
+        print("\n----- Start time:", timestamp_start)
+        print("----- End time:", datetime.datetime.now())
+        print("----- Session info saved at:", path)
+
         Model.save_neural_net(path)
 
-        copyfile(src='config.ini', dst=os.path.join(path, 'config.ini'))
\ No newline at end of file
+        copyfile(src='config.ini', dst=os.path.join(path, 'config.ini'))
+
+    else:
+        Simulation = Simulation(
+            Model,
+            Replay_memory,
+            TrafficGen,
+            Network,
+            sumo_cmd,
+            config['gamma'],
+            config['max_steps'],
+            config['green_duration'],
+            config['yellow_duration'],
+            config['num_states'],
+            config['num_actions'],
+            config['training_epochs'],
+            config['subscriptions'],
+            config['step_metrics'],
+            backend=Backend,
+            warmup_steps=config['warmup_steps'],
+            multi_agent=config['multi_agent'],
+            scheduler=config['scheduler']
+        )
+
+        episode = 0
+
+        while episode < config['total_episodes']:
+            print('\n----- Episode', str(episode+1), 'of', str(config['total_episodes']))
+            epsilon = 1.0 - (episode / config['total_episodes'])  # set the epsilon for this episode according to epsilon-greedy policy
+            simulation_time, training_time = Simulation.run_simulation(episode, epsilon)  # run the simulation
+            print('Simulation time:', simulation_time, 's - Training time:', training_time, 's - Total:', round(simulation_time+training_time, 1), 's')
+            episode += 1
+
+            print("\n----- Start time:", timestamp_start)
+            print("----- End time:", datetime.datetime.now())
+            print("----- Session info saved at:", path)
+        
+            Model.save_neural_net(path)
+
+            copyfile(src='config.ini', dst=os.path.join(path, 'config.ini'))
\ No newline at end of file
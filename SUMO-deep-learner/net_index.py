@@ -0,0 +1,91 @@
+import hashlib
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+# one row per incoming lane of the controlled traffic lights, in the order of the state vector groups,
+# with the position in tl_ids of the traffic light that the lane enters (-1 for the lanes of a group that enter none)
+CELL_INDEX_DTYPE = np.dtype([('lane_id', 'U64'), ('edge_id', 'U64'), ('group', 'i4'), ('length', 'f8'), ('tl', 'i4')])
+CELL_INDEX_VERSION = 2
+
+
+def read_incoming_lanes(net_file, tl_ids):
+    """
+    Stream a .net.xml and return the lengths of all its lanes and, in link order, the lanes that enter the given traffic lights
+    with the position in tl_ids of the traffic light they enter
+    """
+    tl_order = {tl_id: order for order, tl_id in enumerate(tl_ids)}
+    lane_lengths = {}
+    incoming = {}  # lane id -> first link index of the lane at its traffic light
+    edge_id = None
+    for event, element in ET.iterparse(net_file, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == 'edge':
+                edge_id = None if element.get('function') == 'internal' else element.get('id')
+            continue
+        if element.tag == 'lane' and edge_id is not None:
+            lane_lengths[element.get('id')] = (edge_id, float(element.get('length')))
+        elif element.tag == 'connection' and element.get('tl') in tl_order:
+            lane_id = '%s_%s' % (element.get('from'), element.get('fromLane'))
+            link = (tl_order[element.get('tl')], int(element.get('linkIndex')))
+            incoming[lane_id] = min(link, incoming.get(lane_id, link))
+        if element.tag in ('edge', 'connection', 'junction', 'tlLogic'):
+            element.clear()
+    return lane_lengths, {lane_id: incoming[lane_id][0] for lane_id in sorted(incoming, key=incoming.get)}
+
+
+def build_cell_index(net_file, tl_ids, lane_groups=None):
+    """
+    Build the cell index of a network: every incoming lane with its group in the state vector and its true length.
+    Without lane groups, the lanes of each incoming edge form one group, in the order of the traffic light links
+    """
+    lane_lengths, incoming_lanes = read_incoming_lanes(net_file, tl_ids)
+    if lane_groups is None:
+        lane_groups = []
+        edge_groups = {}
+        for lane_id in incoming_lanes:
+            edge_id = lane_lengths[lane_id][0]
+            if edge_id not in edge_groups:
+                edge_groups[edge_id] = []
+                lane_groups.append(edge_groups[edge_id])
+            edge_groups[edge_id].append(lane_id)
+
+    missing = [lane_id for lanes in lane_groups for lane_id in lanes if lane_id not in lane_lengths]
+    if missing:
+        raise ValueError("lanes %s are not in %s" % (missing, net_file))
+
+    rows = [(lane_id, lane_lengths[lane_id][0], group, lane_lengths[lane_id][1], incoming_lanes.get(lane_id, -1))
+            for group, lanes in enumerate(lane_groups) for lane_id in lanes]
+    return np.array(rows, dtype=CELL_INDEX_DTYPE)
+
+
+def load_cell_index(net_file, tl_ids, lane_groups=None, cache_dir=None):
+    """
+    Return the cell index of a network, memory-mapped from the cache and only parsed from the .net.xml when it changed
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(net_file), 'cell_index')
+    stat = os.stat(net_file)
+    key = repr((CELL_INDEX_VERSION, stat.st_mtime_ns, stat.st_size, tuple(tl_ids), lane_groups))  # the tl column follows the order of tl_ids
+    name = os.path.basename(net_file).replace('.net.xml', '')
+    index_file = os.path.join(cache_dir, '%s-%s.npy' % (name, hashlib.sha1(key.encode()).hexdigest()[:16]))
+
+    if not os.path.isfile(index_file):
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_file = '%s.%i.tmp' % (index_file, os.getpid())
+        with open(temp_file, 'wb') as f:
+            np.save(f, build_cell_index(net_file, tl_ids, lane_groups))
+        os.replace(temp_file, index_file)
+    return np.load(index_file, mmap_mode='r')
+
+
+if __name__ == "__main__":
+    # print the incoming lanes found for the traffic lights of a network, to write or check its network_config.ini section
+    #    python net_index.py intersection/kinsale.net.xml J20 J21 J22 J23
+    cell_index = build_cell_index(sys.argv[1], sys.argv[2:])
+    for group in np.unique(cell_index['group']):
+        rows = cell_index[cell_index['group'] == group]
+        print("group %i - edge %s into %s: %s" % (group, rows['edge_id'][0], sys.argv[2 + rows['tl'][0]] if rows['tl'][0] >= 0 else '-',
+                                                  ', '.join('%s (%.2f m)' % (row['lane_id'], row['length']) for row in rows)))
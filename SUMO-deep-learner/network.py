@@ -0,0 +1,159 @@
+import collections
+import configparser
+import os
+
+from net_index import load_cell_index
+
+NETWORK_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'network_config.ini')
+
+_networks = {}  # (config file, networkID) -> Network, every network is read once per process
+
+# traffic lights driven by one agent, all to the same phase, with the lane groups of its state and the roads of its reward
+Agent = collections.namedtuple('Agent', ['tl_ids', 'lane_groups', 'incoming_edges'])
+
+
+class Network:
+    """
+    Everything the simulation, the state encoder and the traffic generator need to know about one sumo network,
+    read from a section of network_config.ini
+    """
+    def __init__(self, network_id, name, net_file, route_file, tl_ids, incoming_edges, lane_groups, road_length,
+                 green_phases, yellow_phases, routes, straight_routes, turn_routes, straight_probability):
+        self.network_id = network_id
+        self.name = name
+        self.net_file = os.path.join('intersection', net_file)
+        self.route_file = os.path.join('intersection', route_file)
+        self.tl_ids = tl_ids
+        self._incoming_edges = incoming_edges
+        self._cell_index = None
+        self._junction_cell_index = None
+        self.lane_groups = lane_groups  # None to group the incoming lanes by edge, as found in the .net.xml
+        self.road_length = road_length  # None to use the true length of every lane, from the .net.xml
+        self.green_phases = green_phases  # indexed by action
+        self.yellow_phases = yellow_phases  # indexed by the action that is ending
+        self.routes = routes
+        self.straight_routes = straight_routes
+        self.turn_routes = turn_routes
+        self.straight_probability = straight_probability
+
+
+    @classmethod
+    def load(cls, network_id, config_file=NETWORK_CONFIG_FILE):
+        """
+        Return the descriptor of a network, reading its section of the network config file on first use
+        """
+        key = (config_file, network_id)
+        if key not in _networks:
+            content = configparser.ConfigParser()
+            content.optionxform = str  # keep the case of the route ids
+            if not content.read(config_file):
+                raise FileNotFoundError(config_file)
+            _networks[key] = cls._from_section(network_id, content['network_%i' % network_id])
+        return _networks[key]
+
+
+    @classmethod
+    def _from_section(cls, network_id, section):
+        return cls(
+            network_id,
+            section['name'],
+            section['net_file'],
+            section['route_file'],
+            tl_ids=_split(section['tl_ids'], ','),
+            incoming_edges=_split(section['incoming_edges'], ',') if 'incoming_edges' in section else None,
+            lane_groups=[group.split() for group in _split(section['lane_groups'], '|')] if 'lane_groups' in section else None,
+            road_length=section.getfloat('road_length', fallback=None),
+            green_phases=[int(phase) for phase in _split(section['green_phases'], ',')],
+            yellow_phases=[int(phase) for phase in _split(section['yellow_phases'], ',')],
+            routes=[tuple(item.strip() for item in line.split(':', 1)) for line in _split(section['routes'], '\n')],
+            straight_routes=_split(section['straight_routes'], ','),
+            turn_routes=_split(section['turn_routes'], ','),
+            straight_probability=section.getfloat('straight_probability'),
+        )
+
+
+    @property
+    def cell_index(self):
+        """
+        Incoming lanes with their group and true length, built from the .net.xml on first use and then memory-mapped
+        """
+        if self._cell_index is None:
+            self._cell_index = load_cell_index(self.net_file, self.tl_ids, self.lane_groups)
+        return self._cell_index
+
+
+    @property
+    def junction_cell_index(self):
+        """
+        Every incoming lane of every traffic light, one group per incoming edge, whatever the lane groups of the network
+        """
+        if self._junction_cell_index is None:
+            self._junction_cell_index = self.cell_index if self.lane_groups is None else load_cell_index(self.net_file, self.tl_ids)
+        return self._junction_cell_index
+
+
+    def agents(self, multi_agent=False):
+        """
+        A single agent driving every traffic light to the same phase or, with multi_agent, one agent per traffic light
+        observing the roads that enter it: the roads entering the network first, then the roads from the other junctions
+        """
+        if not multi_agent or len(self.tl_ids) == 1:
+            return [Agent(self.tl_ids, self.lane_groups or _index_groups(self.cell_index), self.incoming_edges)]
+
+        cell_index = self.junction_cell_index
+        lane_edges = dict(zip(cell_index['lane_id'].tolist(), cell_index['edge_id'].tolist()))
+        network_edges = set(self.incoming_edges)
+        agents = []
+        for tl, tl_id in enumerate(self.tl_ids):
+            groups = _index_groups(cell_index[cell_index['tl'] == tl])
+            groups.sort(key=lambda lanes: lane_edges[lanes[0]] not in network_edges)
+            agents.append(Agent([tl_id], groups, [lane_edges[lanes[0]] for lanes in groups]))
+        return agents
+
+
+    @property
+    def lane_lengths(self):
+        """
+        Length of every incoming lane for the state encoder, the road length of the network for the lanes of its lane groups
+        when it sets one. The lanes between the junctions, only seen by the agents of the multi-agent mode, keep their true length
+        """
+        cell_index = self.junction_cell_index if len(self.tl_ids) > 1 else self.cell_index
+        lengths = dict(zip(cell_index['lane_id'].tolist(), cell_index['length'].tolist()))
+        if self.road_length is None:
+            lengths.update(zip(self.cell_index['lane_id'].tolist(), self.cell_index['length'].tolist()))
+        else:
+            lengths.update((lane_id, self.road_length) for lane_id in self.cell_index['lane_id'].tolist())
+        return lengths
+
+
+    @property
+    def incoming_edges(self):
+        if self._incoming_edges is None:
+            self._incoming_edges = list(dict.fromkeys(self.cell_index['edge_id'].tolist()))
+        return self._incoming_edges
+
+
+    @property
+    def num_lane_groups(self):
+        if self.lane_groups is None:
+            return int(self.cell_index['group'].max()) + 1
+        return len(self.lane_groups)
+
+
+    @property
+    def num_actions(self):
+        return len(self.green_phases)
+
+
+def _index_groups(cell_index):
+    """
+    Lanes of every group of a cell index, in the order of the groups
+    """
+    groups = {}
+    for lane_id, group in zip(cell_index['lane_id'].tolist(), cell_index['group'].tolist()):
+        groups.setdefault(group, []).append(lane_id)
+    return list(groups.values())
+
+
+def _split(value, separator):
+    return [item.strip() for item in value.split(separator) if item.strip()]
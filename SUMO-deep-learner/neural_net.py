@@ -2,6 +2,7 @@ import os
 import numpy as np
 os.environ['TF_CPP_MIN_LOG_LEVEL']='2'  # kill warning about tensorflow
 import sys
+import tensorflow as tf
 from tensorflow import keras
 from keras import layers
 from keras import losses
@@ -9,14 +10,73 @@ from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.utils import plot_model
 from tensorflow.keras.models import load_model
 
+FIT_BATCH_SIZE = 32  # samples per gradient step of a replay batch, the default batch size of fit that trained them before
+
+
+def compile_inference(model, input_dim):
+    """
+    Wrap a direct call of the model in a tf.function with a fixed input signature, so a single state
+    is evaluated by an already traced graph instead of going through the data adapter and callbacks of predict
+    """
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, input_dim), dtype=tf.float32)])
+    def infer(states):
+        return model(states, training=False)
+    return infer
+
+
+def compile_replay_targets(model, target_model, input_dim, double_dqn):
+    """
+    Wrap the forward passes of a replay batch in a single tf.function: Q(state) under the model and the value of every
+    next state under the target model, for the action that the model picks (Double DQN) or that the target model picks
+    """
+    spec = tf.TensorSpec(shape=(None, input_dim), dtype=tf.float32)
+
+    @tf.function(input_signature=[spec, spec])
+    def replay_targets(states, next_states):
+        next_q_target = target_model(next_states, training=False)
+        if double_dqn:
+            q_values = model(tf.concat([states, next_states], axis=0), training=False)
+            n = tf.shape(states)[0]
+            next_actions = tf.argmax(q_values[n:], axis=1)
+            return q_values[:n], tf.gather(next_q_target, next_actions, batch_dims=1)
+        return model(states, training=False), tf.reduce_max(next_q_target, axis=1)
+    return replay_targets
+
+
+def compile_soft_update(model, target_model, tau):
+    """
+    Polyak averaging of the target model towards the model, inside the graph instead of through get_weights / set_weights
+    """
+    @tf.function
+    def soft_update():
+        for target_weight, weight in zip(target_model.weights, model.weights):
+            target_weight.assign(tau * weight + (1 - tau) * target_weight)
+    return soft_update
+
 
 class TrainNeuralNet:
-    def __init__(self, num_layers, width, batch_size, learning_rate, input_dimensions, output_dimensions):
+    def __init__(self, num_layers, width, batch_size, learning_rate, input_dimensions, output_dimensions, fast_inference=True,
+                 target_sync_steps=0, target_tau=0.0, double_dqn=True):
         self.input_dimemsions = input_dimensions
         self._output_dimensions = output_dimensions
         self._batch_size = batch_size
         self._learning_rate = learning_rate
         self._neural_net = self.build_neural_net(num_layers, width)
+        self._fast_inference = fast_inference
+        self._infer = compile_inference(self._neural_net, input_dimensions)  # reads the live weights, so it stays valid while training
+        self.version = 0  # bumped whenever the weights change, so that the actions remembered for the former weights are dropped
+
+        # frozen copy of the net for the Q(next state) of the replay, synced every target_sync_steps training steps
+        # or, with target_tau, moved towards the net after every one of them; none without both
+        self._target_sync_steps = target_sync_steps
+        self._target_tau = target_tau
+        self._train_steps = 0
+        self._target_net = None
+        if target_sync_steps > 0 or target_tau > 0:
+            self._target_net = keras.models.clone_model(self._neural_net)
+            self._target_net.set_weights(self._neural_net.get_weights())
+            self._replay_targets = compile_replay_targets(self._neural_net, self._target_net, input_dimensions, double_dqn)
+            self._soft_update = compile_soft_update(self._neural_net, self._target_net, target_tau)
 
     # build the neural net to predict Q values from inputs (state)
     def build_neural_net(self, num_layers, width):
@@ -30,18 +90,52 @@ class TrainNeuralNet:
         outputs = layers.Dense(self._output_dimensions, activation='linear')(x)
 
         neural_net = keras.Model(inputs=inputs, outputs=outputs, name='model')
-        neural_net.compile(loss=losses.mean_squared_error, optimizer=Adam(lr=self._learning_rate))
+        neural_net.compile(loss=losses.mean_squared_error, optimizer=Adam(learning_rate=self._learning_rate))
         return neural_net
     
     def predict_single(self, state):
         state = np.reshape(state, [1, self.input_dimemsions])
+        if self._fast_inference:
+            return self._infer(state.astype(np.float32)).numpy()
         return self._neural_net.predict(state)
     
     def predict_batch(self, states):
-        return self._neural_net.predict(states)
+        # predict_on_batch skips the data adapter and callbacks that predict sets up on every call
+        return np.asarray(self._neural_net.predict_on_batch(states))
     
-    def train_batch(self, states, updated_Q):
-        self._neural_net.fit(states, updated_Q, epochs=1, verbose=0)
+    def predict_targets(self, states, next_states):
+        """
+        Q(state) and the value of every next state under the target net, in a single call
+        """
+        qsa, next_values = self._replay_targets(np.asarray(states, dtype=np.float32), np.asarray(next_states, dtype=np.float32))
+        return qsa.numpy(), next_values.numpy()
+
+    def train_batch(self, states, updated_Q, sample_weights=None):
+        # the gradient steps of fit on the shuffled batch, one per minibatch, without the data adapter and callbacks that fit
+        # sets up on every call. A prioritized batch comes ordered by slot, so it needs the shuffle too
+        order = np.random.permutation(len(states))
+        for start in range(0, len(states), FIT_BATCH_SIZE):
+            minibatch = order[start:start + FIT_BATCH_SIZE]
+            self._neural_net.train_on_batch(states[minibatch], updated_Q[minibatch], sample_weight=None if sample_weights is None else sample_weights[minibatch])
+        self.version += 1
+        if self._target_net is not None:
+            self._train_steps += 1
+            if self._target_tau > 0:
+                self._soft_update()
+            elif self._train_steps % self._target_sync_steps == 0:
+                self.sync_target()
+
+    def sync_target(self):
+        self._target_net.set_weights(self._neural_net.get_weights())
+
+    def get_weights(self):
+        return self._neural_net.get_weights()
+
+    def set_weights(self, weights):
+        self._neural_net.set_weights(weights)
+        self.version += 1
+        if self._target_net is not None:
+            self.sync_target()
 
     def save_neural_net(self, filepath):
         self._neural_net.save(os.path.join(filepath, 'trained_model.h5'))
@@ -60,12 +154,29 @@ class TrainNeuralNet:
     @property
     def batch_size(self):
         return self._batch_size
+
+    @property
+    def target_network(self):
+        return self._target_net is not None
     
 
 class TestModel:
-    def __init__(self, input_dimensions, model_path):
+    def __init__(self, input_dimensions, model_path, fast_inference=True):
         self._input_dim = input_dimensions
+        self._model_path = model_path
         self._model = self._load_my_model(model_path)
+        self._fast_inference = fast_inference
+        self._infer = compile_inference(self._model, input_dimensions)
+        self.version = 0  # bumped on every reload, so that the actions cached for the former weights are dropped
+
+
+    def reload(self):
+        """
+        Load the model folder again, after the model was trained further
+        """
+        self._model = self._load_my_model(self._model_path)
+        self._infer = compile_inference(self._model, self._input_dim)
+        self.version += 1
 
 
     def _load_my_model(self, model_folder_path):
@@ -86,9 +197,21 @@ class TestModel:
         Predict the action values from a single state
         """
         state = np.reshape(state, [1, self._input_dim])
+        if self._fast_inference:
+            return self._infer(state.astype(np.float32)).numpy()
         return self._model.predict(state)
 
 
+    def predict_batch(self, states):
+        """
+        Predict the action values from a batch of states, one row each, in a single forward pass
+        """
+        states = np.asarray(states, dtype=np.float32)
+        if self._fast_inference:
+            return self._infer(states).numpy()
+        return np.asarray(self._model.predict_on_batch(states))
+
+
     @property
     def input_dim(self):
         return self._input_dim
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import sys
+import numpy as np
+
+# activations of the Dense layers built by TrainNeuralNet
+ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'linear': lambda x: x,
+}
+
+
+def export_model(model_folder_path):
+    """
+    Convert the trained_model.h5 of a model folder into trained_model.npz, holding the kernel, bias and
+    activation of every Dense layer. Needs TensorFlow, unlike NumpyTestModel which evaluates the result
+    """
+    from tensorflow.keras.models import load_model
+
+    model = load_model(os.path.join(model_folder_path, 'trained_model.h5'))
+    arrays = {}
+    activations = []
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if not weights:  # input layer
+            continue
+        kernel, bias = weights
+        arrays['kernel_%i' % len(activations)] = kernel.astype(np.float32)
+        arrays['bias_%i' % len(activations)] = bias.astype(np.float32)
+        activations.append(layer.get_config()['activation'])
+    arrays['activations'] = np.array(activations)
+
+    npz_file_path = os.path.join(model_folder_path, 'trained_model.npz')
+    np.savez(npz_file_path, **arrays)
+    return model, npz_file_path
+
+
+class NumpyTestModel:
+    """
+    Drop-in replacement of neural_net.TestModel that evaluates the exported Dense layers with numpy,
+    so the tester runs without TensorFlow installed
+    """
+    def __init__(self, input_dimensions, model_path):
+        self._input_dim = input_dimensions
+        self._model_path = model_path
+        self._layers = self._load_my_model(model_path)
+        self.version = 0  # bumped on every reload, so that the actions cached for the former weights are dropped
+
+
+    def reload(self):
+        """
+        Load the exported weights again, after the model was trained and exported further
+        """
+        self._layers = self._load_my_model(self._model_path)
+        self.version += 1
+
+
+    def _load_my_model(self, model_folder_path):
+        """
+        Load the weights exported in the folder specified by the model number, if they exist
+        """
+        model_file_path = os.path.join(model_folder_path, 'trained_model.npz')
+
+        if os.path.isfile(model_file_path):
+            with np.load(model_file_path) as arrays:
+                return [(arrays['kernel_%i' % i], arrays['bias_%i' % i], ACTIVATIONS[str(activation)]) for i, activation in enumerate(arrays['activations'])]
+        else:
+            sys.exit("Exported model not found, run: python numpy_model.py " + model_folder_path)
+
+
+    def predict_one(self, state):
+        """
+        Predict the action values from a single state
+        """
+        return self.predict_batch(np.reshape(state, [1, self._input_dim]))
+
+
+    def predict_batch(self, states):
+        """
+        Predict the action values from a batch of states, one row each, in a single pass through the layers
+        """
+        x = np.asarray(states, dtype=np.float32)
+        for kernel, bias, activation in self._layers:
+            x = activation(x @ kernel + bias)
+        return x
+
+
+    @property
+    def input_dim(self):
+        return self._input_dim
+
+
+if __name__ == "__main__":
+    # export the given model folders, checking that numpy and keras give the same Q-values
+    for model_folder_path in sys.argv[1:]:
+        model, npz_file_path = export_model(model_folder_path)
+        input_dim = model.input_shape[-1]
+        numpy_model = NumpyTestModel(input_dim, model_folder_path)
+
+        states = np.random.default_rng(0).integers(0, 2, (100, input_dim)).astype(np.float32)
+        expected = model.predict(states, verbose=0)
+        actual = np.concatenate([numpy_model.predict_one(state) for state in states])
+        print(npz_file_path, "- max abs difference with keras:", np.max(np.abs(expected - actual)))
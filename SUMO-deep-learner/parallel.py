@@ -0,0 +1,200 @@
+import multiprocessing
+import threading
+import timeit
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+_actor = None  # the simulation, acting net and episode buffer of an actor process
+
+
+class ParallelTrainer:
+    """
+    Runs the training episodes on several sumo instances at once, one actor process per instance (each with its own
+    Simulation and acting net, built by build_actor), while the learner trains the learner net from the replay memory
+    in this process. Every episode is sent to an actor with the weights published after the training of every finished
+    episode, and the actor sends its samples back once the episode is over, so no net runs inference while it is trained
+    """
+    def __init__(self, build_actor, num_actors, learner_simulation, learner_net, replay_memory, total_episodes, training_epochs, max_steps):
+        self._build_actor = build_actor  # picklable, called with the index of the actor in its process
+        self._num_actors = num_actors
+        self._learner_simulation = learner_simulation
+        self._learner_net = learner_net
+        self._replay_memory = replay_memory
+        self._publisher = Weight_publisher(learner_net.get_weights())
+        self._total_episodes = total_episodes
+        self._training_epochs = training_epochs
+        self._max_steps = max_steps
+
+
+    def run(self):
+        """
+        Run all the episodes, returning the wall time and the simulated seconds per wall-clock second
+        """
+        start_time = timeit.default_timer()
+        context = multiprocessing.get_context('spawn')
+        actor_ids = context.Queue()
+        for actor in range(self._num_actors):
+            actor_ids.put(actor)
+
+        # every actor drives its own sumo through the default TraCI connection of its process
+        with ProcessPoolExecutor(self._num_actors, mp_context=context, initializer=_start_actor, initargs=(self._build_actor, actor_ids)) as executor:
+            self._learn(executor)
+
+        wall_time = timeit.default_timer() - start_time
+        return round(wall_time, 1), self._total_episodes * self._max_steps / wall_time
+
+
+    def _learn(self, executor):
+        # train while the actors simulate, keeping the same number of training epochs per finished episode as the serial loop
+        next_episode = 0
+        episodes_done = 0
+        epochs_done = 0
+        running = set()
+        while episodes_done < self._total_episodes or epochs_done < episodes_done * self._training_epochs:
+            while len(running) < self._num_actors and next_episode < self._total_episodes:
+                version, weights = self._publisher.snapshot()
+                epsilon = 1.0 - (next_episode / self._total_episodes)  # same epsilon-greedy schedule as the serial loop
+                running.add(executor.submit(_run_episode, next_episode, epsilon, version, weights))
+                next_episode += 1
+
+            finished = [future for future in running if future.done()]
+            if not finished and epochs_done == episodes_done * self._training_epochs:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)  # nothing to train before the next episode ends
+            for future in finished:
+                running.remove(future)
+                for sample in future.result():
+                    self._replay_memory.add_sample(sample)
+                episodes_done += 1
+
+            if epochs_done < episodes_done * self._training_epochs:
+                self._learner_simulation.train(1)
+                epochs_done += 1
+                if epochs_done % self._training_epochs == 0:
+                    self._publisher.publish(self._learner_net.get_weights())  # the weights after the training of one more episode
+
+
+def _start_actor(build_actor, actor_ids):
+    global _actor
+    actor = actor_ids.get()
+    simulation, acting_net, episode_buffer = build_actor(actor)
+    _actor = {'name': 'actor_%i' % actor, 'simulation': simulation, 'acting_net': acting_net, 'episode_buffer': episode_buffer, 'version': None}
+
+
+def _run_episode(episode, epsilon, version, weights):
+    """
+    Simulate one episode in the actor process with the given version of the weights, returning its samples
+    """
+    if version != _actor['version']:
+        _actor['acting_net'].set_weights(weights)
+        _actor['version'] = version
+    print('\n----- Episode', str(episode+1), 'on', _actor['name'], '- weights version', version)
+    simulation_time = _actor['simulation'].run_episode(episode, epsilon)
+    print('Episode', str(episode+1), '- Simulation time:', simulation_time, 's')
+    return _actor['episode_buffer'].take()
+
+
+class Weight_publisher:
+    """
+    Versioned snapshots of the learner weights, so an actor knows which version of the policy it runs
+    """
+    def __init__(self, weights):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._weights = weights
+
+
+    def publish(self, weights):
+        with self._lock:
+            self._version += 1
+            self._weights = weights
+            return self._version
+
+
+    def snapshot(self):
+        with self._lock:
+            return self._version, self._weights
+
+
+class Episode_buffer:
+    """
+    Holds the samples of the episode being simulated, so the learner only sees complete episodes
+    """
+    def __init__(self):
+        self._samples = []
+
+
+    def add_sample(self, sample):
+        state, action, reward, next_state = sample
+        self._samples.append((state.copy(), action, reward, next_state))  # the simulation overwrites the row of the state at the next decision
+
+
+    def take(self):
+        """
+        Remove and return the samples of the episode
+        """
+        samples, self._samples = self._samples, []
+        return samples
+
+
+    def flush(self, replay_memory):
+        for sample in self.take():
+            replay_memory.add_sample(sample)
+
+
+class PipelinedTrainer:
+    """
+    Overlaps simulation and training: while episode k+1 is simulated with a snapshot of the weights,
+    the learner thread trains the online net on the replay memory holding the episodes up to k
+    """
+    def __init__(self, actor_simulation, acting_net, learner_simulation, learner_net, replay_memory, episode_buffer, total_episodes, training_epochs):
+        self._actor_simulation = actor_simulation
+        self._acting_net = acting_net
+        self._learner_simulation = learner_simulation
+        self._learner_net = learner_net
+        self._replay_memory = replay_memory
+        self._episode_buffer = episode_buffer
+        self._total_episodes = total_episodes
+        self._training_epochs = training_epochs
+        self._publisher = Weight_publisher(learner_net.get_weights())
+        self._episode_times = []
+
+
+    def run(self):
+        """
+        Run all the episodes, returning the (simulation, training, wall) time of every episode
+        """
+        for episode in range(self._total_episodes + 1):
+            start_time = timeit.default_timer()
+            timings = {}
+
+            # the learner trains on the episodes simulated so far, none before the first one
+            learner = threading.Thread(target=self._train, args=(timings,), name='learner')
+            if episode > 0:
+                learner.start()
+
+            if episode < self._total_episodes:
+                version, weights = self._publisher.snapshot()
+                self._acting_net.set_weights(weights)
+                print('\n----- Episode', str(episode+1), 'of', str(self._total_episodes), '- weights version', version)
+                epsilon = 1.0 - (episode / self._total_episodes)
+                timings['simulation'] = self._actor_simulation.run_episode(episode, epsilon)
+            else:
+                print('\n----- Training on the last episode')
+
+            if episode > 0:
+                learner.join()
+                version = self._publisher.publish(self._learner_net.get_weights())
+            self._episode_buffer.flush(self._replay_memory)  # the next training round can use this episode
+
+            wall_time = round(timeit.default_timer() - start_time, 1)
+            simulation_time = timings.get('simulation', 0)
+            training_time = timings.get('training', 0)
+            self._episode_times.append((simulation_time, training_time, wall_time))
+            print('Simulation time:', simulation_time, 's - Training time:', training_time, 's - Wall time:', wall_time, 's - Saved vs serial:', round(simulation_time + training_time - wall_time, 1), 's')
+
+        return self._episode_times
+
+
+    def _train(self, timings):
+        start_time = timeit.default_timer()
+        self._learner_simulation.train(self._training_epochs)
+        timings['training'] = round(timeit.default_timer() - start_time, 1)
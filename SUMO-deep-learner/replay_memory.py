@@ -1,30 +1,164 @@
-import random
+import numpy as np
 
-class Replay_memory:
-    def __init__(self, size_max, size_min):
-        self._samples = []
+
+class Array_replay_memory:
+    """
+    Replay memory preallocated as numpy arrays and used as a ring buffer: inserting overwrites
+    the oldest sample in O(1), and sampling returns ready-to-train arrays
+    """
+    prioritized = False  # sampled uniformly, without priorities to update
+
+
+    def __init__(self, size_max, size_min, num_states):
+        self._states = np.zeros((size_max, num_states), dtype=np.float32)
+        self._actions = np.zeros(size_max, dtype=np.intp)
+        self._rewards = np.zeros(size_max, dtype=np.float32)
+        self._next_states = np.zeros((size_max, num_states), dtype=np.float32)
         self._size_max = size_max
         self._size_min = size_min
+        self._size = 0
+        self._next_index = 0  # slot of the next sample, i.e. the oldest one once the memory is full
+        self._rng = np.random.default_rng()
 
 
     def add_sample(self, sample):
-        # adds state/action/reward sample into memory
-        self._samples.append(sample)
-        # if memory is full, remove oldest element
-        if self._size_now() > self._size_max:
-            self._samples.pop(0)
+        # adds state/action/reward/next state sample into memory, overwriting the oldest one if memory is full
+        state, action, reward, next_state = sample
+        i = self._next_index
+        self._states[i] = state
+        self._actions[i] = action
+        self._rewards[i] = reward
+        self._next_states[i] = next_state
+        self._next_index = (i + 1) % self._size_max
+        self._size = min(self._size + 1, self._size_max)
 
 
     def get_samples(self, n):
-        # get samples from memory
+        """
+        Get a batch of (states, actions, rewards, next_states) arrays, empty if the memory is not filled enough
+        """
         if self._size_now() < self._size_min:
-            return []
-
-        if n > self._size_now():
-            return random.sample(self._samples, self._size_now())  # get all the samples
+            indices = np.empty(0, dtype=np.intp)
         else:
-            return random.sample(self._samples, n)  # get "batch size" number of samples
+            indices = self._rng.choice(self._size_now(), min(n, self._size_now()), replace=False)  # get "batch size" number of samples, or all of them
+        return self._states[indices], self._actions[indices], self._rewards[indices], self._next_states[indices]
 
 
     def _size_now(self):
-        return len(self._samples)
\ No newline at end of file
+        return self._size
+
+
+class Sum_tree:
+    """
+    Binary tree of the sums of the priorities of a fixed number of slots, in one array with the root at 1 and the
+    leaves at the end: a batch of slots is updated or found by priority in one walk over the log2(capacity) levels
+    """
+    def __init__(self, capacity):
+        self._leaf_base = 1 << max(capacity - 1, 1).bit_length()  # first leaf, the leaves are padded to a power of two
+        self._tree = np.zeros(2 * self._leaf_base)
+
+
+    def set(self, index, priority):
+        # one slot, for the samples added one at a time
+        node = index + self._leaf_base
+        self._tree[node] = priority
+        node //= 2
+        while node >= 1:
+            self._tree[node] = self._tree[2 * node] + self._tree[2 * node + 1]
+            node //= 2
+
+
+    def update(self, indices, priorities):
+        """
+        Set the priority of a batch of slots and recompute the sums above them, level by level
+        """
+        nodes = np.asarray(indices, dtype=np.intp) + self._leaf_base
+        self._tree[nodes] = priorities
+        while nodes[0] > 1:  # all the leaves are on the same level
+            nodes //= 2  # a parent shared by several slots is written several times, with the same sum
+            self._tree[nodes] = self._tree[2 * nodes] + self._tree[2 * nodes + 1]
+
+
+    def find(self, values):
+        """
+        Slots whose cumulated priorities reach the given values, which lie in [0, total)
+        """
+        nodes = np.ones(len(values), dtype=np.intp)
+        values = np.array(values, dtype=float)
+        while nodes[0] < self._leaf_base:
+            left = 2 * nodes
+            left_sums = self._tree[left]
+            go_right = values >= left_sums
+            values -= np.where(go_right, left_sums, 0.0)
+            nodes = left + go_right
+        return nodes - self._leaf_base
+
+
+    def get(self, indices):
+        return self._tree[np.asarray(indices, dtype=np.intp) + self._leaf_base]
+
+
+    @property
+    def total(self):
+        return self._tree[1]
+
+
+class Prioritized_replay_memory(Array_replay_memory):
+    """
+    Array replay memory sampled in proportion to priority ** alpha, the priority of a sample being its last absolute
+    TD-error, or the highest priority so far until it is first replayed. The bias of the sampling is undone in the loss
+    by the importance-sampling weights (N * P(i)) ** -beta, with beta annealed to 1 over beta_steps batches
+    """
+    prioritized = True
+
+
+    def __init__(self, size_max, size_min, num_states, alpha=0.6, beta=0.4, beta_steps=40000, epsilon=0.01):
+        super().__init__(size_max, size_min, num_states)
+        self._tree = Sum_tree(size_max)
+        self._alpha = alpha
+        self._beta = beta
+        self._beta_increment = (1.0 - beta) / beta_steps if beta_steps > 0 else 0.0
+        self._epsilon = epsilon  # so that a sample with no TD-error is still replayed
+        self._max_priority = 1.0
+        self._writes = np.zeros(size_max, dtype=np.int64)  # samples written to every slot, to tell a replayed sample from the one replacing it
+
+
+    def add_sample(self, sample):
+        # the new sample takes the slot of the oldest one, with the highest priority
+        self._tree.set(self._next_index, self._max_priority)
+        self._writes[self._next_index] += 1
+        super().add_sample(sample)
+
+
+    def get_samples(self, n):
+        """
+        Get a batch of (states, actions, rewards, next_states, slots, importance-sampling weights, slot writes) arrays,
+        one sample drawn from each of n equal ranges of the cumulated priorities, empty if the memory is not filled enough
+        """
+        if self._size_now() < self._size_min:
+            indices = np.empty(0, dtype=np.intp)
+            weights = np.empty(0, dtype=np.float32)
+        else:
+            n = min(n, self._size_now())
+            total = self._tree.total
+            values = (np.arange(n) + self._rng.random(n)) * (total / n)
+            indices = np.minimum(self._tree.find(values), self._size_now() - 1)  # the rounding of the sums never picks a padding leaf
+            weights = (self._size_now() * self._tree.get(indices) / total) ** -self._beta
+            weights = (weights / weights.max()).astype(np.float32)
+            self._beta = min(1.0, self._beta + self._beta_increment)
+        return self._states[indices], self._actions[indices], self._rewards[indices], self._next_states[indices], indices, weights, self._writes[indices]
+
+
+    def update_priorities(self, indices, td_errors, writes):
+        """
+        Set the priorities of the samples just replayed from their TD-errors, skipping the slots that new samples
+        took since the batch was sampled (their writes changed), as these keep the priority they were added with
+        """
+        replayed = self._writes[indices] == writes
+        if not replayed.all():
+            indices, td_errors = indices[replayed], td_errors[replayed]
+            if len(indices) == 0:
+                return
+        priorities = (np.abs(td_errors) + self._epsilon) ** self._alpha
+        self._tree.update(indices, priorities)
+        self._max_priority = max(self._max_priority, float(priorities.max()))
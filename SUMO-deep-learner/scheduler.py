@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class DecisionScheduler:
+    """
+    Decides when the agents pick their next phase and spares the neural net the observations it has already seen.
+    On the fixed grid every agent decides after each green phase. Event driven, an agent decides once its green has
+    lasted min_green and the roads entering its junction changed from queued to clear or back since the green started,
+    the halting numbers of the roads acting as detectors, and always once its green has lasted max_green
+    """
+    def __init__(self, num_agents, event_driven=False, min_green=10, max_green=40, check_interval=1):
+        self._num_agents = num_agents
+        self.event_driven = event_driven
+        self.min_green = min_green
+        self.max_green = max_green  # at most the green durations of the .net.xml programs, which would end the phase on their own
+        self.check_interval = check_interval  # steps simulated between two checks of the detectors
+        self._model_version = None
+        self.reset()
+
+
+    def reset(self):
+        """
+        Forget the previous episode, whose observations were evaluated with other weights
+        """
+        self._green_steps = np.zeros(self._num_agents, dtype=np.int64)  # step at which the green of every agent started
+        self._queued_roads = [None] * self._num_agents  # roads with halting vehicles when the green of every agent started
+        self._observations = [None] * self._num_agents  # packed observation of the last inference of every agent
+        self._observation_keys = [None] * self._num_agents
+        self._inferred_actions = np.zeros(self._num_agents, dtype=np.int64)
+        self.inferences = 0
+        self.reused_inferences = 0
+
+
+    def validate(self, model_version):
+        """
+        Forget the actions inferred so far when the weights of the net changed since they were inferred
+        """
+        if model_version != self._model_version:
+            self._observations = [None] * self._num_agents
+            self._model_version = model_version
+
+
+    def recall(self, states, agents):
+        """
+        Return which of the given agents need an inference, as their observation changed since their last one,
+        and the action inferred last for every agent
+        """
+        self._observation_keys = [row.tobytes() for row in np.packbits(states > 0, axis=1)]  # the cells are 0 or 1
+        infer = np.array([deciding and key != last for deciding, key, last in zip(agents, self._observation_keys, self._observations)])
+        self.inferences += int(np.count_nonzero(infer))
+        self.reused_inferences += int(np.count_nonzero(agents & ~infer))
+        return infer, self._inferred_actions
+
+
+    def remember(self, agents, actions):
+        """
+        Keep the actions just inferred for the given agents, with the observations passed to recall
+        """
+        for agent in np.flatnonzero(agents):
+            self._observations[agent] = self._observation_keys[agent]
+            self._inferred_actions[agent] = actions[agent]
+
+
+    def start_green(self, agents, step, queued_roads):
+        """
+        Record the start of the green phase that the given agents just chose, with the roads queued at that step
+        """
+        self._green_steps[agents] = step
+        for agent in np.flatnonzero(agents):
+            self._queued_roads[agent] = queued_roads[agent]
+
+
+    def next_check(self, step):
+        """
+        Steps to simulate before the detectors are worth checking, none of the agents deciding before its min_green
+        """
+        return max(self.check_interval, int(self._green_steps.min()) + self.min_green - step)
+
+
+    def due(self, step, queued_roads):
+        """
+        Mask of the agents taking a decision at this step
+        """
+        green_time = step - self._green_steps
+        events = np.array([queued != started for queued, started in zip(queued_roads, self._queued_roads)])
+        return (green_time >= self.min_green) & (events | (green_time >= self.max_green))
@@ -0,0 +1,26 @@
+import hashlib
+import os
+import threading
+
+# save the random number generators and the exact vehicle positions, so that every episode restored from a snapshot goes on the same way
+SNAPSHOT_OPTIONS = ["--save-state.rng", "true", "--save-state.precision", "17"]
+
+
+def snapshot_file(snapshot_dir, net_file, route_file, warmup_steps):
+    """
+    Path of the state of a network and route file after the warm-up steps, which changes whenever the route file is rewritten
+    """
+    stat = os.stat(route_file)
+    key = repr((os.path.abspath(net_file), os.path.abspath(route_file), stat.st_mtime_ns, stat.st_size, warmup_steps))
+    name = os.path.basename(route_file).replace('.rou.xml', '')
+    return os.path.join(snapshot_dir, '%s-warmup%i-%s.xml.gz' % (name, warmup_steps, hashlib.sha1(key.encode()).hexdigest()[:16]))
+
+
+def save_snapshot(traci_module, path):
+    """
+    Save the state of the running simulation, through a temporary file so that the runs sharing it never load half of it
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_file = '%s.%i-%i.tmp.xml.gz' % (path[:-len('.xml.gz')], os.getpid(), threading.get_ident())
+    traci_module.simulation.saveState(temp_file)
+    os.replace(temp_file, path)
@@ -0,0 +1,61 @@
+import numpy as np
+
+# distance in meters from the traffic light -> upper bound of every cell of a lane group
+CELL_EDGES = np.array([7, 14, 21, 28, 40, 60, 100, 160, 400, 750])
+
+
+class StateEncoder:
+    """
+    Maps the (lane id, lane position) of the vehicles to the cell occupancy state of a network,
+    with the lane -> group lookup and the cell boundaries built once
+    """
+    def __init__(self, lane_groups, lane_lengths, num_states):
+        self._num_states = num_states
+        self._num_cells = len(CELL_EDGES)
+        lanes = [(lane_id, group) for group, group_lanes in enumerate(lane_groups) for lane_id in group_lanes]
+        self._lane_to_row = {lane_id: row for row, (lane_id, _) in enumerate(lanes)}
+        # one row per lane, plus a last row of group -1 that the lanes outside the groups point to
+        self._row_groups = np.array([group for _, group in lanes] + [-1], dtype=np.intp)
+        if isinstance(lane_lengths, dict):
+            self._row_lengths = np.array([lane_lengths[lane_id] for lane_id, _ in lanes] + [0.0])
+        else:  # the same length for every lane
+            self._row_lengths = np.full(len(lanes) + 1, float(lane_lengths))
+        self._inner_edges = CELL_EDGES[:-1]
+        self._max_distance = CELL_EDGES[-1]
+
+
+    @classmethod
+    def for_agents(cls, agents, lane_lengths, num_states):
+        """
+        Encoder of the states of several agents at once, each in its own block of num_states values:
+        the encoded vector reshaped to (agents, num_states) has the state of one agent in every row
+        """
+        num_cells = len(CELL_EDGES)
+        if len(agents) > 1 and num_states % num_cells != 0:
+            raise ValueError("the state of every agent must be a whole number of lane groups of %i cells, not %i" % (num_cells, num_states))
+        lane_groups = []
+        for agent in agents:
+            if len(agent.lane_groups) * num_cells > num_states:
+                raise ValueError("the %i lane groups of %s do not fit in %i states" % (len(agent.lane_groups), ', '.join(agent.tl_ids), num_states))
+            lane_groups += agent.lane_groups + [[] for _ in range(num_states // num_cells - len(agent.lane_groups))]
+        return cls(lane_groups, lane_lengths, len(agents) * num_states)
+
+
+    def encode(self, lane_ids, lane_positions):
+        """
+        Build the cell occupancy state from the lane ids and lane positions of a batch of vehicles
+        """
+        state = np.zeros(self._num_states)
+        if len(lane_ids) == 0:
+            return state
+
+        lane_to_row = self._lane_to_row
+        rows = np.fromiter((lane_to_row.get(lane_id, -1) for lane_id in lane_ids), dtype=np.intp, count=len(lane_ids))
+        groups = self._row_groups[rows]
+        distances = self._row_lengths[rows] - np.asarray(lane_positions, dtype=float)  # inversion of lane pos, so if the car is close to the traffic light -> distance = 0
+
+        cells = np.searchsorted(self._inner_edges, distances, side='right')
+        # flag for not detecting cars crossing the intersection, driving away from it or beyond the last cell
+        valid = (groups >= 0) & (distances <= self._max_distance)
+        state[groups[valid] * self._num_cells + cells[valid]] = 1  # write every occupied cell at once
+        return state
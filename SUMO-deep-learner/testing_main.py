@@ -6,25 +6,42 @@ from shutil import copyfile
 
 from testing_simulation import Simulation
 from generator import TrafficGenerator
-from neural_net import TestModel
+from network import Network
 #from visualization import Visualization
-from utils import import_test_configuration, set_sumo, set_test_path
+from utils import import_test_configuration, set_backend, set_sumo, set_test_path
 
 
 if __name__ == "__main__":
 
     config = import_test_configuration(config_file='testing_config.ini')
     sumo_cmd = set_sumo(config['gui'], config['sumocfg_file_name'], config['max_steps'])
+    Backend = set_backend(config['backend'], config['gui'])
     model_path, plot_path = set_test_path(config['models_path_name'], config['model_to_test'])
 
-    Model = TestModel(
-        input_dimensions=config['num_states'],
-        model_path=model_path
-    )
+    if config['model_backend'] == 'numpy':
+        # evaluate the exported trained_model.npz without importing TensorFlow
+        from numpy_model import NumpyTestModel
+
+        Model = NumpyTestModel(
+            input_dimensions=config['num_states'],
+            model_path=model_path
+        )
+    else:
+        from neural_net import TestModel
+
+        Model = TestModel(
+            input_dimensions=config['num_states'],
+            model_path=model_path,
+            fast_inference=config['fast_inference']
+        )
+
+    Network = Network.load(config['networkID'])
 
     TrafficGen = TrafficGenerator(
+        Network,
         config['max_steps'], 
-        config['n_cars_generated']
+        config['n_cars_generated'],
+        config['route_cache_dir']
     )
 
     #Visualization = Visualization(
@@ -35,17 +52,28 @@ if __name__ == "__main__":
     Simulation = Simulation(
         Model,
         TrafficGen,
+        Network,
         sumo_cmd,
         config['max_steps'],
         config['green_duration'],
         config['yellow_duration'],
         config['num_states'],
-        config['num_actions']
+        config['num_actions'],
+        config['subscriptions'],
+        config['step_metrics'],
+        backend=Backend,
+        warmup_steps=config['warmup_steps'],
+        snapshot_dir=config['snapshot_dir'],
+        multi_agent=config['multi_agent'],
+        scheduler=config['scheduler'],
+        action_cache_size=config['action_cache_size']
     )
 
     print('\n----- Test episode')
     simulation_time = Simulation.run(config['episode_seed'])  # run the simulation
     print('Simulation time:', simulation_time, 's')
+    if Simulation.action_cache is not None:
+        print('Action cache hit rate:', round(100 * Simulation.action_cache.hit_rate, 1), '% of', Simulation.action_cache.hits + Simulation.action_cache.misses, 'lookups')
 
     print("----- Testing info saved at:", plot_path)
 
@@ -3,51 +3,18 @@ import numpy as np
 import random
 import timeit
 import os
-from utils import set_phaseID
-
-config = set_phaseID(config_file='config.ini')
-
-networkID = config['networkID']
-
-if networkID == 0:
-
-    # phase codes based on environment.net.xml
-    PHASE_NS_GREEN = 0  # action 0 code 00
-    PHASE_NS_YELLOW = 1
-    PHASE_NSL_GREEN = 2  # action 1 code 01
-    PHASE_NSL_YELLOW = 3
-    PHASE_EW_GREEN = 4  # action 2 code 10
-    PHASE_EW_YELLOW = 5
-    PHASE_EWL_GREEN = 6  # action 3 code 11
-    PHASE_EWL_YELLOW = 7
-
-elif networkID == 1:
-    # phase codes based on simple-intersection.net.xml
-    PHASE_NS_GREEN = 0  # action 0 code 00
-    PHASE_NS_YELLOW = 1
-    PHASE_EW_GREEN = 2  # action 1 code 01
-    PHASE_EW_YELLOW = 3
-
-elif networkID == 2:
-    # phase codes based on simple-roundabout.net.xml
-    PHASE_NS_GREEN = 0 # action 0 code 00
-    PHASE_NS_YELLOW = 1
-    PHASE_NS_RED = 2
-    PHASE_NS_THROUGH = 3 # action 1 code 01
-    PHASE_NS_THROUGH_YELLOW = 4
-    PHASE_NS_THROUGH_RED = 5
-
-elif networkID == 3:
-    # phase codes based on kinsale.net.xml
-    PHASE_NS_GREEN = 0  # action 0 code 00
-    PHASE_NS_YELLOW = 1
-    PHASE_EW_GREEN = 2  # action 1 code 01
-    PHASE_EW_YELLOW = 3
+from state_encoder import StateEncoder
+from traffic_reader import TrafficReader
+from scheduler import DecisionScheduler
+from action_cache import ActionCache, state_key
+from utils import queue_output_files, write_queue_additional, read_queue_output
+from snapshots import SNAPSHOT_OPTIONS, snapshot_file, save_snapshot
 
 class Simulation:
-    def __init__(self, neural_net, TrafficGen, sumo_cmd, max_steps, green_duration, yellow_duration, num_states, num_actions):
+    def __init__(self, neural_net, TrafficGen, network, sumo_cmd, max_steps, green_duration, yellow_duration, num_states, num_actions, use_subscriptions=False, step_metrics=True, backend=None, warmup_steps=0, snapshot_dir=None, multi_agent=False, scheduler=None, action_cache_size=0):
         self._Model = neural_net
         self._TrafficGen = TrafficGen
+        self._network = network
         self._step = 0
         self._sumo_cmd = sumo_cmd
         self._max_steps = max_steps
@@ -55,8 +22,23 @@ class Simulation:
         self._yellow_duration = yellow_duration
         self._num_states = num_states
         self._num_actions = num_actions
+        self._step_metrics = step_metrics  # False to advance sumo a whole phase at once, the queue lengths then come from the queue output
+        self._queue_file = None
+        if not step_metrics:
+            # sumo writes the halting vehicles of the incoming roads at every step, next to its summary output
+            additional_file, self._queue_file = queue_output_files(sumo_cmd)
+            write_queue_additional(additional_file, self._queue_file, network.incoming_edges)
+            self._sumo_cmd = sumo_cmd + ["--additional-files", additional_file]
+        self._agents = network.agents(multi_agent)  # with multi_agent, one agent per traffic light sharing the model
+        self._state_encoder = StateEncoder.for_agents(self._agents, network.lane_lengths, num_states)
+        self._traffic = TrafficReader(network, self._agents, use_subscriptions)
+        self._scheduler = DecisionScheduler(len(self._agents), **(scheduler or {}))  # the options of utils.import_test_configuration, the fixed grid by default
+        self._action_cache = ActionCache(action_cache_size) if action_cache_size > 0 else None  # packed state -> action, None to always query the model
+        self._traci = backend or traci  # traci or libsumo
+        self._warmup_steps = warmup_steps  # steps simulated before the first decision, without the controller
+        self._snapshot_dir = snapshot_dir  # None to simulate the warm-up of every episode
         self._reward_episode = []
-        self._queue_length_episode = []
+        self._queue_length_episode = np.zeros(0, dtype=np.int32)
 
 
     def run(self, episode):
@@ -66,51 +48,93 @@ class Simulation:
         start_time = timeit.default_timer()
 
         # first, generate the route file for this simulation and set up sumo
-        self._TrafficGen.generate_routefile(seed=episode)
-        traci.start(self._sumo_cmd)
+        route_file = self._TrafficGen.generate_routefile(seed=episode)
+        self._step = self._start_sumo(route_file)
+        self._traffic.start(self._traci)
         print("Simulating...")
 
         # inits
-        self._step = 0
-        self._waiting_times = {}
-        old_total_wait = 0
-        old_action = -1 # dummy init
+        self._queue_length_episode = np.zeros(self._max_steps, dtype=np.int32)  # the queue length of every step
+        self._scheduler.reset()
+        old_total_wait = np.zeros(len(self._agents))
+        if self._step > 0:  # the waiting time reached in the warm-up is no reward
+            self._traffic.read_vehicles()
+            old_total_wait = self._collect_waiting_times()
+        actions = None # dummy init
+        due = np.ones(len(self._agents), dtype=bool)  # the agents taking the decision, all of them at the first step
 
         while self._step < self._max_steps:
 
-            # get current state of the intersection
-            current_state = self._get_state()
+            # get current state of the intersection, one row per agent
+            current_states = self._get_state()
 
             # calculate reward of previous action: (change in cumulative waiting time between actions)
             # waiting time = seconds waited by a car since the spawn in the environment, cumulated for every car in incoming lanes
             current_total_wait = self._collect_waiting_times()
-            reward = old_total_wait - current_total_wait
+            rewards = old_total_wait[due] - current_total_wait[due]
 
             # choose the light phase to activate, based on the current state of the intersection
-            action = self._choose_action(current_state)
+            old_actions = actions
+            actions = self._choose_actions(current_states, due, old_actions)
 
             # if the chosen phase is different from the last phase, activate the yellow phase
-            if self._step != 0 and old_action != action:
-                self._set_yellow_phase(old_action)
+            if old_actions is not None and np.any(old_actions != actions):
+                self._set_yellow_phase(old_actions, actions)
                 self._simulate(self._yellow_duration)
 
             # execute the phase selected before
-            self._set_green_phase(action)
-            self._simulate(self._green_duration)
+            self._set_green_phase(actions, due)
+            if self._scheduler.event_driven:
+                self._scheduler.start_green(due, self._step, self._traffic.queued_roads())
 
             # saving variables for later & accumulate reward
-            old_action = action
-            old_total_wait = current_total_wait
+            old_total_wait[due] = current_total_wait[due]
 
-            self._reward_episode.append(reward)
+            self._reward_episode.append(float(np.sum(rewards)))  # the reward of the whole network
+
+            due = self._wait_for_decision()
 
         #print("Total reward:", np.sum(self._reward_episode))
-        traci.close()
+        self._traci.close()
+        self._read_queue_output()
         simulation_time = round(timeit.default_timer() - start_time, 1)
 
         return simulation_time
 
 
+    def _start_sumo(self, route_file):
+        """
+        Start sumo on the route file of the episode, past the warm-up steps simulated with the programs of the .net.xml.
+        With a snapshot folder, the warm-up is simulated once per network and route file and every episode starts from its snapshot
+        """
+        sumo_cmd = self._sumo_cmd + ["--net-file", self._network.net_file, "--route-files", route_file]
+        if self._warmup_steps == 0:
+            self._connect(sumo_cmd)
+            return 0
+
+        sumo_cmd = sumo_cmd + SNAPSHOT_OPTIONS
+        if self._snapshot_dir is None:
+            self._connect(sumo_cmd)
+            self._traci.simulationStep(float(self._warmup_steps))
+            return self._warmup_steps
+
+        snapshot = snapshot_file(self._snapshot_dir, self._network.net_file, route_file, self._warmup_steps)
+        if not os.path.isfile(snapshot):
+            # the episode that saves the snapshot starts again from it too: sumo restores the cars still waiting to be inserted
+            # slightly differently from how it simulates them, and every episode of a route file must go on from the same state
+            self._connect(sumo_cmd)
+            self._traci.simulationStep(float(self._warmup_steps))
+            save_snapshot(self._traci, snapshot)
+            self._traci.close()
+        # loaded on start, as simulation.loadState would insert the cars departing at the snapshot time twice
+        self._connect(sumo_cmd + ["--load-state", snapshot])
+        return self._warmup_steps
+
+
+    def _connect(self, sumo_cmd):
+        self._traci.start(sumo_cmd)
+
+
     def _simulate(self, steps_todo):
         """
         Proceed with the simulation in sumo
@@ -118,390 +142,128 @@ class Simulation:
         if (self._step + steps_todo) >= self._max_steps:  # do not do more steps than the maximum allowed number of steps
             steps_todo = self._max_steps - self._step
 
-        while steps_todo > 0:
-            traci.simulationStep()  # simulate 1 step in sumo
-            self._step += 1 # update the step counter
-            steps_todo -= 1
-            queue_length = self._get_queue_length() 
-            self._queue_length_episode.append(queue_length)
+        if steps_todo <= 0:
+            return
 
+        if self._step_metrics:
+            while steps_todo > 0:
+                self._traci.simulationStep()  # simulate 1 step in sumo
+                self._queue_length_episode[self._step] = self._traffic.queue_length()
+                self._step += 1 # update the step counter
+                steps_todo -= 1
+        else:
+            # a single round-trip: sumo runs until the given time, which is the step counter as the steps last 1s from time 0
+            self._traci.simulationStep(float(self._step + steps_todo))
+            self._queue_length_episode[self._step:self._step + steps_todo] = self._traffic.queue_length()
+            self._step += steps_todo
 
-    def _collect_waiting_times(self):
+
+    def _wait_for_decision(self):
         """
-        Retrieve the waiting time of every car in the incoming roads
+        Simulate until the next decision and return the agents taking it: every agent after each green phase on the fixed grid,
+        and event driven the agents whose green lasted min_green and saw a queue form or clear, or lasted max_green
         """
-        if networkID == 0:
-            incoming_roads = ["E2TL", "N2TL", "W2TL", "S2TL"]
-        elif networkID == 1:
-            incoming_roads = ["E3", "E5", "E4", "E6"]
-        elif networkID == 2:
-            incoming_roads = ["-E0", "-E1", "-E2", "-E3"]
-        elif networkID == 3:
-            incoming_roads = ["E9", "E10", "E11", "E8"]
-
-        car_list = traci.vehicle.getIDList()
-        for car_id in car_list:
-            wait_time = traci.vehicle.getAccumulatedWaitingTime(car_id)
-            road_id = traci.vehicle.getRoadID(car_id)  # get the road id where the car is located
-            if road_id in incoming_roads:  # consider only the waiting times of cars in incoming roads
-                self._waiting_times[car_id] = wait_time
-            else:
-                if car_id in self._waiting_times: # a car that was tracked has cleared the intersection
-                    del self._waiting_times[car_id] 
-        total_waiting_time = sum(self._waiting_times.values())
-        return total_waiting_time
+        if not self._scheduler.event_driven:
+            self._simulate(self._green_duration)
+            return np.ones(len(self._agents), dtype=bool)
+
+        while self._step < self._max_steps:
+            self._simulate(self._scheduler.next_check(self._step))
+            due = self._scheduler.due(self._step, self._traffic.queued_roads())
+            if due.any():
+                return due
+        return np.zeros(len(self._agents), dtype=bool)
 
 
-    def _choose_action(self, state):
+    def _collect_waiting_times(self):
         """
-        Pick the best action known based on the current state of the env
+        Running totals of the waiting time of the cars in the incoming roads of every agent, read along with the last state
         """
-        return np.argmax(self._Model.predict_one(state))
+        return self._traffic.waiting_times()
 
 
-    def _set_yellow_phase(self, old_action):
+    def _choose_actions(self, states, due, old_actions):
         """
-        Activate the correct yellow light combination in sumo
+        Pick the best action known based on the current state of the env, for every agent taking the decision,
+        with a single forward pass for the agents whose state changed since their last one and is not in the action cache
         """
-        if networkID == 0:
-            yellow_phase_code = old_action * 2 + 1 # obtain the yellow phase code, based on the old action (ref on environment.net.xml)
-            traci.trafficlight.setPhase("TL", yellow_phase_code)
-        elif networkID == 1:
-            #yellow_phase_code = old_action + 1 # obtain the yellow phase code, based on the old action (ref on simple-intersection.net.xml)
-            if old_action == 0:
-                yellow_phase_code = 1
+        actions = np.zeros(len(states), dtype=np.int64) if old_actions is None else old_actions.copy()
+        self._scheduler.validate(self._Model.version)  # the model may have been reloaded since the last decision
+        infer, inferred_actions = self._scheduler.recall(states, due)
+        actions[due] = inferred_actions[due]
+        if not infer.any():
+            return actions
+
+        predict = infer
+        if self._action_cache is not None:
+            self._action_cache.validate(self._Model.version)
+            keys = {agent: state_key(states[agent]) for agent in np.flatnonzero(infer)}
+            predict = infer.copy()
+            for agent, key in keys.items():
+                action = self._action_cache.get(key)
+                if action is not None:
+                    actions[agent] = action
+                    predict[agent] = False
+
+        if predict.any():
+            if len(states) == 1:
+                actions[predict] = np.argmax(self._Model.predict_one(states[0]))
             else:
-                yellow_phase_code = 3
-            traci.trafficlight.setPhase("J5", yellow_phase_code)
-        elif networkID == 2:
+                actions[predict] = np.argmax(self._Model.predict_batch(states[predict]), axis=1)
+            if self._action_cache is not None:
+                for agent in np.flatnonzero(predict):
+                    self._action_cache.put(keys[agent], actions[agent])
+        self._scheduler.remember(infer, actions)
+        return actions
 
-            if old_action == 0:
-                yellow_phase_code = 1
-            else:
-                yellow_phase_code = 4
-            traci.trafficlight.setPhase("J6", yellow_phase_code)
-            traci.trafficlight.setPhase("J8", yellow_phase_code)
-            traci.trafficlight.setPhase("J7", yellow_phase_code)
-            traci.trafficlight.setPhase("J9", yellow_phase_code)
-
-        elif networkID == 3:
-            if old_action == 0:
-                yellow_phase_code = 1
-            else:
-                yellow_phase_code = 3
-            traci.trafficlight.setPhase("J20", yellow_phase_code)
-            traci.trafficlight.setPhase("J21", yellow_phase_code)
-            traci.trafficlight.setPhase("J22", yellow_phase_code)
-            traci.trafficlight.setPhase("J23", yellow_phase_code)
 
+    def _set_yellow_phase(self, old_actions, actions):
+        """
+        Activate the correct yellow light combination in sumo, at the traffic lights of the agents changing phase
+        """
+        for agent, old_action, action in zip(self._agents, old_actions, actions):
+            if old_action != action:
+                yellow_phase_code = self._network.yellow_phases[old_action]  # obtain the yellow phase code, based on the old action (ref on the .net.xml)
+                for tl_id in agent.tl_ids:
+                    self._traci.trafficlight.setPhase(tl_id, yellow_phase_code)
 
-    def _set_green_phase(self, action_number):
+
+    def _set_green_phase(self, actions, due):
         """
-        Activate the correct green light combination in sumo
+        Activate the correct green light combination in sumo, at the traffic lights of the agents taking the decision
         """
-        if networkID == 0:
-            if action_number == 0:
-                traci.trafficlight.setPhase("TL", PHASE_NS_GREEN)
-            elif action_number == 1:
-                traci.trafficlight.setPhase("TL", PHASE_NSL_GREEN)
-            elif action_number == 2:
-                traci.trafficlight.setPhase("TL", PHASE_EW_GREEN)
-            elif action_number == 3:
-                traci.trafficlight.setPhase("TL", PHASE_EWL_GREEN)
-
-        elif networkID == 1:
-            if action_number == 0:
-                traci.trafficlight.setPhase("J5", PHASE_NS_GREEN)
-            elif action_number == 1:
-                traci.trafficlight.setPhase("J5", PHASE_EW_GREEN)
-
-        elif networkID == 2:
-            if action_number == 0:
-                traci.trafficlight.setPhase("J6", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J8", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J9", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J7", PHASE_NS_GREEN)
-            elif action_number == 1:
-                traci.trafficlight.setPhase("J6", PHASE_NS_THROUGH)
-                traci.trafficlight.setPhase("J8", PHASE_NS_THROUGH)
-                traci.trafficlight.setPhase("J9", PHASE_NS_THROUGH)
-                traci.trafficlight.setPhase("J7", PHASE_NS_THROUGH)
-
-        elif networkID == 3:
-            if action_number == 0:
-                traci.trafficlight.setPhase("J20", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J21", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J22", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J23", PHASE_NS_GREEN)
-            if action_number == 1:
-                traci.trafficlight.setPhase("J20", PHASE_EW_GREEN)
-                traci.trafficlight.setPhase("J21", PHASE_EW_GREEN)
-                traci.trafficlight.setPhase("J22", PHASE_EW_GREEN)
-                traci.trafficlight.setPhase("J23", PHASE_EW_GREEN)
-
-
-    def _get_queue_length(self):
+        for agent, action_number, deciding in zip(self._agents, actions, due):
+            if deciding:
+                green_phase_code = self._network.green_phases[action_number]
+                for tl_id in agent.tl_ids:
+                    self._traci.trafficlight.setPhase(tl_id, green_phase_code)
+
+
+    def _read_queue_output(self):
         """
-        Retrieve the number of cars with speed = 0 in every incoming lane
+        In fast mode, replace the queue length sampled at the end of every phase by the halting vehicles of the incoming roads
+        at every step, from the queue output that sumo wrote on close
         """
-        if networkID == 0:
-            halt_N = traci.edge.getLastStepHaltingNumber("N2TL")
-            halt_S = traci.edge.getLastStepHaltingNumber("S2TL")
-            halt_E = traci.edge.getLastStepHaltingNumber("E2TL")
-            halt_W = traci.edge.getLastStepHaltingNumber("W2TL")
-            queue_length = halt_N + halt_S + halt_E + halt_W
-
-        elif networkID == 1:
-            halt_W = traci.edge.getLastStepHaltingNumber("E3")
-            halt_N = traci.edge.getLastStepHaltingNumber("E5")
-            halt_E = traci.edge.getLastStepHaltingNumber("E4")
-            halt_S = traci.edge.getLastStepHaltingNumber("E6")
-            queue_length = halt_W + halt_N + halt_E + halt_S
-
-        elif networkID == 2:
-            halt_W = traci.edge.getLastStepHaltingNumber("-E0")
-            halt_N = traci.edge.getLastStepHaltingNumber("-E1")
-            halt_E = traci.edge.getLastStepHaltingNumber("-E2")
-            halt_S = traci.edge.getLastStepHaltingNumber("-E3")
-            queue_length = halt_W + halt_N + halt_E + halt_S
-
-        elif networkID == 3:
-            halt_W = traci.edge.getLastStepHaltingNumber("E9")
-            halt_N = traci.edge.getLastStepHaltingNumber("E10")
-            halt_E = traci.edge.getLastStepHaltingNumber("E11")
-            halt_S = traci.edge.getLastStepHaltingNumber("E8")
-            queue_length = halt_W + halt_N + halt_E + halt_S
-
-        return queue_length
+        if self._step_metrics:
+            return
+        times, halting = read_queue_output(self._queue_file)
+        after_warmup = (times >= self._warmup_steps) & (times < self._step)  # the output has no warm-up steps when they were restored
+        self._queue_length_episode[times[after_warmup]] = halting[after_warmup]
 
 
     def _get_state(self):
         """
-        Retrieve the state of the intersection from sumo, in the form of cell occupancy
+        Retrieve the vehicles of the incoming roads from sumo and the state of the intersection, in the form of cell occupancy,
+        with the state of every agent in a row
         """
-        state = np.zeros(self._num_states)
-        car_list = traci.vehicle.getIDList()
-        
-        if networkID == 0:
-            for car_id in car_list:
-                lane_pos = traci.vehicle.getLanePosition(car_id)
-                lane_id = traci.vehicle.getLaneID(car_id)
-                lane_pos = 750 - lane_pos  # inversion of lane pos, so if the car is close to the traffic light -> lane_pos = 0 --- 750 = max len of a road
-
-                # distance in meters from the traffic light -> mapping into cells
-                if lane_pos < 7:
-                    lane_cell = 0
-                elif lane_pos < 14:
-                    lane_cell = 1
-                elif lane_pos < 21:
-                    lane_cell = 2
-                elif lane_pos < 28:
-                    lane_cell = 3
-                elif lane_pos < 40:
-                    lane_cell = 4
-                elif lane_pos < 60:
-                    lane_cell = 5
-                elif lane_pos < 100:
-                    lane_cell = 6
-                elif lane_pos < 160:
-                    lane_cell = 7
-                elif lane_pos < 400:
-                    lane_cell = 8
-                elif lane_pos <= 750:
-                    lane_cell = 9
-
-                # finding the lane where the car is located 
-                # x2TL_3 are the "turn left only" lanes
-                if lane_id == "W2TL_0" or lane_id == "W2TL_1" or lane_id == "W2TL_2":
-                    lane_group = 0
-                elif lane_id == "W2TL_3":
-                    lane_group = 1
-                elif lane_id == "N2TL_0" or lane_id == "N2TL_1" or lane_id == "N2TL_2":
-                    lane_group = 2
-                elif lane_id == "N2TL_3":
-                    lane_group = 3
-                elif lane_id == "E2TL_0" or lane_id == "E2TL_1" or lane_id == "E2TL_2":
-                    lane_group = 4
-                elif lane_id == "E2TL_3":
-                    lane_group = 5
-                elif lane_id == "S2TL_0" or lane_id == "S2TL_1" or lane_id == "S2TL_2":
-                    lane_group = 6
-                elif lane_id == "S2TL_3":
-                    lane_group = 7
-                else:
-                    lane_group = -1
-
-                if lane_group >= 1 and lane_group <= 7:
-                    car_position = int(str(lane_group) + str(lane_cell))  # composition of the two postion ID to create a number in interval 0-79
-                    valid_car = True
-                elif lane_group == 0:
-                    car_position = lane_cell
-                    valid_car = True
-                else:
-                    valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
-
-                if valid_car:
-                    state[car_position] = 1  # write the position of the car car_id in the state array in the form of "cell occupied"
-
-        elif networkID == 1:
-            for car_id in car_list:
-                lane_pos = traci.vehicle.getLanePosition(car_id)
-                lane_id = traci.vehicle.getLaneID(car_id)
-                lane_pos = 750 - lane_pos  # inversion of lane pos, so if the car is close to the traffic light -> lane_pos = 0 --- 750 = max len of a road
-
-                # distance in meters from the traffic light -> mapping into cells
-                if lane_pos < 7:
-                    lane_cell = 0
-                elif lane_pos < 14:
-                    lane_cell = 1
-                elif lane_pos < 21:
-                    lane_cell = 2
-                elif lane_pos < 28:
-                    lane_cell = 3
-                elif lane_pos < 40:
-                    lane_cell = 4
-                elif lane_pos < 60:
-                    lane_cell = 5
-                elif lane_pos < 100:
-                    lane_cell = 6
-                elif lane_pos < 160:
-                    lane_cell = 7
-                elif lane_pos < 400:
-                    lane_cell = 8
-                elif lane_pos <= 750:
-                    lane_cell = 9
-
-                if lane_id == "E3_0":
-                    lane_group = 0
-                elif lane_id == "E5_0":
-                    lane_group = 1
-                elif lane_id == "E4_0":
-                    lane_group = 2
-                elif lane_id == "E6_0":
-                    lane_group = 3
-                else:
-                    lane_group = -1
-
-                if lane_group >= 1 and lane_group <= 3:
-                    car_position = int(str(lane_group) + str(lane_cell))  # composition of the two postion ID to create a number in interval 0-39
-                    valid_car = True
-                elif lane_group == 0:
-                    car_position = lane_cell
-                    valid_car = True
-                else:
-                    valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
-
-                if valid_car:
-                    state[car_position] = 1  # write the position of the car car_id in the state array in the form of "cell occupied"
-
-        
-        elif networkID == 2:
-            for car_id in car_list:
-                lane_pos = traci.vehicle.getLanePosition(car_id)
-                lane_id = traci.vehicle.getLaneID(car_id)
-                lane_pos = 720 - lane_pos  # inversion of lane pos, so if the car is close to the traffic light -> lane_pos = 0 --- 750 = max len of a road
-                # distance in meters from the traffic light -> mapping into cells
-                if lane_pos < 7:
-                    lane_cell = 0
-                elif lane_pos < 14:
-                    lane_cell = 1
-                elif lane_pos < 21:
-                    lane_cell = 2
-                elif lane_pos < 28:
-                    lane_cell = 3
-                elif lane_pos < 40:
-                    lane_cell = 4
-                elif lane_pos < 60:
-                    lane_cell = 5
-                elif lane_pos < 100:
-                    lane_cell = 6
-                elif lane_pos < 160:
-                    lane_cell = 7
-                elif lane_pos < 400:
-                    lane_cell = 8
-                elif lane_pos <= 750:
-                    lane_cell = 9
-
-                if lane_id == "-E0_0":
-                    lane_group = 0
-                elif lane_id == "-E1_0":
-                    lane_group = 1
-                elif lane_id == "-E2_0":
-                    lane_group = 2
-                elif lane_id == "-E3_0":
-                    lane_group = 3
-                else:
-                    lane_group = -1
-
-                if lane_group >= 1 and lane_group <= 3:
-                    car_position = int(str(lane_group) + str(lane_cell))  # composition of the two postion ID to create a number in interval 0-39
-                    valid_car = True
-                elif lane_group == 0:
-                    car_position = lane_cell
-                    valid_car = True
-                else:
-                    valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
-
-                if valid_car:
-                    state[car_position] = 1  # write the position of the car car_id in the state array in the form of "cell occupied"
-                
-
-        elif networkID == 3:
-            for car_id in car_list:
-                lane_pos = traci.vehicle.getLanePosition(car_id)
-                lane_id = traci.vehicle.getLaneID(car_id)
-                lane_pos = 640 - lane_pos  # inversion of lane pos, so if the car is close to the traffic light -> lane_pos = 0 --- 750 = max len of a road
-
-                # distance in meters from the traffic light -> mapping into cells
-                if lane_pos < 7:
-                    lane_cell = 0
-                elif lane_pos < 14:
-                    lane_cell = 1
-                elif lane_pos < 21:
-                    lane_cell = 2
-                elif lane_pos < 28:
-                    lane_cell = 3
-                elif lane_pos < 40:
-                    lane_cell = 4
-                elif lane_pos < 60:
-                    lane_cell = 5
-                elif lane_pos < 100:
-                    lane_cell = 6
-                elif lane_pos < 160:
-                    lane_cell = 7
-                elif lane_pos < 400:
-                    lane_cell = 8
-                elif lane_pos <= 750:
-                    lane_cell = 9
-
-                if lane_id == "E9_0" or lane_id == "E9_1" or lane_id == "E9_2":
-                    lane_group = 0
-                elif lane_id == "E10_0" or lane_id == "E10_1":
-                    lane_group = 1
-                elif lane_id == "E11_0" or lane_id == "E11_1" or lane_id == "E11_2":
-                    lane_group = 2
-                elif lane_id == "E8_0" or lane_id == "E8_1" or lane_id == "E8_2":
-                    lane_group = 3
-                else:
-                    lane_group = -1
-
-                if lane_group >= 1 and lane_group <= 3:
-                    car_position = int(str(lane_group) + str(lane_cell))  # composition of the two postion ID to create a number in interval 0-39
-                    valid_car = True
-                elif lane_group == 0:
-                    car_position = lane_cell
-                    valid_car = True
-                else:
-                    valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
-
-                if valid_car:
-                    state[car_position] = 1  # write the position of the car car_id in the state array in the form of "cell occupied"
-        return state
+        self._traffic.read_vehicles()
+        lane_ids, lane_positions = self._traffic.vehicle_positions()
+        return self._state_encoder.encode(lane_ids, lane_positions).reshape(len(self._agents), self._num_states)
 
 
     @property
     def queue_length_episode(self):
-        return self._queue_length_episode
+        return self._queue_length_episode[self._warmup_steps:self._step]
 
 
     @property
@@ -509,4 +271,14 @@ class Simulation:
         return self._reward_episode
 
 
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+
+    @property
+    def action_cache(self):
+        return self._action_cache
+
+
 
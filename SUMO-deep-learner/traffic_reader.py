@@ -0,0 +1,106 @@
+import numpy as np
+import traci.constants as tc
+
+from waiting_times import WaitingTimeTracker
+
+VEHICLE_VARIABLES = [tc.VAR_LANE_ID, tc.VAR_LANEPOSITION, tc.VAR_ACCUMULATED_WAITING_TIME]
+
+
+class TrafficReader:
+    """
+    Reads what the controllers need from sumo, for the training and the testing simulations alike: the vehicles in the
+    incoming roads with their lane, lane position and waiting time, and the halting number of every incoming road.
+    With subscriptions, every road sends its vehicles and halting number along with each step, and every vehicle
+    is subscribed while it is in one of the roads, so that each of them comes back exactly once per step
+    """
+    def __init__(self, network, agents, use_subscriptions=False):
+        self._network = network
+        self._agents = agents
+        self._use_subscriptions = use_subscriptions
+        # the incoming roads of the network, for the queue lengths, then the other roads entering the junctions of the agents
+        # and the roads of the lanes in the states
+        edge_ids = list(network.incoming_edges)
+        for agent in agents:
+            edge_ids += [edge_id for edge_id in agent.incoming_edges if edge_id not in edge_ids]
+            for group in agent.lane_groups:
+                edge_ids += [lane_id.rsplit('_', 1)[0] for lane_id in group if lane_id.rsplit('_', 1)[0] not in edge_ids]
+        self._edge_ids = edge_ids
+        self._traci = None
+
+
+    def start(self, traci_connection):
+        """
+        Read from a newly started sumo, subscribing to the vehicles and halting number of every road
+        """
+        self._traci = traci_connection
+        self._waiting_times = [WaitingTimeTracker() for _ in self._agents]
+        self._subscribed_vehicles = set()
+        self._vehicles = None
+        if self._use_subscriptions:
+            for edge_id in self._edge_ids:
+                self._traci.edge.subscribe(edge_id, [tc.LAST_STEP_VEHICLE_ID_LIST, tc.LAST_STEP_VEHICLE_HALTING_NUMBER])
+
+
+    def read_vehicles(self):
+        """
+        Read the vehicles of every road at the current step, once per decision: the state and the waiting times use them
+        """
+        if not self._use_subscriptions:
+            self._vehicles = {edge_id: {car_id: [getter(car_id) for getter in (self._traci.vehicle.getLaneID, self._traci.vehicle.getLanePosition, self._traci.vehicle.getAccumulatedWaitingTime)]
+                                        for car_id in self._traci.edge.getLastStepVehicleIDs(edge_id)} for edge_id in self._edge_ids}
+            return
+
+        edge_vehicles = {edge_id: self._traci.edge.getSubscriptionResults(edge_id)[tc.LAST_STEP_VEHICLE_ID_LIST] for edge_id in self._edge_ids}  # no round-trip
+        vehicles = {car_id for car_ids in edge_vehicles.values() for car_id in car_ids}
+        results = self._traci.vehicle.getAllSubscriptionResults()
+        for car_id in self._subscribed_vehicles - vehicles:
+            if car_id in results:  # past the junction, the subscriptions of the vehicles that left the network ended with them
+                self._traci.vehicle.unsubscribe(car_id)
+        for car_id in vehicles - self._subscribed_vehicles:
+            self._traci.vehicle.subscribe(car_id, VEHICLE_VARIABLES)  # one round-trip per vehicle, then its variables come with every step
+        self._subscribed_vehicles = vehicles
+        results = self._traci.vehicle.getAllSubscriptionResults()  # with the current values of the new vehicles
+        self._vehicles = {edge_id: {car_id: [results[car_id][variable] for variable in VEHICLE_VARIABLES] for car_id in car_ids}
+                          for edge_id, car_ids in edge_vehicles.items()}
+
+
+    def vehicle_positions(self):
+        """
+        Lane ids and lane positions of the vehicles read last
+        """
+        values = [car for cars in self._vehicles.values() for car in cars.values()]
+        return [lane_id for lane_id, _, _ in values], [lane_position for _, lane_position, _ in values]
+
+
+    def waiting_times(self):
+        """
+        Running total of the waiting time of the cars read last in the incoming roads of every agent
+        """
+        total_wait = np.zeros(len(self._agents))
+        for agent_index, agent in enumerate(self._agents):
+            waiting_times = {car_id: values[2] for edge_id in agent.incoming_edges for car_id, values in self._vehicles[edge_id].items()}
+            total_wait[agent_index] = self._waiting_times[agent_index].update(waiting_times)
+        return total_wait
+
+
+    def halting(self, edge_id):
+        """
+        Vehicles with speed ~0 in a road at the current step
+        """
+        if self._use_subscriptions:
+            return self._traci.edge.getSubscriptionResults(edge_id)[tc.LAST_STEP_VEHICLE_HALTING_NUMBER]  # no round-trip
+        return self._traci.edge.getLastStepHaltingNumber(edge_id)
+
+
+    def queue_length(self):
+        """
+        Vehicles with speed ~0 in the incoming roads of the network
+        """
+        return sum(self.halting(edge_id) for edge_id in self._network.incoming_edges)
+
+
+    def queued_roads(self):
+        """
+        Which roads entering the junction of every agent have halting vehicles, the detectors of the scheduler
+        """
+        return [tuple(self.halting(edge_id) > 0 for edge_id in agent.incoming_edges) for agent in self._agents]
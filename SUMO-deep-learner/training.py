@@ -3,55 +3,18 @@ import numpy as np
 import random
 import timeit
 import os
-from utils import set_phaseID
-
-
-
-config = set_phaseID(config_file='config.ini')
-
-networkID = config['networkID']
-
-if networkID == 0:
-
-    # phase codes based on environment.net.xml
-    PHASE_NS_GREEN = 0  # action 0 code 00
-    PHASE_NS_YELLOW = 1
-    PHASE_NSL_GREEN = 2  # action 1 code 01
-    PHASE_NSL_YELLOW = 3
-    PHASE_EW_GREEN = 4  # action 2 code 10
-    PHASE_EW_YELLOW = 5
-    PHASE_EWL_GREEN = 6  # action 3 code 11
-    PHASE_EWL_YELLOW = 7
-
-elif networkID == 1:
-    # phase codes based on simple-intersection.net.xml
-    PHASE_NS_GREEN = 0  # action 0 code 00
-    PHASE_NS_YELLOW = 1
-    PHASE_EW_GREEN = 2  # action 1 code 01
-    PHASE_EW_YELLOW = 3
-
-elif networkID == 2:
-    # phase codes based on simple-roundabout.net.xml
-    PHASE_NS_GREEN = 0 # action 0 code 00
-    PHASE_NS_YELLOW = 1
-    PHASE_NS_RED = 2
-    PHASE_NS_THROUGH = 3 # action 1 code 01
-    PHASE_NS_THROUGH_YELLOW = 4
-    PHASE_NS_THROUGH_RED = 5
-
-elif networkID == 3:
-    # phase codes based on kinsale.net.xml
-    PHASE_NS_GREEN = 0  # action 0 code 00
-    PHASE_NS_YELLOW = 1
-    PHASE_EW_GREEN = 2  # action 1 code 01
-    PHASE_EW_YELLOW = 3
+from state_encoder import StateEncoder
+from traffic_reader import TrafficReader
+from scheduler import DecisionScheduler
+from utils import queue_output_files, write_queue_additional, read_queue_output
 
 
 class Simulation:
-    def __init__(self, neural_net, replay_memory, TrafficGen, sumo_cmd, gamma, max_steps, green_duration, yellow_duration, num_states, num_actions, training_epochs):
+    def __init__(self, neural_net, replay_memory, TrafficGen, network, sumo_cmd, gamma, max_steps, green_duration, yellow_duration, num_states, num_actions, training_epochs, use_subscriptions=False, step_metrics=True, route_file=None, backend=None, warmup_steps=0, multi_agent=False, scheduler=None):
         self._neural_net = neural_net
         self._replay_memory = replay_memory
         self._TrafficGen = TrafficGen
+        self._network = network
         self._gamma = gamma
         self._step = 0
         self._sumo_cmd = sumo_cmd
@@ -61,102 +24,157 @@ class Simulation:
         self._num_states = num_states
         self._num_actions = num_actions
         self._training_epochs = training_epochs
+        self._replay_inputs = np.zeros((2 * neural_net.batch_size, num_states), dtype=np.float32)
+        self._step_metrics = step_metrics  # False to advance sumo a whole phase at once, the queue lengths then come from the queue output
+        self._queue_file = None
+        if not step_metrics:
+            # sumo writes the halting vehicles of the incoming roads at every step, next to its summary output
+            additional_file, self._queue_file = queue_output_files(sumo_cmd)
+            write_queue_additional(additional_file, self._queue_file, network.incoming_edges)
+            self._sumo_cmd = sumo_cmd + ["--additional-files", additional_file]
+        self._queue_lengths = np.zeros(max_steps, dtype=np.int32)  # the queue length of every step of the episode
+        self._agents = network.agents(multi_agent)  # with multi_agent, one agent per traffic light sharing the neural net
+        self._state_encoder = StateEncoder.for_agents(self._agents, network.lane_lengths, num_states)
+        self._traffic = TrafficReader(network, self._agents, use_subscriptions)
+        self._scheduler = DecisionScheduler(len(self._agents), **(scheduler or {}))  # the options of utils.import_train_configuration, the fixed grid by default
+        self._route_file = route_file
+        self._traci = backend or traci  # traci or libsumo
+        self._warmup_steps = warmup_steps  # steps simulated before the first decision, without the controller
         self._reward_store = []
         self._cumulative_wait_store = []
         self._avg_queue_length_store = []
 
 
     def run_simulation(self, episode, epsilon):
+        simulation_time = self.run_episode(episode, epsilon)
+
+        print("TRAINING")
+        start_time = timeit.default_timer()
+        self.train(self._training_epochs)
+        training_time = round(timeit.default_timer() - start_time,1)
+
+        return simulation_time, training_time
+
+
+    def run_episode(self, episode, epsilon):
+        """
+        Simulate one episode in sumo, adding its samples to the replay memory but without training
+        """
         start_time = timeit.default_timer()
 
         #Generate traffic and route file for this simulation + configure sumo
-        self._TrafficGen.generate_routefile(seed=episode)
-        traci.start(self._sumo_cmd)
+        route_file = self._TrafficGen.generate_routefile(seed=episode, route_file=self._route_file)
+        self._step = self._start_sumo(route_file)
+        self._traffic.start(self._traci)
         print("Simulating...")
 
         #initialise variables for simulation
-        self._step = 0
-        self._waiting_times = {}
         self._sum_neg_reward = 0
         self._sum_total_reward = 0
-        self._sum_queue_length = 0
-        self._sum_waiting_time = 0
-        old_total_wait = 0
-        old_state = -1
-        old_action = -1
+        self._queue_lengths[:] = 0
+        self._scheduler.reset()
+        old_total_wait = np.zeros(len(self._agents))
+        if self._step > 0:  # the waiting time reached in the warm-up is no reward
+            self._traffic.read_vehicles()
+            old_total_wait = self._collect_waiting_times()
+        old_states = np.zeros((len(self._agents), self._num_states))
+        actions = None
+        due = np.ones(len(self._agents), dtype=bool)  # the agents taking the decision, all of them at the first step
         print("max = ", self._max_steps)
 
         while self._step < self._max_steps:
-            # get state of intersection
+            # get state of intersection, one row per agent
             #print("step--", self._step)
-            current_state = self._get_state()
+            current_states = self._get_state()
 
-            # calculate reward of previous action (change in total waiting time between previous and current action)
+            # calculate reward of previous action (change in total waiting time between previous and current action), for every agent
             current_total_wait = self._collect_waiting_times()
 
-            reward = old_total_wait - current_total_wait
+            rewards = old_total_wait - current_total_wait
 
-            if self._step != 0:
-                # add this state/action/reward to replay memory
-                self._replay_memory.add_sample((old_state, old_action, reward, current_state))
+            if actions is not None:
+                # add this state/action/reward of every agent taking the decision to replay memory
+                for agent in np.flatnonzero(due):
+                    self._replay_memory.add_sample((old_states[agent], actions[agent], rewards[agent], current_states[agent]))
 
             # choose next action to take
-            action = self._choose_action(current_state, epsilon)
+            old_actions = actions
+            actions = self._choose_actions(current_states, epsilon, due, old_actions)
 
             # if chosen light phase is a change, activate yellow phase
-            if self._step != 0 and old_action != action:
-                self._set_yellow_phase(old_action)
+            if old_actions is not None and np.any(old_actions != actions):
+                self._set_yellow_phase(old_actions, actions)
                 self._simulate(self._yellow_duration)
 
             # execute the phase selected before
-            self._set_green_phase(action)
-            self._simulate(self._green_duration)
+            self._set_green_phase(actions, due)
+            if self._scheduler.event_driven:
+                self._scheduler.start_green(due, self._step, self._traffic.queued_roads())
 
             # save variables
-            old_state = current_state
-            old_action = action
-            old_total_wait = current_total_wait
+            old_states[due] = current_states[due]
+            old_total_wait[due] = current_total_wait[due]
+
+            self._sum_total_reward += float(np.sum(rewards[due & (rewards > 0)]))
 
-            if reward > 0:
-                self._sum_total_reward += reward
+            due = self._wait_for_decision()
 
+        self._traci.close()
+        self._read_queue_output()
         self._save_episode_stats()
         print("Total reward gained:", self._sum_total_reward, "- Epsilon:", round(epsilon, 2))
-        traci.close()
         simulation_time = round(timeit.default_timer() - start_time, 1)
 
-        print("TRAINING")
-        start_time = timeit.default_timer()
-        for _ in range(self._training_epochs):
+        return simulation_time
+
+
+    def train(self, epochs):
+        for _ in range(epochs):
             # perform replay memory training on the neural net, one (batch) for each epoch selected
             self._replay()
-        training_time = round(timeit.default_timer() - start_time,1)
 
-        return simulation_time, training_time
-        
-    def _replay(self):
-        batch = self._replay_memory.get_samples(self._neural_net.batch_size)
 
-        # if samples are available, extract state and next state from each
-        if len(batch) > 0:
-            states = np.array([val[0] for val in batch])
-            next_states = np.array([val[3] for val in batch])
+    def _start_sumo(self, route_file):
+        """
+        Start sumo on the route file of the episode, past the warm-up steps simulated with the programs of the .net.xml.
+        Every training episode has a route file of its own, so a snapshot of its warm-up would never be restored
+        """
+        self._traci.start(self._sumo_cmd + ["--net-file", self._network.net_file, "--route-files", route_file])
+        if self._warmup_steps > 0:
+            self._traci.simulationStep(float(self._warmup_steps))
+        return self._warmup_steps
+
+
+    def _replay(self):
+        if self._replay_memory.prioritized:
+            states, actions, rewards, next_states, indices, weights, writes = self._replay_memory.get_samples(self._neural_net.batch_size)
+        else:
+            states, actions, rewards, next_states = self._replay_memory.get_samples(self._neural_net.batch_size)
+            weights = None
 
-            qsa = self._neural_net.predict_batch(states)
-            qsa_next = self._neural_net.predict_batch(next_states)
+        # if samples are available, they come already stacked as arrays
+        if len(states) > 0:
+            n = len(states)
 
-            # setup training arrays
-            x = np.zeros((len(batch), self._num_states))
-            y = np.zeros((len(batch), self._num_actions))
+            if self._neural_net.target_network:
+                # Q(state) and the value of the next state under the target net, in a single call
+                qsa, next_values = self._neural_net.predict_targets(states, next_states)
+            else:
+                # predict Q(state) and Q(next state) in a single forward pass, reusing the same input buffer every epoch
+                inputs = self._replay_inputs[:2 * n]
+                inputs[:n] = states
+                inputs[n:] = next_states
+                q_values = self._neural_net.predict_batch(inputs)
+                qsa, next_values = q_values[:n], np.amax(q_values[n:], axis=1)
 
-            for i, b in enumerate(batch):
-                state, action, reward, _ = b[0], b[1], b[2], b[3]  # extract state/action/reward/state'
-                current_q = qsa[i]  # get the predicted Q(state)
-                current_q[action] = reward + self._gamma * np.amax(qsa_next[i])  # update Q(state, action)
-                x[i] = state
-                y[i] = current_q  # Q(state) that includes the updated action value
+            # update Q(state, action) of every sample at once, so qsa becomes the training target
+            targets = rewards + self._gamma * next_values
+            td_errors = targets - qsa[np.arange(n), actions]
+            qsa[np.arange(n), actions] = targets
 
-            self._neural_net.train_batch(x, y)  # train the NN
+            self._neural_net.train_batch(states, qsa, weights)  # train the NN, the weights undo the bias of prioritized sampling
+            if weights is not None:
+                self._replay_memory.update_priorities(indices, td_errors, writes)  # the actors may have replaced some of the samples since
 
 
 
@@ -164,398 +182,118 @@ class Simulation:
 
 
 
-    def _choose_action(self, state, epsilon):
-        # expoloration vs exploitation
-        if random.random() < epsilon:
-            return random.randint(0, self._num_actions - 1) # random action
-        else:
-            return np.argmax(self._neural_net.predict_single(state)) # the best action given the current state
+    def _choose_actions(self, states, epsilon, due, old_actions):
+        # expoloration vs exploitation, for every agent taking the decision
+        explore = np.array([deciding and random.random() < epsilon for deciding in due])
+        actions = np.zeros(len(states), dtype=np.int64) if old_actions is None else old_actions.copy()
+        for agent in np.flatnonzero(explore):
+            actions[agent] = random.randint(0, self._num_actions - 1) # random action
+        # the best action given the current state, in a single forward pass for the greedy agents whose state changed since their last one
+        greedy = due & ~explore
+        self._scheduler.validate(self._neural_net.version)  # the learner may have trained the net since the last decision
+        infer, inferred_actions = self._scheduler.recall(states, greedy)
+        actions[greedy] = inferred_actions[greedy]
+        if infer.any():
+            if len(states) == 1:
+                q_values = self._neural_net.predict_single(states[0])
+            else:
+                q_values = self._neural_net.predict_batch(states[infer])
+            actions[infer] = np.argmax(q_values, axis=-1)
+            self._scheduler.remember(infer, actions)
+        return actions
 
 
+    def _wait_for_decision(self):
+        """
+        Simulate until the next decision and return the agents taking it: every agent after each green phase on the fixed grid,
+        and event driven the agents whose green lasted min_green and saw a queue form or clear, or lasted max_green
+        """
+        if not self._scheduler.event_driven:
+            self._simulate(self._green_duration)
+            return np.ones(len(self._agents), dtype=bool)
+
+        while self._step < self._max_steps:
+            self._simulate(self._scheduler.next_check(self._step))
+            due = self._scheduler.due(self._step, self._traffic.queued_roads())
+            if due.any():
+                return due
+        return np.zeros(len(self._agents), dtype=bool)
 
 
     def _get_state(self):
         """
-        Retrieve the state of the intersection from sumo, in the form of cell occupancy
+        Retrieve the vehicles of the incoming roads from sumo and the state of the intersection, in the form of cell occupancy,
+        with the state of every agent in a row
         """
-        state = np.zeros(self._num_states)
-        car_list = traci.vehicle.getIDList()
-        
-        if networkID == 0:
-            for car_id in car_list:
-                lane_pos = traci.vehicle.getLanePosition(car_id)
-                lane_id = traci.vehicle.getLaneID(car_id)
-                lane_pos = 750 - lane_pos  # inversion of lane pos, so if the car is close to the traffic light -> lane_pos = 0 --- 750 = max len of a road
-
-                # distance in meters from the traffic light -> mapping into cells
-                if lane_pos < 7:
-                    lane_cell = 0
-                elif lane_pos < 14:
-                    lane_cell = 1
-                elif lane_pos < 21:
-                    lane_cell = 2
-                elif lane_pos < 28:
-                    lane_cell = 3
-                elif lane_pos < 40:
-                    lane_cell = 4
-                elif lane_pos < 60:
-                    lane_cell = 5
-                elif lane_pos < 100:
-                    lane_cell = 6
-                elif lane_pos < 160:
-                    lane_cell = 7
-                elif lane_pos < 400:
-                    lane_cell = 8
-                elif lane_pos <= 750:
-                    lane_cell = 9
-
-                # finding the lane where the car is located 
-                # x2TL_3 are the "turn left only" lanes
-                if lane_id == "W2TL_0" or lane_id == "W2TL_1" or lane_id == "W2TL_2":
-                    lane_group = 0
-                elif lane_id == "W2TL_3":
-                    lane_group = 1
-                elif lane_id == "N2TL_0" or lane_id == "N2TL_1" or lane_id == "N2TL_2":
-                    lane_group = 2
-                elif lane_id == "N2TL_3":
-                    lane_group = 3
-                elif lane_id == "E2TL_0" or lane_id == "E2TL_1" or lane_id == "E2TL_2":
-                    lane_group = 4
-                elif lane_id == "E2TL_3":
-                    lane_group = 5
-                elif lane_id == "S2TL_0" or lane_id == "S2TL_1" or lane_id == "S2TL_2":
-                    lane_group = 6
-                elif lane_id == "S2TL_3":
-                    lane_group = 7
-                else:
-                    lane_group = -1
-
-                if lane_group >= 1 and lane_group <= 7:
-                    car_position = int(str(lane_group) + str(lane_cell))  # composition of the two postion ID to create a number in interval 0-79
-                    valid_car = True
-                elif lane_group == 0:
-                    car_position = lane_cell
-                    valid_car = True
-                else:
-                    valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
-
-                if valid_car:
-                    state[car_position] = 1  # write the position of the car car_id in the state array in the form of "cell occupied"
-
-        elif networkID == 1:
-            for car_id in car_list:
-                lane_pos = traci.vehicle.getLanePosition(car_id)
-                lane_id = traci.vehicle.getLaneID(car_id)
-                lane_pos = 750 - lane_pos  # inversion of lane pos, so if the car is close to the traffic light -> lane_pos = 0 --- 750 = max len of a road
-
-                # distance in meters from the traffic light -> mapping into cells
-                if lane_pos < 7:
-                    lane_cell = 0
-                elif lane_pos < 14:
-                    lane_cell = 1
-                elif lane_pos < 21:
-                    lane_cell = 2
-                elif lane_pos < 28:
-                    lane_cell = 3
-                elif lane_pos < 40:
-                    lane_cell = 4
-                elif lane_pos < 60:
-                    lane_cell = 5
-                elif lane_pos < 100:
-                    lane_cell = 6
-                elif lane_pos < 160:
-                    lane_cell = 7
-                elif lane_pos < 400:
-                    lane_cell = 8
-                elif lane_pos <= 750:
-                    lane_cell = 9
-
-                if lane_id == "E3_0":
-                    lane_group = 0
-                elif lane_id == "E5_0":
-                    lane_group = 1
-                elif lane_id == "E4_0":
-                    lane_group = 2
-                elif lane_id == "E6_0":
-                    lane_group = 3
-                else:
-                    lane_group = -1
-
-                if lane_group >= 1 and lane_group <= 3:
-                    car_position = int(str(lane_group) + str(lane_cell))  # composition of the two postion ID to create a number in interval 0-39
-                    valid_car = True
-                elif lane_group == 0:
-                    car_position = lane_cell
-                    valid_car = True
-                else:
-                    valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
-
-                if valid_car:
-                    state[car_position] = 1  # write the position of the car car_id in the state array in the form of "cell occupied"
-
-        
-        elif networkID == 2:
-            for car_id in car_list:
-                lane_pos = traci.vehicle.getLanePosition(car_id)
-                lane_id = traci.vehicle.getLaneID(car_id)
-                lane_pos = 720 - lane_pos  # inversion of lane pos, so if the car is close to the traffic light -> lane_pos = 0 --- 750 = max len of a road
-                # distance in meters from the traffic light -> mapping into cells
-                if lane_pos < 7:
-                    lane_cell = 0
-                elif lane_pos < 14:
-                    lane_cell = 1
-                elif lane_pos < 21:
-                    lane_cell = 2
-                elif lane_pos < 28:
-                    lane_cell = 3
-                elif lane_pos < 40:
-                    lane_cell = 4
-                elif lane_pos < 60:
-                    lane_cell = 5
-                elif lane_pos < 100:
-                    lane_cell = 6
-                elif lane_pos < 160:
-                    lane_cell = 7
-                elif lane_pos < 400:
-                    lane_cell = 8
-                elif lane_pos <= 750:
-                    lane_cell = 9
-
-                if lane_id == "-E0_0":
-                    lane_group = 0
-                elif lane_id == "-E1_0":
-                    lane_group = 1
-                elif lane_id == "-E2_0":
-                    lane_group = 2
-                elif lane_id == "-E3_0":
-                    lane_group = 3
-                else:
-                    lane_group = -1
-
-                if lane_group >= 1 and lane_group <= 3:
-                    car_position = int(str(lane_group) + str(lane_cell))  # composition of the two postion ID to create a number in interval 0-39
-                    valid_car = True
-                elif lane_group == 0:
-                    car_position = lane_cell
-                    valid_car = True
-                else:
-                    valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
-
-                if valid_car:
-                    state[car_position] = 1  # write the position of the car car_id in the state array in the form of "cell occupied"
-                
+        self._traffic.read_vehicles()
+        lane_ids, lane_positions = self._traffic.vehicle_positions()
+        return self._state_encoder.encode(lane_ids, lane_positions).reshape(len(self._agents), self._num_states)
 
-        elif networkID == 3:
-            for car_id in car_list:
-                lane_pos = traci.vehicle.getLanePosition(car_id)
-                lane_id = traci.vehicle.getLaneID(car_id)
-                lane_pos = 640 - lane_pos  # inversion of lane pos, so if the car is close to the traffic light -> lane_pos = 0 --- 750 = max len of a road
-                print(car_id, lane_pos)
-
-                # distance in meters from the traffic light -> mapping into cells
-                if lane_pos < 7:
-                    lane_cell = 0
-                elif lane_pos < 14:
-                    lane_cell = 1
-                elif lane_pos < 21:
-                    lane_cell = 2
-                elif lane_pos < 28:
-                    lane_cell = 3
-                elif lane_pos < 40:
-                    lane_cell = 4
-                elif lane_pos < 60:
-                    lane_cell = 5
-                elif lane_pos < 100:
-                    lane_cell = 6
-                elif lane_pos < 160:
-                    lane_cell = 7
-                elif lane_pos < 400:
-                    lane_cell = 8
-                elif lane_pos <= 750:
-                    lane_cell = 9
-
-                if lane_id == "E9_0" or lane_id == "E9_1" or lane_id == "E9_2":
-                    lane_group = 0
-                elif lane_id == "E10_0" or lane_id == "E10_1":
-                    lane_group = 1
-                elif lane_id == "E11_0" or lane_id == "E11_1" or lane_id == "E11_2":
-                    lane_group = 2
-                elif lane_id == "E8_0" or lane_id == "E8_1" or lane_id == "E8_2":
-                    lane_group = 3
-                else:
-                    lane_group = -1
-
-                if lane_group >= 1 and lane_group <= 3:
-                    car_position = int(str(lane_group) + str(lane_cell))  # composition of the two postion ID to create a number in interval 0-39
-                    valid_car = True
-                elif lane_group == 0:
-                    car_position = lane_cell
-                    valid_car = True
-                else:
-                    valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
-
-                if valid_car:
-                    state[car_position] = 1  # write the position of the car car_id in the state array in the form of "cell occupied"
-        return state
-    
 
     def _collect_waiting_times(self):
         """
-        Retrieve the waiting time of every car in the incoming roads
+        Running totals of the waiting time of the cars in the incoming roads of every agent, read along with the last state
         """
-        if networkID == 0:
-            incoming_roads = ["E2TL", "N2TL", "W2TL", "S2TL"]
-        elif networkID == 1:
-            incoming_roads = ["E3", "E5", "E4", "E6"]
-        elif networkID == 2:
-            incoming_roads = ["-E0", "-E1", "-E2", "-E3"]
-        elif networkID == 3:
-            incoming_roads = ["E9", "E10", "E11", "E8"]
-
-        car_list = traci.vehicle.getIDList()
-        for car_id in car_list:
-            wait_time = traci.vehicle.getAccumulatedWaitingTime(car_id)
-            road_id = traci.vehicle.getRoadID(car_id)  # get the road id where the car is located
-            if road_id in incoming_roads:  # consider only the waiting times of cars in incoming roads
-                self._waiting_times[car_id] = wait_time
-            else:
-                if car_id in self._waiting_times: # a car that was tracked has cleared the intersection
-                    del self._waiting_times[car_id] 
-        total_waiting_time = sum(self._waiting_times.values())
-        return total_waiting_time
+        return self._traffic.waiting_times()
 
-    def _set_yellow_phase(self, old_action):
+    def _set_yellow_phase(self, old_actions, actions):
         """
-        Activate the correct yellow light combination in sumo
+        Activate the correct yellow light combination in sumo, at the traffic lights of the agents changing phase
         """
-        if networkID == 0:
-            yellow_phase_code = old_action * 2 + 1 # obtain the yellow phase code, based on the old action (ref on environment.net.xml)
-            traci.trafficlight.setPhase("TL", yellow_phase_code)
-        elif networkID == 1:
-            #yellow_phase_code = old_action + 1 # obtain the yellow phase code, based on the old action (ref on simple-intersection.net.xml)
-            if old_action == 0:
-                yellow_phase_code = 1
-            else:
-                yellow_phase_code = 3
-            traci.trafficlight.setPhase("J5", yellow_phase_code)
-        elif networkID == 2:
+        for agent, old_action, action in zip(self._agents, old_actions, actions):
+            if old_action != action:
+                yellow_phase_code = self._network.yellow_phases[old_action]  # obtain the yellow phase code, based on the old action (ref on the .net.xml)
+                for tl_id in agent.tl_ids:
+                    self._traci.trafficlight.setPhase(tl_id, yellow_phase_code)
 
-            if old_action == 0:
-                yellow_phase_code = 1
-            else:
-                yellow_phase_code = 4
-            traci.trafficlight.setPhase("J6", yellow_phase_code)
-            traci.trafficlight.setPhase("J8", yellow_phase_code)
-            traci.trafficlight.setPhase("J7", yellow_phase_code)
-            traci.trafficlight.setPhase("J9", yellow_phase_code)
-
-        elif networkID == 3:
-            if old_action == 0:
-                yellow_phase_code = 1
-            else:
-                yellow_phase_code = 3
-            traci.trafficlight.setPhase("J20", yellow_phase_code)
-            traci.trafficlight.setPhase("J21", yellow_phase_code)
-            traci.trafficlight.setPhase("J22", yellow_phase_code)
-            traci.trafficlight.setPhase("J23", yellow_phase_code)
-
-    def _set_green_phase(self, action_number):
+    def _set_green_phase(self, actions, due):
         """
-        Activate the correct green light combination in sumo
+        Activate the correct green light combination in sumo, at the traffic lights of the agents taking the decision
         """
-        if networkID == 0:
-            if action_number == 0:
-                traci.trafficlight.setPhase("TL", PHASE_NS_GREEN)
-            elif action_number == 1:
-                traci.trafficlight.setPhase("TL", PHASE_NSL_GREEN)
-            elif action_number == 2:
-                traci.trafficlight.setPhase("TL", PHASE_EW_GREEN)
-            elif action_number == 3:
-                traci.trafficlight.setPhase("TL", PHASE_EWL_GREEN)
-
-        elif networkID == 1:
-            if action_number == 0:
-                traci.trafficlight.setPhase("J5", PHASE_NS_GREEN)
-            elif action_number == 1:
-                traci.trafficlight.setPhase("J5", PHASE_EW_GREEN)
-
-        elif networkID == 2:
-            if action_number == 0:
-                traci.trafficlight.setPhase("J6", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J8", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J9", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J7", PHASE_NS_GREEN)
-            elif action_number == 1:
-                traci.trafficlight.setPhase("J6", PHASE_NS_THROUGH)
-                traci.trafficlight.setPhase("J8", PHASE_NS_THROUGH)
-                traci.trafficlight.setPhase("J9", PHASE_NS_THROUGH)
-                traci.trafficlight.setPhase("J7", PHASE_NS_THROUGH)
-
-        elif networkID == 3:
-            if action_number == 0:
-                traci.trafficlight.setPhase("J20", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J21", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J22", PHASE_NS_GREEN)
-                traci.trafficlight.setPhase("J23", PHASE_NS_GREEN)
-            if action_number == 1:
-                traci.trafficlight.setPhase("J20", PHASE_EW_GREEN)
-                traci.trafficlight.setPhase("J21", PHASE_EW_GREEN)
-                traci.trafficlight.setPhase("J22", PHASE_EW_GREEN)
-                traci.trafficlight.setPhase("J23", PHASE_EW_GREEN)
+        for agent, action_number, deciding in zip(self._agents, actions, due):
+            if deciding:
+                green_phase_code = self._network.green_phases[action_number]
+                for tl_id in agent.tl_ids:
+                    self._traci.trafficlight.setPhase(tl_id, green_phase_code)
     
     def _simulate(self, steps_todo):
         # Execute steps in sumo
         if (self._step + steps_todo) >= self._max_steps:
             steps_todo = self._max_steps - self._step
 
-        while steps_todo > 0:
-            traci.simulationStep()  # simulate 1 step in sumo
-            self._step += 1
-            steps_todo -= 1
-            new_queue_length = self._get_queue_length()
-            self._sum_queue_length += new_queue_length
-            # queue_length == waited_seconds
-            self._sum_waiting_time += new_queue_length
+        if steps_todo <= 0:
+            return
+
+        if self._step_metrics:
+            while steps_todo > 0:
+                self._traci.simulationStep()  # simulate 1 step in sumo
+                self._queue_lengths[self._step] = self._traffic.queue_length()
+                self._step += 1
+                steps_todo -= 1
+        else:
+            # a single round-trip: sumo runs until the given time, which is the step counter as the steps last 1s from time 0
+            self._traci.simulationStep(float(self._step + steps_todo))
+            self._queue_lengths[self._step:self._step + steps_todo] = self._traffic.queue_length()
+            self._step += steps_todo
 
     def _save_episode_stats(self):
         self._reward_store.append(self._sum_total_reward)  # how much negative reward in this episode
-        self._cumulative_wait_store.append(self._sum_waiting_time)  # total number of seconds waited by cars in this episode
-        self._avg_queue_length_store.append(self._sum_queue_length / self._max_steps)  # average number of queued cars per step, in this episode
+        sum_queue_length = int(np.sum(self._queue_lengths))
+        self._cumulative_wait_store.append(sum_queue_length)  # total number of seconds waited by cars in this episode, queue_length == waited_seconds
+        self._avg_queue_length_store.append(sum_queue_length / (self._max_steps - self._warmup_steps))  # average number of queued cars per controlled step, in this episode
 
-    def _get_queue_length(self):
+    def _read_queue_output(self):
         """
-        Retrieve the number of cars with speed = 0 in every incoming lane
+        In fast mode, replace the queue length sampled at the end of every phase by the halting vehicles of the incoming roads
+        at every step, from the queue output that sumo wrote on close
         """
-        if networkID == 0:
-            halt_N = traci.edge.getLastStepHaltingNumber("N2TL")
-            halt_S = traci.edge.getLastStepHaltingNumber("S2TL")
-            halt_E = traci.edge.getLastStepHaltingNumber("E2TL")
-            halt_W = traci.edge.getLastStepHaltingNumber("W2TL")
-            queue_length = halt_N + halt_S + halt_E + halt_W
-
-        elif networkID == 1:
-            halt_W = traci.edge.getLastStepHaltingNumber("E3")
-            halt_N = traci.edge.getLastStepHaltingNumber("E5")
-            halt_E = traci.edge.getLastStepHaltingNumber("E4")
-            halt_S = traci.edge.getLastStepHaltingNumber("E6")
-            queue_length = halt_W + halt_N + halt_E + halt_S
-
-        elif networkID == 2:
-            halt_W = traci.edge.getLastStepHaltingNumber("-E0")
-            halt_N = traci.edge.getLastStepHaltingNumber("-E1")
-            halt_E = traci.edge.getLastStepHaltingNumber("-E2")
-            halt_S = traci.edge.getLastStepHaltingNumber("-E3")
-            queue_length = halt_W + halt_N + halt_E + halt_S
-
-        elif networkID == 3:
-            halt_W = traci.edge.getLastStepHaltingNumber("E9")
-            halt_N = traci.edge.getLastStepHaltingNumber("E10")
-            halt_E = traci.edge.getLastStepHaltingNumber("E11")
-            halt_S = traci.edge.getLastStepHaltingNumber("E8")
-            queue_length = halt_W + halt_N + halt_E + halt_S
-
-        return queue_length
-    
+        if self._step_metrics:
+            return
+        times, halting = read_queue_output(self._queue_file)
+        after_warmup = (times >= self._warmup_steps) & (times < self._step)  # the warm-up steps were not controlled
+        self._queue_lengths[times[after_warmup]] = halting[after_warmup]
+
+
     @property
     def reward_store(self):
         return self._reward_store
@@ -569,3 +307,8 @@ class Simulation:
     @property
     def avg_queue_length_store(self):
         return self._avg_queue_length_store
+
+
+    @property
+    def scheduler(self):
+        return self._scheduler
@@ -2,6 +2,8 @@ import configparser
 from sumolib import checkBinary
 import os
 import sys
+import xml.etree.ElementTree as ET
+import numpy as np
 
 
 def import_train_configuration(config_file):
@@ -17,15 +19,34 @@ def import_train_configuration(config_file):
     config['n_cars_generated'] = content['simulation'].getint('n_cars_generated')
     config['green_duration'] = content['simulation'].getint('green_duration')
     config['yellow_duration'] = content['simulation'].getint('yellow_duration')
+    config['networkID'] = content['simulation'].getint('networkID')
+    config['subscriptions'] = content['simulation'].getboolean('subscriptions', fallback=False)
+    config['step_metrics'] = content['simulation'].getboolean('step_metrics', fallback=True)
+    config['backend'] = content['simulation'].get('backend', fallback='traci')
+    config['warmup_steps'] = content['simulation'].getint('warmup_steps', fallback=0)
+    config['route_cache_dir'] = content['simulation'].get('route_cache_dir', fallback='') or None
     config['num_layers'] = content['model'].getint('num_layers')
     config['width_layers'] = content['model'].getint('width_layers')
     config['batch_size'] = content['model'].getint('batch_size')
     config['learning_rate'] = content['model'].getfloat('learning_rate')
     config['training_epochs'] = content['model'].getint('training_epochs')
+    config['fast_inference'] = content['model'].getboolean('fast_inference', fallback=True)
+    config['target_sync_steps'] = content['model'].getint('target_sync_steps', fallback=0)
+    config['target_tau'] = content['model'].getfloat('target_tau', fallback=0.0)
+    config['double_dqn'] = content['model'].getboolean('double_dqn', fallback=True)
     config['memory_size_min'] = content['memory'].getint('memory_size_min')
     config['memory_size_max'] = content['memory'].getint('memory_size_max')
+    config['prioritized'] = content['memory'].getboolean('prioritized', fallback=False)
+    config['priority_alpha'] = content['memory'].getfloat('priority_alpha', fallback=0.6)
+    config['priority_beta'] = content['memory'].getfloat('priority_beta', fallback=0.4)
+    config['priority_beta_steps'] = content['memory'].getint('priority_beta_steps', fallback=40000)
+    config['priority_epsilon'] = content['memory'].getfloat('priority_epsilon', fallback=0.01)
+    config['num_actors'] = content.getint('parallel', 'num_actors', fallback=1)
+    config['pipelined'] = content.getboolean('parallel', 'pipelined', fallback=False)
+    config['scheduler'] = _scheduler_options(content)
     config['num_states'] = content['agent'].getint('num_states')
     config['num_actions'] = content['agent'].getint('num_actions')
+    config['multi_agent'] = content['agent'].getboolean('multi_agent', fallback=False)
     config['gamma'] = content['agent'].getfloat('gamma')
     config['models_path_name'] = content['dir']['models_path_name']
     config['sumocfg_file_name'] = content['dir']['sumocfg_file_name']
@@ -45,14 +66,50 @@ def import_test_configuration(config_file):
     config['episode_seed'] = content['simulation'].getint('episode_seed')
     config['green_duration'] = content['simulation'].getint('green_duration')
     config['yellow_duration'] = content['simulation'].getint('yellow_duration')
+    config['networkID'] = content['simulation'].getint('networkID')
+    config['subscriptions'] = content['simulation'].getboolean('subscriptions', fallback=False)
+    config['step_metrics'] = content['simulation'].getboolean('step_metrics', fallback=True)
+    config['backend'] = content['simulation'].get('backend', fallback='traci')
+    config['warmup_steps'] = content['simulation'].getint('warmup_steps', fallback=0)
+    config['snapshot_dir'] = content['simulation'].get('snapshot_dir', fallback='') or None
+    config['route_cache_dir'] = content['simulation'].get('route_cache_dir', fallback='') or None
     config['num_states'] = content['agent'].getint('num_states')
     config['num_actions'] = content['agent'].getint('num_actions')
+    config['multi_agent'] = content['agent'].getboolean('multi_agent', fallback=False)
+    config['fast_inference'] = content['agent'].getboolean('fast_inference', fallback=True)
+    config['model_backend'] = content['agent'].get('model_backend', fallback='keras')
+    config['action_cache_size'] = content['agent'].getint('action_cache_size', fallback=0)
+    config['scheduler'] = _scheduler_options(content)
     config['sumocfg_file_name'] = content['dir']['sumocfg_file_name']
     config['models_path_name'] = content['dir']['models_path_name']
     config['model_to_test'] = content['dir'].getint('model_to_test') 
+    config['eval_models'] = _int_list(content.get('evaluation', 'models', fallback=''))
+    config['eval_networks'] = _int_list(content.get('evaluation', 'networks', fallback=''))
+    config['eval_seeds'] = _int_list(content.get('evaluation', 'seeds', fallback=''))
+    config['eval_demand_levels'] = {level.strip(): int(n_cars) for level, n_cars in
+                                    (pair.split(':') for pair in content.get('evaluation', 'demand_levels', fallback='').split(',') if pair.strip())}
+    config['eval_workers'] = content.getint('evaluation', 'workers', fallback=os.cpu_count())
+    config['eval_fork_step'] = content.getint('evaluation', 'fork_step', fallback=config['warmup_steps'])
+    config['eval_path_name'] = content.get('evaluation', 'output_path_name', fallback='evaluation')
     return config
 
 
+def _scheduler_options(content):
+    """
+    Options of the DecisionScheduler of the simulations, the fixed grid of green_duration unless event_driven is set
+    """
+    return {
+        'event_driven': content.getboolean('scheduler', 'event_driven', fallback=False),
+        'min_green': content.getint('scheduler', 'min_green', fallback=10),
+        'max_green': content.getint('scheduler', 'max_green', fallback=40),
+        'check_interval': content.getint('scheduler', 'check_interval', fallback=1),
+    }
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
 def set_sumo(gui, sumocfg_file_name, max_steps):
     """
     Configure various parameters of SUMO
@@ -76,6 +133,89 @@ def set_sumo(gui, sumocfg_file_name, max_steps):
     return sumo_cmd
 
 
+def set_backend(backend, gui):
+    """
+    Return the module driving sumo: libsumo runs sumo inside this process, without the TraCI socket,
+    but it has no GUI and a single simulation per process, so traci is used otherwise
+    """
+    if backend == 'libsumo':
+        if gui:
+            print("libsumo has no GUI, using traci")
+        else:
+            try:
+                import libsumo
+                return libsumo
+            except ImportError:
+                print("libsumo is not installed, using traci")
+    elif backend != 'traci':
+        sys.exit("unknown backend '%s', use traci or libsumo" % backend)
+    import traci
+    return traci
+
+
+def set_sumo_instance(sumo_cmd, label):
+    """
+    Extend the sumo command for one of several instances running side by side, so that their route file and outputs do not clash
+    """
+    route_file = os.path.join('intersection', label + '_routes.rou.xml')
+    sumo_cmd = sumo_cmd + [
+        "--tripinfo-output", os.path.join('intersection', label + '_trip_info.xml'),
+        "--summary-output", os.path.join('intersection', label + '_summary.xml'),
+    ]
+    return sumo_cmd, route_file
+
+
+def summary_output_file(sumo_cmd):
+    """
+    Path of the summary output written by a sumo command, given on the command line or in its .sumocfg, None without one
+    """
+    if "--summary-output" in sumo_cmd:
+        return sumo_cmd[sumo_cmd.index("--summary-output") + 1]
+    if "-c" in sumo_cmd:
+        sumocfg_file = sumo_cmd[sumo_cmd.index("-c") + 1]
+        output = ET.parse(sumocfg_file).find('output/summary-output')
+        if output is not None:
+            return os.path.join(os.path.dirname(sumocfg_file), output.get('value'))  # relative to the .sumocfg
+    return None
+
+
+def queue_output_files(sumo_cmd):
+    """
+    Paths of the additional file and of the output of the queue lengths of the fast mode, next to the summary output of a sumo command
+    """
+    summary_file = summary_output_file(sumo_cmd)
+    if summary_file is None or summary_file == os.devnull:
+        raise ValueError("the fast mode (step_metrics = False) writes the queue lengths next to the summary output, give sumo a --summary-output file")
+    name = os.path.splitext(summary_file)[0]
+    return name + '_queues.add.xml', name + '_queues.xml'
+
+
+def write_queue_additional(additional_file, output_file, edge_ids):
+    """
+    Write an additional file making sumo output the halting vehicles of the given roads at every step, as the edgeData
+    waiting time of intervals of 1s. Unlike the halting number, it also counts the vehicles stopped across the stop line
+    """
+    edge_data = ET.Element('edgeData', id='queues', file=os.path.relpath(output_file, os.path.dirname(additional_file)), period='1',
+                           edges=' '.join(edge_ids), excludeEmpty='true', writeAttributes='waitingTime')
+    additional = ET.Element('additional')
+    additional.append(edge_data)
+    ET.ElementTree(additional).write(additional_file)
+
+
+def read_queue_output(output_file):
+    """
+    Time and number of halting vehicles in the roads of every step of a queue output, time 0 being the result of the first simulation step.
+    sumo leaves out the waiting time of the roads without halting vehicles
+    """
+    times, halting = [], []
+    for _, element in ET.iterparse(output_file):
+        if element.tag == 'interval':
+            times.append(int(float(element.get('begin'))))
+            halting.append(round(sum(float(edge.get('waitingTime', 0)) for edge in element)))
+            element.clear()
+    return np.array(times, dtype=np.intp), np.array(halting, dtype=np.int32)
+
+
 def set_train_path(models_path_name):
     """
     Create a new model path with an incremental integer, also considering previously created model paths
@@ -107,10 +247,3 @@ def set_test_path(models_path_name, model_n):
         return model_folder_path, plot_path
     else: 
         sys.exit('The model number specified does not exist in the models folder')
-
-def set_phaseID(config_file):
-    content = configparser.ConfigParser()
-    content.read(config_file)
-    config = {}
-    config['networkID'] = content['simulation'].getint('networkID')
-    return config
\ No newline at end of file
@@ -0,0 +1,30 @@
+class WaitingTimeTracker:
+    """
+    Running total of the accumulated waiting time of the cars in the incoming roads,
+    updated only with the cars that entered, left or waited since the last decision
+    """
+    def __init__(self):
+        self._waiting_times = {}  # car id -> accumulated waiting time, for the cars in the incoming roads
+        self._total = 0.0
+
+
+    def update(self, waiting_times):
+        """
+        Take the accumulated waiting time of every car now in the incoming roads and return the new total
+        """
+        tracked = self._waiting_times
+        for car_id in tracked.keys() - waiting_times.keys():  # a car that was tracked has cleared the intersection
+            self._total -= tracked.pop(car_id)
+        for car_id, wait_time in waiting_times.items():
+            old_wait_time = tracked.get(car_id, 0.0)
+            if wait_time != old_wait_time:
+                self._total += wait_time - old_wait_time
+                tracked[car_id] = wait_time
+        if not tracked:
+            self._total = 0.0  # drop the rounding errors of the running total whenever the roads are empty
+        return self._total
+
+
+    @property
+    def total(self):
+        return self._total